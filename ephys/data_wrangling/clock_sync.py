@@ -0,0 +1,410 @@
+"""Align pulse trains recorded on two drifting clocks.
+
+Intan, camera, and behavior-rig timestamps are stamped by independent
+oscillators, so a shared sync pulse train arrives with a slightly different
+rate on each system, and pulses can be dropped or duplicated on either side.
+This module matches the two pulse trains and fits a piecewise-linear clock
+mapping that converts arrays of timestamps between the clocks.
+
+Matching proceeds in three vectorized stages:
+
+1. **Anchor** - the inter-pulse-interval (IPI) pattern of the first source
+   pulses is compared against every target offset in a search range; the
+   smallest offset whose IPI ratios agree within ``anchor_tolerance`` fixes
+   the first matched pair and an initial clock ratio.
+2. **Extension** - matches grow outward from the anchor in geometrically
+   growing blocks. Each block is predicted from a line fit to the most recent
+   matches and matched to the nearest target pulse with
+   :func:`~ephys.data_wrangling.ttls.match_nearest_events`; pulses without a
+   target within ``match_tolerance`` IPIs are treated as dropped or extra.
+3. **Refinement** - a piecewise-linear mapping with one knot per block of
+   matches is fit, every source pulse is rematched against it, pairs with
+   outlying residuals are discarded, and the mapping is refit.
+
+Every stage works on arrays, so millions of pulses align in seconds.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .ttls import match_nearest_events
+
+CLOCK_MAPPING_NPZ_VERSION = 1
+_DEFAULT_MATCH_TOLERANCE = 0.3
+_DEFAULT_ANCHOR_INTERVALS = 16
+_DEFAULT_ANCHOR_TOLERANCE = 0.05
+_DEFAULT_MAX_ANCHOR_LAG = 1000
+_DEFAULT_KNOT_INTERVAL_PULSES = 500
+_DEFAULT_OUTLIER_THRESHOLD = 6.0
+_MAX_EXTENSION_PULSES = 50_000
+
+__all__ = [
+    "CLOCK_MAPPING_NPZ_VERSION",
+    "ClockMapping",
+    "align_pulse_trains",
+    "fit_clock_mapping",
+    "load_clock_mapping_npz",
+    "save_clock_mapping_npz",
+]
+
+
+def _piecewise_linear(
+    values: np.ndarray,
+    knots_x: np.ndarray,
+    knots_y: np.ndarray,
+) -> np.ndarray:
+    """Evaluate a piecewise-linear map, extrapolating with the end slopes."""
+    x = np.asarray(values, dtype=np.float64)
+    segment = np.clip(np.searchsorted(knots_x, x, side="right") - 1, 0, knots_x.size - 2)
+    slope = np.diff(knots_y) / np.diff(knots_x)
+    return knots_y[segment] + (x - knots_x[segment]) * slope[segment]
+
+
+@dataclass(frozen=True)
+class ClockMapping:
+    """Piecewise-linear mapping from source-clock to target-clock times.
+
+    Parameters
+    ----------
+    source_knots
+        Strictly increasing knot times on the source clock.
+    target_knots
+        Corresponding target-clock times (strictly increasing).
+    n_matched
+        Number of pulse pairs used for the fit.
+    residual_rms
+        RMS of ``target - transform(source)`` over matched pairs, in target
+        units.
+    """
+
+    source_knots: np.ndarray
+    target_knots: np.ndarray
+    n_matched: int = 0
+    residual_rms: float = 0.0
+
+    def transform(self, source_times: np.ndarray) -> np.ndarray:
+        """Convert source-clock times to the target clock (float64)."""
+        return _piecewise_linear(source_times, self.source_knots, self.target_knots)
+
+    def inverse(self, target_times: np.ndarray) -> np.ndarray:
+        """Convert target-clock times to the source clock (float64)."""
+        return _piecewise_linear(target_times, self.target_knots, self.source_knots)
+
+
+def _as_pulse_train(pulses: np.ndarray, name: str) -> np.ndarray:
+    train = np.asarray(pulses, dtype=np.float64).ravel()
+    if train.size > 1 and np.any(np.diff(train) <= 0):
+        msg = f"{name} must be strictly increasing"
+        raise ValueError(msg)
+    return train
+
+
+def _find_anchor(
+    source: np.ndarray,
+    target: np.ndarray,
+    *,
+    n_intervals: int,
+    max_lag: int,
+    tolerance: float,
+    scale: float | None,
+) -> tuple[int, int, float]:
+    """Return ``(source_index, target_index, scale)`` of the first matched pair."""
+    source_windows = sliding_window_view(np.diff(source), n_intervals)
+    target_windows = sliding_window_view(np.diff(target), n_intervals)
+    lags = np.arange(-max_lag, max_lag + 1)
+    lags = lags[np.argsort(np.abs(lags), kind="stable")]
+    source_start = np.maximum(-lags, 0)
+    target_start = np.maximum(lags, 0)
+    valid = (source_start < source_windows.shape[0]) & (target_start < target_windows.shape[0])
+    source_start, target_start = source_start[valid], target_start[valid]
+
+    ratios = target_windows[target_start] / source_windows[source_start]
+    reference = scale if scale is not None else np.median(ratios, axis=1, keepdims=True)
+    mismatch = np.median(np.abs(ratios / reference - 1.0), axis=1)
+    candidates = np.flatnonzero(mismatch <= tolerance)
+    if candidates.size == 0:
+        msg = (
+            "Could not anchor the pulse trains: no offset within "
+            f"{max_lag} pulses has inter-pulse intervals agreeing within "
+            f"{tolerance:.1%} (best {float(mismatch.min()):.1%})"
+        )
+        raise ValueError(msg)
+    best = int(candidates[0])
+    i0, j0 = int(source_start[best]), int(target_start[best])
+    return i0, j0, float(np.median(ratios[best]))
+
+
+def _line_through(source: np.ndarray, target: np.ndarray) -> tuple[float, float, float]:
+    """Least-squares line as ``(source_mean, target_mean, slope)``."""
+    source_mean = float(source.mean())
+    target_mean = float(target.mean())
+    centered = source - source_mean
+    denom = float(np.dot(centered, centered))
+    slope = float(np.dot(centered, target - target_mean) / denom)
+    return source_mean, target_mean, slope
+
+
+def _predict(
+    source: np.ndarray,
+    target: np.ndarray,
+    rows: np.ndarray,
+    recent: tuple[np.ndarray, np.ndarray],
+    fallback_scale: float,
+) -> np.ndarray:
+    """Extrapolate target times of ``source[rows]`` from recent matched pairs."""
+    recent_source, recent_target = source[recent[0]], target[recent[1]]
+    if recent_source.size >= 2:
+        source_mean, target_mean, slope = _line_through(recent_source, recent_target)
+    else:
+        source_mean, target_mean, slope = (
+            float(recent_source[0]),
+            float(recent_target[0]),
+            fallback_scale,
+        )
+    return target_mean + slope * (source[rows] - source_mean)
+
+
+def _match_block(
+    source: np.ndarray,
+    target: np.ndarray,
+    source_rows: np.ndarray,
+    predicted: np.ndarray,
+    tolerance: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Match predicted source pulses to target pulses one-to-one."""
+    target_rows, offsets = match_nearest_events(target, predicted, max_distance=tolerance)
+    keep = target_rows >= 0
+    source_rows, target_rows, distance = (
+        source_rows[keep],
+        target_rows[keep],
+        np.abs(offsets[keep]),
+    )
+    # When two source pulses claim one target pulse, keep the closer one
+    order = np.lexsort((distance, target_rows))
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = target_rows[order][1:] != target_rows[order][:-1]
+    winners = np.sort(order[first])
+    return source_rows[winners], target_rows[winners]
+
+
+def _fit_knots(
+    source: np.ndarray,
+    target: np.ndarray,
+    knot_interval_pulses: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Fit one line per block of matches; knots are block centroids plus ends."""
+    n_pairs = source.size
+    n_blocks = max(1, n_pairs // knot_interval_pulses)
+    starts = np.linspace(0, n_pairs, n_blocks + 1).astype(np.int64)[:-1]
+    counts = np.diff(np.append(starts, n_pairs))
+    block = np.repeat(np.arange(n_blocks), counts)
+
+    source_mean = np.add.reduceat(source, starts) / counts
+    target_mean = np.add.reduceat(target, starts) / counts
+    ds = source - source_mean[block]
+    dt = target - target_mean[block]
+    slope = np.add.reduceat(ds * dt, starts) / np.add.reduceat(ds * ds, starts)
+
+    knots_x = np.concatenate(([source[0]], source_mean, [source[-1]]))
+    knots_y = np.concatenate(
+        (
+            [target_mean[0] + slope[0] * (source[0] - source_mean[0])],
+            target_mean,
+            [target_mean[-1] + slope[-1] * (source[-1] - source_mean[-1])],
+        )
+    )
+    _, unique_rows = np.unique(knots_x, return_index=True)
+    return knots_x[unique_rows], knots_y[unique_rows]
+
+
+def align_pulse_trains(
+    source_pulses: np.ndarray,
+    target_pulses: np.ndarray,
+    *,
+    scale: float | None = None,
+    match_tolerance: float = _DEFAULT_MATCH_TOLERANCE,
+    anchor_intervals: int = _DEFAULT_ANCHOR_INTERVALS,
+    anchor_tolerance: float = _DEFAULT_ANCHOR_TOLERANCE,
+    max_anchor_lag: int = _DEFAULT_MAX_ANCHOR_LAG,
+    knot_interval_pulses: int = _DEFAULT_KNOT_INTERVAL_PULSES,
+    outlier_threshold: float = _DEFAULT_OUTLIER_THRESHOLD,
+) -> tuple[np.ndarray, np.ndarray, ClockMapping]:
+    """Match pulses between two clocks, tolerating dropped and extra pulses.
+
+    Parameters
+    ----------
+    source_pulses, target_pulses
+        Strictly increasing pulse times on each clock, in any units (e.g.
+        Intan ticks and camera seconds).
+    scale
+        Nominal target units per source unit (e.g. ``1 / 30_000`` for ticks
+        to seconds). When ``None``, it is estimated from the IPI pattern.
+    match_tolerance
+        Maximum distance between a predicted and a matched target pulse, as a
+        fraction of the median target IPI.
+    anchor_intervals
+        Number of IPIs compared when searching for the first matched pair.
+    anchor_tolerance
+        Median relative IPI disagreement accepted for the anchor.
+    max_anchor_lag
+        Largest number of leading pulses that may be missing from either
+        train.
+    knot_interval_pulses
+        Matched pulses per knot of the piecewise-linear mapping.
+    outlier_threshold
+        Matched pairs whose residual exceeds this many robust standard
+        deviations (1.4826 * MAD) are discarded before the final fit.
+
+    Returns
+    -------
+    source_indices, target_indices
+        ``int64`` indices of matched pulse pairs, increasing in both trains.
+    mapping
+        :class:`ClockMapping` fit to the matched pairs.
+
+    Raises
+    ------
+    ValueError
+        If either train is too short or no anchor can be found.
+
+    Notes
+    -----
+    Periodic pulse trains have no IPI structure to disambiguate offsets; the
+    smallest acceptable offset is used, so such trains must start within one
+    pulse of each other.
+    """
+    source = _as_pulse_train(source_pulses, "source_pulses")
+    target = _as_pulse_train(target_pulses, "target_pulses")
+    if min(source.size, target.size) < anchor_intervals + 1:
+        msg = (
+            f"Both pulse trains need at least {anchor_intervals + 1} pulses; "
+            f"got {source.size} and {target.size}"
+        )
+        raise ValueError(msg)
+    if knot_interval_pulses < 2:
+        msg = f"knot_interval_pulses must be at least 2, got {knot_interval_pulses}"
+        raise ValueError(msg)
+
+    i0, j0, anchor_scale = _find_anchor(
+        source,
+        target,
+        n_intervals=anchor_intervals,
+        max_lag=max_anchor_lag,
+        tolerance=anchor_tolerance,
+        scale=scale,
+    )
+    tolerance = match_tolerance * float(np.median(np.diff(target)))
+
+    # Seed matches from the anchor window, then grow outward in both directions
+    seed_rows = np.arange(i0, i0 + anchor_intervals + 1)
+    seed_predicted = target[j0] + anchor_scale * (source[seed_rows] - source[i0])
+    seed = _match_block(source, target, seed_rows, seed_predicted, tolerance)
+    left_parts: list[tuple[np.ndarray, np.ndarray]] = []
+    right_parts: list[tuple[np.ndarray, np.ndarray]] = []
+    left_recent: tuple[np.ndarray, np.ndarray] = seed
+    right_recent: tuple[np.ndarray, np.ndarray] = seed
+    lo, hi = i0, i0 + anchor_intervals + 1
+    extension = anchor_intervals
+
+    while lo > 0 or hi < source.size:
+        extension = min(2 * extension, _MAX_EXTENSION_PULSES)
+        if hi < source.size:
+            rows = np.arange(hi, min(hi + extension, source.size))
+            predicted = _predict(source, target, rows, right_recent, anchor_scale)
+            block = _match_block(source, target, rows, predicted, tolerance)
+            right_parts.append(block)
+            right_recent = (
+                np.concatenate((right_recent[0], block[0]))[-knot_interval_pulses:],
+                np.concatenate((right_recent[1], block[1]))[-knot_interval_pulses:],
+            )
+            hi = int(rows[-1]) + 1
+        if lo > 0:
+            rows = np.arange(max(lo - extension, 0), lo)
+            predicted = _predict(source, target, rows, left_recent, anchor_scale)
+            block = _match_block(source, target, rows, predicted, tolerance)
+            left_parts.append(block)
+            left_recent = (
+                np.concatenate((block[0], left_recent[0]))[:knot_interval_pulses],
+                np.concatenate((block[1], left_recent[1]))[:knot_interval_pulses],
+            )
+            lo = int(rows[0])
+
+    parts = [*left_parts[::-1], seed, *right_parts]
+    source_rows = np.concatenate([p[0] for p in parts])
+    target_rows = np.concatenate([p[1] for p in parts])
+
+    # Refine: rematch every pulse against the global piecewise-linear fit,
+    # then drop pairs whose residual is an outlier (extra pulses that landed
+    # inside the match window of a dropped one)
+    all_rows = np.arange(source.size)
+    for _ in range(2):
+        knots_x, knots_y = _fit_knots(
+            source[source_rows], target[target_rows], knot_interval_pulses
+        )
+        predicted = _piecewise_linear(source, knots_x, knots_y)
+        source_rows, target_rows = _match_block(source, target, all_rows, predicted, tolerance)
+        residual = target[target_rows] - predicted[source_rows]
+        sigma = 1.4826 * float(np.median(np.abs(residual - np.median(residual))))
+        if sigma > 0:
+            inlier = np.abs(residual) <= outlier_threshold * sigma
+            source_rows, target_rows = source_rows[inlier], target_rows[inlier]
+
+    knots_x, knots_y = _fit_knots(source[source_rows], target[target_rows], knot_interval_pulses)
+    residual = target[target_rows] - _piecewise_linear(source[source_rows], knots_x, knots_y)
+    mapping = ClockMapping(
+        source_knots=knots_x,
+        target_knots=knots_y,
+        n_matched=int(source_rows.size),
+        residual_rms=float(np.sqrt(np.mean(residual**2))),
+    )
+    return source_rows.astype(np.int64), target_rows.astype(np.int64), mapping
+
+
+def fit_clock_mapping(
+    source_pulses: np.ndarray,
+    target_pulses: np.ndarray,
+    **kwargs,
+) -> ClockMapping:
+    """Fit a :class:`ClockMapping` from source to target pulse times.
+
+    Keyword arguments are passed to :func:`align_pulse_trains`.
+    """
+    _, _, mapping = align_pulse_trains(source_pulses, target_pulses, **kwargs)
+    return mapping
+
+
+def save_clock_mapping_npz(path: str | Path, mapping: ClockMapping) -> None:
+    """Write a :class:`ClockMapping` to an ``.npz`` artifact."""
+    output = Path(path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        output,
+        version=np.int32(CLOCK_MAPPING_NPZ_VERSION),
+        source_knots=mapping.source_knots.astype(np.float64),
+        target_knots=mapping.target_knots.astype(np.float64),
+        n_matched=np.int64(mapping.n_matched),
+        residual_rms=np.float64(mapping.residual_rms),
+    )
+
+
+def load_clock_mapping_npz(path: str | Path) -> ClockMapping:
+    """Load a :class:`ClockMapping` written by :func:`save_clock_mapping_npz`."""
+    with np.load(Path(path), allow_pickle=False) as archive:
+        version = int(archive["version"])
+        if version != CLOCK_MAPPING_NPZ_VERSION:
+            msg = (
+                f"Unsupported clock mapping npz version {version}; "
+                f"expected {CLOCK_MAPPING_NPZ_VERSION}"
+            )
+            raise ValueError(msg)
+        return ClockMapping(
+            source_knots=np.asarray(archive["source_knots"], dtype=np.float64),
+            target_knots=np.asarray(archive["target_knots"], dtype=np.float64),
+            n_matched=int(archive["n_matched"]),
+            residual_rms=float(archive["residual_rms"]),
+        )
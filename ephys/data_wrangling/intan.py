@@ -1,8 +1,16 @@
-from .binary_data import get_digital
-from .ttls import get_ttl_timestamps_16bit
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+from .ttls import (
+    DEFAULT_TTL_CHUNK_SAMPLES,
+    extract_ttl_edges,
+    get_ttl_timestamps_from_edges,
+)
 
 import numpy as np
 
+INTAN_BIT_TO_uV = 0.195
+
 
 def get_camera_ttl_array(
     intan_digital_filepath,
@@ -30,15 +38,17 @@ def get_camera_ttl_array(
         Time (in ticks) where ttl at index transitions ON
     np.ndarray[int]:
         Time (in ticks) where ttl at index transitions OFF
+
+    Notes
+    -----
+    To read several TTL lines, call :func:`get_ttl_edges` once and pass its
+    result to :func:`~ephys.data_wrangling.ttls.get_ttl_timestamps_from_edges`
+    for each line instead of calling this function repeatedly.
     """
-    digital_inputs = get_digital(
-        intan_digital_filepath,
-        0,
-        2,
-    )
+    ttl_edges = get_ttl_edges(intan_digital_filepath)
 
-    ttl_onsets, ttl_offsets = get_ttl_timestamps_16bit(
-        digital_inputs,
+    ttl_onsets, ttl_offsets = get_ttl_timestamps_from_edges(
+        ttl_edges,
         ttl_index,
         isTransitionLowToHigh,
     )
@@ -46,6 +56,38 @@ def get_camera_ttl_array(
     return ttl_onsets, ttl_offsets
 
 
+def get_ttl_edges(
+    intan_digital_filepath,
+    chunk_samples=DEFAULT_TTL_CHUNK_SAMPLES,
+    header_offset_in_bytes=0,
+):
+    """
+    Rising and falling edges of all 16 Intan digital inputs, from one
+    chunked pass over a memory map of ``digitalin.dat``.
+
+    Parameters
+    ----------
+    intan_digital_filepath: string
+    chunk_samples: int
+        Number of samples read per chunk
+    header_offset_in_bytes: int
+        Binary data file may have header information
+
+    Returns
+    -------
+    TtlEdges
+        See :func:`~ephys.data_wrangling.ttls.extract_ttl_edges`
+    """
+    digital_inputs = np.memmap(
+        intan_digital_filepath,
+        dtype=np.uint16,
+        mode="r",
+        offset=header_offset_in_bytes,
+    )
+
+    return extract_ttl_edges(digital_inputs, chunk_samples)
+
+
 def load_voltage(voltage_filepath, channel_count):
     """
 
@@ -62,5 +104,183 @@ def load_voltage(voltage_filepath, channel_count):
     voltage = voltage.reshape(int(voltage.shape[0] / channel_count), channel_count)
 
     # Convert to uV as float32
-    voltage_uV = voltage.astype(np.float32) * 0.195
+    voltage_uV = voltage.astype(np.float32) * INTAN_BIT_TO_uV
     return voltage_uV
+
+
+class IntanAmplifierReader:
+    """Lazy, memory-mapped reader for interleaved int16 ``amplifier.dat`` files.
+
+    Intan writes one int16 word per channel per sample, interleaved by sample.
+    The file is mapped with :class:`numpy.memmap`; no samples are read until
+    :meth:`read` or :meth:`iter_blocks` is called, so peak memory is set by the
+    requested block size rather than the recording length.
+
+    Parameters
+    ----------
+    filepath
+        Path to ``amplifier.dat``.
+    channel_count
+        Number of interleaved amplifier channels.
+    bit_to_uV
+        Scale from ADC counts to microvolts (``0.195`` for RHD amplifiers).
+    header_offset_in_bytes
+        Bytes to skip before the first sample.
+
+    Raises
+    ------
+    ValueError
+        If ``channel_count`` is not positive or the file does not hold a
+        whole number of samples.
+    """
+
+    def __init__(
+        self,
+        filepath: str | Path,
+        channel_count: int,
+        *,
+        bit_to_uV: float = INTAN_BIT_TO_uV,
+        header_offset_in_bytes: int = 0,
+    ) -> None:
+        if int(channel_count) < 1:
+            msg = f"channel_count must be positive, got {channel_count!r}"
+            raise ValueError(msg)
+        self._filepath = Path(filepath)
+        self._channel_count = int(channel_count)
+        self._bit_to_uV = float(bit_to_uV)
+
+        frame_bytes = np.dtype(np.int16).itemsize * self._channel_count
+        payload_bytes = self._filepath.stat().st_size - int(header_offset_in_bytes)
+        if payload_bytes <= 0 or payload_bytes % frame_bytes != 0:
+            msg = (
+                f"{self._filepath} holds {payload_bytes} data bytes, which is not a "
+                f"positive multiple of {frame_bytes} bytes per sample for "
+                f"{self._channel_count} channels"
+            )
+            raise ValueError(msg)
+        self._raw = np.memmap(
+            self._filepath,
+            dtype=np.int16,
+            mode="r",
+            offset=int(header_offset_in_bytes),
+            shape=(payload_bytes // frame_bytes, self._channel_count),
+        )
+
+    @property
+    def filepath(self) -> Path:
+        """Path of the mapped file."""
+        return self._filepath
+
+    @property
+    def n_channels(self) -> int:
+        """Number of interleaved channels."""
+        return self._channel_count
+
+    @property
+    def n_samples(self) -> int:
+        """Number of samples per channel."""
+        return int(self._raw.shape[0])
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Logical ``(n_channels, n_samples)`` shape of the recording."""
+        return self.n_channels, self.n_samples
+
+    @property
+    def dtype(self) -> np.dtype:
+        """On-disk sample dtype (``int16``)."""
+        return self._raw.dtype
+
+    @property
+    def bit_to_uV(self) -> float:
+        """Microvolts per ADC count applied by :meth:`read`."""
+        return self._bit_to_uV
+
+    @property
+    def raw(self) -> np.memmap:
+        """Raw int16 memmap with on-disk ``(n_samples, n_channels)`` layout."""
+        return self._raw
+
+    def _channel_index(self, channels: Sequence[int] | np.ndarray | None) -> np.ndarray | None:
+        """Validate ``channels`` and return them as an ``intp`` index array."""
+        if channels is None:
+            return None
+        index = np.asarray(channels, dtype=np.intp).ravel()
+        if index.size and (index.min() < 0 or index.max() >= self._channel_count):
+            msg = (
+                f"channels must lie in [0, {self._channel_count}); "
+                f"got {index.tolist()}"
+            )
+            raise ValueError(msg)
+        return index
+
+    def read(
+        self,
+        start: int = 0,
+        stop: int | None = None,
+        *,
+        channels: Sequence[int] | np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Read samples ``[start, stop)`` as a float32 microvolt block.
+
+        Parameters
+        ----------
+        start, stop
+            Sample range; ``stop=None`` reads to the end of the file.
+        channels
+            Optional channel indices to keep, in the requested order.
+
+        Returns
+        -------
+        numpy.ndarray
+            C-contiguous float32 array with shape ``(n_selected, stop - start)``.
+        """
+        stop = self.n_samples if stop is None else int(stop)
+        start = int(start)
+        if not 0 <= start <= stop <= self.n_samples:
+            msg = (
+                f"sample range [{start}, {stop}) is outside the recording "
+                f"[0, {self.n_samples})"
+            )
+            raise ValueError(msg)
+        index = self._channel_index(channels)
+        block = self._raw[start:stop]
+        if index is not None:
+            block = block[:, index]
+        voltage_uV = np.empty((block.shape[1], block.shape[0]), dtype=np.float32)
+        voltage_uV[...] = block.T
+        voltage_uV *= np.float32(self._bit_to_uV)
+        return voltage_uV
+
+    def iter_blocks(
+        self,
+        block_samples: int,
+        *,
+        channels: Sequence[int] | np.ndarray | None = None,
+        start: int = 0,
+        stop: int | None = None,
+    ) -> Iterator[np.ndarray]:
+        """Yield consecutive float32 ``(channels, samples)`` blocks.
+
+        Parameters
+        ----------
+        block_samples
+            Samples per yielded block; the final block may be shorter.
+        channels
+            Optional channel indices passed to :meth:`read`.
+        start, stop
+            Sample range to iterate over.
+
+        Yields
+        ------
+        numpy.ndarray
+            Blocks from :meth:`read`, each read only when requested.
+        """
+        if int(block_samples) < 1:
+            msg = f"block_samples must be positive, got {block_samples!r}"
+            raise ValueError(msg)
+        stop = self.n_samples if stop is None else int(stop)
+        self._channel_index(channels)
+        for block_start in range(int(start), stop, int(block_samples)):
+            block_stop = min(block_start + int(block_samples), stop)
+            yield self.read(block_start, block_stop, channels=channels)
@@ -1,4 +1,11 @@
 import pickle
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from .spike_store import is_spike_store_current, open_spike_store, write_spike_store
+from .spike_times import UnitSpikeIndex
 
 """
 These codes are for loading spikes output from Neuroviz manual sorting program.
@@ -6,18 +13,31 @@ These codes are for loading spikes output from Neuroviz manual sorting program.
 https://gitlab.oit.duke.edu/herzfeldd/NeuroViz.jl
 """
 
+_STORE_SUFFIX = ".spikestore"
+
 
-def get_spikes(file_path, sampling_frequency=30000.0):
+def get_spikes(file_path, sampling_frequency=30000.0, *, units=None, use_store=True):
     """
 
     Get spike times (in ticks) from neuroviz file
 
+    The first call converts the pickle to a columnar spike store next to it
+    (``<file_path>.spikestore``, see :func:`convert_neuroviz_to_spike_store`);
+    later calls read only the requested units from that store and skip
+    unpickling. The store is rebuilt when the pickle's size or mtime changes.
+    If the store cannot be written (e.g. a read-only directory), a warning is
+    issued and the spikes are returned from the unpickled file.
+
     Parameters
     ----------
     file_path: string
         Path to the neuroviz pickle file
     sampling_frequency: float
         unused
+    units: list[int] or None
+        Positions of the units to load; all units when None
+    use_store: bool
+        If False, unpickle the file directly and never touch the store
 
     Returns
     -------
@@ -26,14 +46,89 @@ def get_spikes(file_path, sampling_frequency=30000.0):
         to spike times from a different unit.
     """
 
+    if not use_store:
+        units_ = open_neuroviz(file_path)
+        rows = range(len(units_)) if units is None else units
+        return [units_[i]["spike_indices__"] for i in rows]
+
+    store_path = _store_path(file_path)
+    if not is_spike_store_current(store_path, file_path):
+        index = _neuroviz_spike_index(file_path)
+        try:
+            write_spike_store(store_path, index, source_path=file_path)
+        except OSError as error:
+            warnings.warn(f"Could not write neuroviz spike store {store_path}: {error}", stacklevel=2)
+            rows = range(len(index)) if units is None else units
+            return [index.unit_spike_times(int(i)) for i in rows]
+
+    return load_neuroviz_spike_store(store_path, units)
+
+
+def convert_neuroviz_to_spike_store(file_path, store_path=None):
+    """
+
+    Write the spike indices of every unit in a neuroviz pickle to a
+    columnar spike store (offsets plus one concatenated int64 array).
+
+    Parameters
+    ----------
+    file_path: string
+        Path to the neuroviz pickle file
+    store_path: string or None
+        Destination directory; defaults to ``<file_path>.spikestore``
+
+    Returns
+    -------
+    pathlib.Path
+        Path of the written store
+    """
+
+    if store_path is None:
+        store_path = _store_path(file_path)
+
+    return write_spike_store(store_path, _neuroviz_spike_index(file_path), source_path=file_path)
+
+
+def _neuroviz_spike_index(file_path):
+    """Unpickle a neuroviz file into a :class:`UnitSpikeIndex` of int64 ticks."""
     units_ = open_neuroviz(file_path)
+    spike_indices = [
+        np.asarray(unit["spike_indices__"], dtype=np.int64).ravel() for unit in units_
+    ]
+    del units_
+
+    lengths = np.array([len(indices) for indices in spike_indices], dtype=np.int64)
+    return UnitSpikeIndex(
+        unit_ids=np.arange(len(spike_indices), dtype=np.int64),
+        offsets=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+        spike_times=(
+            np.concatenate(spike_indices) if spike_indices else np.zeros(0, dtype=np.int64)
+        ),
+    )
+
+
+def load_neuroviz_spike_store(store_path, units=None):
+    """
+
+    Load spike indices for selected units from a converted spike store
 
-    spike_times_for_each_neuron = []
+    Parameters
+    ----------
+    store_path: string
+        Directory written by :func:`convert_neuroviz_to_spike_store`
+    units: list[int] or None
+        Positions of the units to load; all units when None
 
-    for i in range(len(units_)):
-        spike_times_for_each_neuron.append(units_[i]["spike_indices__"])
+    Returns
+    -------
+    List
+        One np.ndarray[np.int64] per requested unit. Arrays are views of a
+        read-only memory map; only the requested units are read from disk.
+    """
 
-    return spike_times_for_each_neuron
+    index = open_spike_store(store_path)
+    rows = range(len(index)) if units is None else units
+    return [index.unit_spike_times(int(i)) for i in rows]
 
 
 def open_neuroviz(filepath):
@@ -52,7 +147,12 @@ def open_neuroviz(filepath):
         Each element corresponds to a unique neuron
     """
 
-    units_file = open(filepath, "rb")
-    units = pickle.load(units_file)
+    with open(filepath, "rb") as units_file:
+        units = pickle.load(units_file)
 
     return units
+
+
+def _store_path(file_path):
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + _STORE_SUFFIX)
@@ -0,0 +1,144 @@
+"""Columnar on-disk storage for per-unit spike trains.
+
+A spike store is a directory holding the arrays of a
+:class:`~ephys.data_wrangling.spike_times.UnitSpikeIndex`:
+
+* ``unit_ids.npy`` - one label per unit,
+* ``offsets.npy`` - ``int64`` boundaries of shape ``(n_units + 1,)``,
+* ``spike_indices.npy`` - every unit's spike ticks concatenated as ``int64``,
+* ``meta.json`` - format version and, optionally, the size and mtime of the
+  source file the store was converted from.
+
+Opening a store reads only the small ``unit_ids``/``offsets`` arrays; the spike
+array is memory-mapped, so slicing one unit touches only that unit's pages.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from .spike_times import UnitSpikeIndex
+
+SPIKE_STORE_VERSION = 1
+_META_FILE = "meta.json"
+
+__all__ = [
+    "SPIKE_STORE_VERSION",
+    "is_spike_store_current",
+    "open_spike_store",
+    "write_spike_store",
+]
+
+
+def _source_signature(source_path: str | Path) -> dict[str, int]:
+    stat = os.stat(source_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def write_spike_store(
+    store_path: str | Path,
+    index: UnitSpikeIndex,
+    *,
+    source_path: str | Path | None = None,
+) -> Path:
+    """Write ``index`` as a spike store directory.
+
+    Parameters
+    ----------
+    store_path
+        Destination directory (created if needed).
+    index
+        Grouped spike ticks to store; ``spike_times`` is saved as ``int64``.
+    source_path
+        File the spikes were converted from. Its size and mtime are recorded
+        so :func:`is_spike_store_current` can detect a stale store.
+
+    Returns
+    -------
+    pathlib.Path
+        ``store_path``.
+
+    Notes
+    -----
+    ``meta.json`` is removed first and written last, so an interrupted write
+    never leaves a store that reports itself as current.
+    """
+    store = Path(store_path)
+    store.mkdir(parents=True, exist_ok=True)
+    (store / _META_FILE).unlink(missing_ok=True)
+    arrays = {
+        "unit_ids": np.asarray(index.unit_ids),
+        "offsets": np.asarray(index.offsets, dtype=np.int64),
+        "spike_indices": np.asarray(index.spike_times, dtype=np.int64),
+    }
+    for name, array in arrays.items():
+        tmp_path = store / f"{name}.tmp.npy"
+        np.save(tmp_path, array)
+        os.replace(tmp_path, store / f"{name}.npy")
+
+    meta: dict[str, Any] = {"version": SPIKE_STORE_VERSION}
+    if source_path is not None:
+        meta["source"] = _source_signature(source_path)
+    tmp_meta = store / f"{_META_FILE}.tmp"
+    tmp_meta.write_text(json.dumps(meta))
+    os.replace(tmp_meta, store / _META_FILE)
+    return store
+
+
+def is_spike_store_current(
+    store_path: str | Path,
+    source_path: str | Path,
+) -> bool:
+    """Return whether ``store_path`` is a complete store of ``source_path``."""
+    try:
+        meta = json.loads((Path(store_path) / _META_FILE).read_text())
+    except (OSError, ValueError):
+        return False
+    return (
+        meta.get("version") == SPIKE_STORE_VERSION
+        and meta.get("source") == _source_signature(source_path)
+    )
+
+
+def open_spike_store(store_path: str | Path) -> UnitSpikeIndex:
+    """Open a spike store with a memory-mapped spike array.
+
+    Parameters
+    ----------
+    store_path
+        Directory written by :func:`write_spike_store`.
+
+    Returns
+    -------
+    UnitSpikeIndex
+        Index whose ``spike_times`` is a read-only :class:`numpy.memmap`;
+        :meth:`~ephys.data_wrangling.spike_times.UnitSpikeIndex.unit_spike_times`
+        reads only the requested unit.
+
+    Raises
+    ------
+    ValueError
+        If the store is incomplete or was written by an unsupported version.
+    """
+    store = Path(store_path)
+    try:
+        meta = json.loads((store / _META_FILE).read_text())
+    except (OSError, ValueError) as error:
+        msg = f"{store} is not a complete spike store"
+        raise ValueError(msg) from error
+    if meta.get("version") != SPIKE_STORE_VERSION:
+        msg = (
+            f"Unsupported spike store version {meta.get('version')!r}; "
+            f"expected {SPIKE_STORE_VERSION}"
+        )
+        raise ValueError(msg)
+    return UnitSpikeIndex(
+        unit_ids=np.load(store / "unit_ids.npy"),
+        offsets=np.load(store / "offsets.npy"),
+        spike_times=np.load(store / "spike_indices.npy", mmap_mode="r"),
+    )
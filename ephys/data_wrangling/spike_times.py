@@ -3,10 +3,139 @@
 from __future__ import annotations
 
 import copy
+from dataclasses import dataclass
 from typing import Any
 
 import numpy as np
 
+from ephys.processing.ragged import RaggedArray
+
+
+@dataclass(frozen=True)
+class UnitSpikeIndex:
+    """Spike times grouped by unit as offsets into one concatenated array.
+
+    Parameters
+    ----------
+    unit_ids
+        Sorted unique unit labels, shape ``(n_units,)``.
+    offsets
+        ``int64`` boundaries of shape ``(n_units + 1,)``; unit ``k`` owns
+        ``spike_times[offsets[k]:offsets[k + 1]]``.
+    spike_times
+        Spike times concatenated unit by unit. Within a unit, spikes keep
+        their input order (time order for time-sorted exports).
+    """
+
+    unit_ids: np.ndarray
+    offsets: np.ndarray
+    spike_times: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.unit_ids.shape[0])
+
+    def unit_spike_times(self, unit_row: int) -> np.ndarray:
+        """Return a view of the spike times for the unit at ``unit_row``."""
+        return self.spike_times[self.offsets[unit_row] : self.offsets[unit_row + 1]]
+
+    def to_list(self) -> list[np.ndarray]:
+        """Return one view per unit, in ``unit_ids`` order."""
+        return np.split(self.spike_times, self.offsets[1:-1])
+
+
+def group_spike_times_by_label(
+    spike_times: np.ndarray | Any,
+    spike_labels: np.ndarray | Any,
+) -> UnitSpikeIndex:
+    """Group spike times by unit label with one stable argsort.
+
+    Parameters
+    ----------
+    spike_times
+        Spike times (any dtype), one per spike.
+    spike_labels
+        Integer unit label for each spike.
+
+    Returns
+    -------
+    UnitSpikeIndex
+        Per-unit offsets into the regrouped spike times. ``to_list()`` equals
+        ``[spike_times[spike_labels == u] for u in np.unique(spike_labels)]``.
+
+    Raises
+    ------
+    ValueError
+        If ``spike_times`` and ``spike_labels`` differ in length.
+
+    Notes
+    -----
+    Runs in ``O(N log N)`` regardless of the number of units, instead of one
+    full boolean mask per unit.
+    """
+    times = np.asarray(spike_times).ravel()
+    labels = np.asarray(spike_labels).ravel()
+    if times.shape != labels.shape:
+        msg = (
+            "spike_times and spike_labels must have the same length; "
+            f"got {times.shape[0]} and {labels.shape[0]}"
+        )
+        raise ValueError(msg)
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    boundaries = np.flatnonzero(sorted_labels[1:] != sorted_labels[:-1]) + 1
+    starts = np.concatenate(([0], boundaries)) if labels.size else boundaries
+    return UnitSpikeIndex(
+        unit_ids=sorted_labels[starts],
+        offsets=np.concatenate((starts, [labels.size])).astype(np.int64),
+        spike_times=times[order],
+    )
+
+
+def most_common_value_per_label(
+    spike_labels: np.ndarray | Any,
+    values: np.ndarray | Any,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the mode of an integer per-spike value within each unit.
+
+    Parameters
+    ----------
+    spike_labels
+        Unit label for each spike.
+    values
+        Integer value for each spike (e.g. best channel).
+
+    Returns
+    -------
+    unit_ids
+        Sorted unique labels.
+    modes
+        Most frequent value per unit; ties resolve to the smallest value, as
+        :func:`scipy.stats.mode` does.
+
+    Notes
+    -----
+    Uses one ``bincount`` over ``(unit, value)`` pairs, so memory scales with
+    ``n_units * (max(values) - min(values) + 1)``.
+    """
+    labels = np.asarray(spike_labels).ravel()
+    vals = np.asarray(values, dtype=np.int64).ravel()
+    if labels.shape != vals.shape:
+        msg = (
+            "spike_labels and values must have the same length; "
+            f"got {labels.shape[0]} and {vals.shape[0]}"
+        )
+        raise ValueError(msg)
+    unit_ids, unit_rows = np.unique(labels, return_inverse=True)
+    if vals.size == 0:
+        return unit_ids, np.zeros(0, dtype=np.int64)
+    low = int(vals.min())
+    span = int(vals.max()) - low + 1
+    counts = np.bincount(
+        unit_rows.ravel().astype(np.int64) * span + (vals - low),
+        minlength=unit_ids.size * span,
+    ).reshape(unit_ids.size, span)
+    return unit_ids, np.argmax(counts, axis=1).astype(np.int64) + low
+
 
 def count_spikes_in_tick_interval(
     spike_times_ticks: np.ndarray | Any,
@@ -171,6 +300,7 @@ def get_spikes_at_events(
     Parameters
     ----------
     spike_times_ticks: np.ndarray
+        spike times in ticks; need not be sorted.
     event_ticks: np.ndarray
     win_ticks: int
     sampling_rate_hz: int
@@ -178,28 +308,35 @@ def get_spikes_at_events(
     Returns
     -------
     list:
+        for each event, the spike times in seconds relative to the event for
+        spikes strictly inside ``(event - win_ticks, event + win_ticks)``, in
+        their input order.
 
+    Notes
+    -----
+    All window bounds are found with one ``searchsorted`` over a sorted copy
+    of the spike times and every window is gathered in one pass, instead of a
+    full-length mask per event.
     """
+    spikes = np.asarray(spike_times_ticks).ravel()
+    events = np.asarray(event_ticks).ravel()
+    order = None
+    sorted_spikes = spikes
+    if spikes.size > 1 and not np.all(spikes[1:] >= spikes[:-1]):
+        order = np.argsort(spikes, kind="stable")
+        sorted_spikes = spikes[order]
+
+    lower = np.searchsorted(sorted_spikes, events - win_ticks, side="right")
+    upper = np.searchsorted(sorted_spikes, events + win_ticks, side="left")
+    if order is None:
+        in_range = RaggedArray.from_ranges(spikes, lower, upper)
+    else:
+        # Restore input order within each window.
+        positions = RaggedArray.from_ranges(order, lower, upper).sort_rows()
+        in_range = positions.with_values(spikes[positions.values])
 
-    spikes_in_range_s = []
-
-    for event_tick in event_ticks:
-        event_lower_bound_tick = event_tick - win_ticks
-        event_upper_bound_tick = event_tick + win_ticks
-
-        spikes_in_range_ticks = np.take(
-            spike_times_ticks,
-            np.where(
-                (event_lower_bound_tick < spike_times_ticks)
-                & (spike_times_ticks < event_upper_bound_tick)
-            ),
-        )[0]
-
-        spikes_in_range_s.append(
-            spikes_in_range_ticks / sampling_rate_hz - event_tick / sampling_rate_hz
-        )
-
-    return spikes_in_range_s
+    event_s = np.repeat(events / sampling_rate_hz, in_range.lengths)
+    return in_range.with_values(in_range.values / sampling_rate_hz - event_s).to_list()
 
 
 def sort_by_spike_times(spike_times):
@@ -1,11 +1,24 @@
-import csv
+import json
+import os
+import warnings
+from pathlib import Path
+
 import numpy as np
-from scipy import stats
+
+from .spike_times import group_spike_times_by_label, most_common_value_per_label
+
+SPIKESORTER_CACHE_VERSION = 1
+_CACHE_SUFFIX = ".npycache"
+_CACHE_KEY_FILE = "key.json"
+_CACHE_COLUMNS = ("spike_times_s", "spike_labels", "max_channel")
+_HEADER_ROWS = 2
 
 
 def get_spikes(
     csv_path,
     sampling_frequency,
+    *,
+    use_cache=True,
 ):
     """
 
@@ -14,6 +27,8 @@ def get_spikes(
     csv_path: string
     sampling_frequency: float
         in Hertz
+    use_cache: bool
+        Read and write the binary sidecar cache (see :func:`load_spikesorter_columns`)
 
     Returns
     -------
@@ -23,21 +38,20 @@ def get_spikes(
         Each entry is a np.ndarray[int]
     """
 
-    (spike_times, spike_labels, max_channel) = read_spikesorter_csv(csv_path, sampling_frequency)
-
-    neuron_ids = np.unique(spike_labels)
-
-    spike_times_for_each_neuron = []
-
-    for neuron_id in neuron_ids:
-        spike_times_for_each_neuron.append(spike_times[spike_labels == neuron_id])
+    (spike_times, spike_labels, max_channel) = read_spikesorter_csv(
+        csv_path,
+        sampling_frequency,
+        use_cache=use_cache,
+    )
 
-    return spike_times_for_each_neuron
+    return group_spike_times_by_label(spike_times, spike_labels).to_list()
 
 
 def read_spikesorter_csv(
     csv_path,
     sampling_frequency,
+    *,
+    use_cache=True,
 ):
     """
     Sorted spike times from spikesorter (Swindale lab) are exported
@@ -53,6 +67,8 @@ def read_spikesorter_csv(
     csv_path: string
     sampling_frequency: float
         in Hertz
+    use_cache: bool
+        Read and write the binary sidecar cache (see :func:`load_spikesorter_columns`)
 
     Returns
     -------
@@ -64,29 +80,131 @@ def read_spikesorter_csv(
         maximum channel ID for corresponding unit
     """
 
-    unit_list = []
+    spike_times_s, spike_labels, max_channel = load_spikesorter_columns(
+        csv_path,
+        use_cache=use_cache,
+    )
 
-    csvfile = open(csv_path, newline="")
-    reader = csv.reader(csvfile, delimiter=",")
-    for row in reader:
-        unit_list.append(row)
+    # Truncate toward zero, as assigning float ticks into an int array does
+    spike_times = (spike_times_s * sampling_frequency).astype(int)
 
-    unit_list = unit_list[2:]  # Remove header
+    return spike_times, spike_labels, max_channel
 
-    spike_times = np.zeros(len(unit_list), dtype=int)
 
-    spike_labels = np.zeros(len(unit_list), dtype=int)
-    max_channel = np.zeros(len(unit_list), dtype=int)
+def load_spikesorter_columns(csv_path, *, use_cache=True):
+    """
+    Load the three spikesorter CSV columns as NumPy arrays.
 
-    for i in range(len(unit_list)):
-        spike_times[i] = float(unit_list[i][0]) * sampling_frequency
-        spike_labels[i] = unit_list[i][1]
-        max_channel[i] = unit_list[i][2]
+    The CSV is parsed once, column-wise, and the columns are written as
+    ``.npy`` files to a sidecar directory next to the CSV
+    (``<csv_path>.npycache``). The cache is keyed on the CSV size and
+    modification time; later calls with an unchanged CSV read the cached
+    binary arrays instead of parsing text.
 
-    return spike_times, spike_labels, max_channel
+    Parameters
+    ----------
+    csv_path: string
+    use_cache: bool
+        If False, always parse the CSV and leave the cache untouched
 
+    Returns
+    -------
+    np.ndarray[float]:
+        spike times in seconds
+    np.ndarray[int]
+        unit ID
+    np.ndarray[int]:
+        maximum channel ID for corresponding unit
+
+    Notes
+    -----
+    Cache hits and misses both return writable in-memory arrays. A cache
+    that cannot be written (e.g. a read-only data directory) is skipped with
+    a warning.
+    """
 
-def read_best_channel(csv_path, sampling_frequency):
+    csv_path = Path(csv_path)
+    cache_dir = _cache_dir(csv_path)
+    key = _cache_key(csv_path)
+
+    if use_cache:
+        cached = _read_cache(cache_dir, key)
+        if cached is not None:
+            return cached
+
+    columns = _parse_spikesorter_columns(csv_path)
+
+    if use_cache:
+        try:
+            _write_cache(cache_dir, key, columns)
+        except OSError as error:
+            warnings.warn(f"Could not write spikesorter cache {cache_dir}: {error}", stacklevel=2)
+
+    return columns
+
+
+def _parse_spikesorter_columns(csv_path):
+    """Parse the CSV body straight into float seconds and int label/channel columns."""
+    with warnings.catch_warnings():
+        # An export with no spikes only has the header rows
+        warnings.filterwarnings("ignore", message="loadtxt: input contained no data")
+        table = np.loadtxt(
+            csv_path,
+            delimiter=",",
+            skiprows=_HEADER_ROWS,
+            usecols=(0, 1, 2),
+            ndmin=2,
+            dtype=np.float64,
+        )
+    if table.shape[1] != 3:
+        table = np.empty((0, 3), dtype=np.float64)
+
+    spike_times_s = np.ascontiguousarray(table[:, 0])
+    spike_labels = table[:, 1].astype(int)
+    max_channel = table[:, 2].astype(int)
+    return spike_times_s, spike_labels, max_channel
+
+
+def _cache_dir(csv_path):
+    return csv_path.with_name(csv_path.name + _CACHE_SUFFIX)
+
+
+def _cache_key(csv_path):
+    stat = os.stat(csv_path)
+    return {
+        "version": SPIKESORTER_CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def _read_cache(cache_dir, key):
+    """Return cached columns as in-memory arrays, or None if missing or stale."""
+    try:
+        with open(cache_dir / _CACHE_KEY_FILE) as key_file:
+            if json.load(key_file) != key:
+                return None
+        return tuple(np.load(cache_dir / f"{name}.npy") for name in _CACHE_COLUMNS)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(cache_dir, key, columns):
+    """Write columns, then the key, so an interrupted write is never trusted."""
+    cache_dir.mkdir(exist_ok=True)
+    key_path = cache_dir / _CACHE_KEY_FILE
+    key_path.unlink(missing_ok=True)
+    for name, column in zip(_CACHE_COLUMNS, columns):
+        tmp_path = cache_dir / f"{name}.tmp.npy"
+        np.save(tmp_path, column)
+        os.replace(tmp_path, cache_dir / f"{name}.npy")
+    tmp_key_path = cache_dir / f"{_CACHE_KEY_FILE}.tmp"
+    with open(tmp_key_path, "w") as key_file:
+        json.dump(key, key_file)
+    os.replace(tmp_key_path, key_path)
+
+
+def read_best_channel(csv_path, sampling_frequency, *, use_cache=True):
     """
 
     Returns the highest SNR channel for each unique unit in the csv file
@@ -95,6 +213,8 @@ def read_best_channel(csv_path, sampling_frequency):
     ----------
     csv_path: string
     sampling_frequency: float
+    use_cache: bool
+        Read and write the binary sidecar cache (see :func:`load_spikesorter_columns`)
 
     Returns
     -------
@@ -105,13 +225,9 @@ def read_best_channel(csv_path, sampling_frequency):
     spike_times, spike_labels, max_channel = read_spikesorter_csv(
         csv_path,
         sampling_frequency,
+        use_cache=use_cache,
     )
 
-    neuron_ids = np.unique(spike_labels)
-
-    best_channel = []
-
-    for neuron_id in neuron_ids:
-        best_channel.append(stats.mode(max_channel[spike_labels == neuron_id])[0][0])
+    _, best_channel = most_common_value_per_label(spike_labels, max_channel)
 
-    return best_channel
+    return list(best_channel)
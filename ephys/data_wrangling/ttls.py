@@ -1,5 +1,178 @@
+from dataclasses import dataclass
+
 import numpy as np
 
+DEFAULT_TTL_CHUNK_SAMPLES = 1 << 22
+
+
+@dataclass(frozen=True)
+class TtlEdges:
+    """
+    Rising and falling edges of every bit in a packed digital input stream
+
+    Parameters
+    ----------
+    rising: tuple[np.ndarray[np.int64], ...]
+        One array per bit with the first sample index of each high period
+    falling: tuple[np.ndarray[np.int64], ...]
+        One array per bit with the first sample index of each low period
+    initial_word: int
+        Packed word at sample 0 (initial state of every bit)
+    n_samples: int
+        Number of samples in the stream
+    """
+
+    rising: tuple
+    falling: tuple
+    initial_word: int
+    n_samples: int
+
+    @property
+    def n_bits(self):
+        return len(self.rising)
+
+    def initial_state(self, ttl_index):
+        """Return 1 if bit ``ttl_index`` is high at sample 0, else 0."""
+        return (self.initial_word >> ttl_index) & 1
+
+    def high_sample_count(self, ttl_index):
+        """Number of samples in which bit ``ttl_index`` is high."""
+        starts = self.rising[ttl_index]
+        ends = self.falling[ttl_index]
+        if self.initial_state(ttl_index):
+            starts = np.concatenate(([0], starts))
+        if starts.size > ends.size:
+            ends = np.concatenate((ends, [self.n_samples]))
+        return int(np.sum(ends - starts))
+
+
+def extract_ttl_edges(digital_inputs, chunk_samples=DEFAULT_TTL_CHUNK_SAMPLES):
+    """
+
+    Find rising and falling edges of all packed TTL bits in one pass.
+
+    Consecutive words are XOR-ed so that only samples where at least one
+    bit changes are visited; the per-bit work is then done on those few
+    samples only. The input is read in chunks, so a np.memmap of a long
+    recording is processed with flat memory.
+
+    Parameters
+    ----------
+    digital_inputs: np.ndarray[np.uint16] or np.ndarray[np.uint8]
+        Packed digital inputs, one word per sample (may be a np.memmap)
+    chunk_samples: int
+        Number of words read per chunk
+
+    Returns
+    -------
+    TtlEdges
+        Edges for each of the 16 (or 8) bits. Edge ticks match
+        :func:`get_low_to_high_transition_timestamps` and
+        :func:`get_high_to_low_transition_timestamps` on the
+        :func:`find_ttls_on_single_channel_16bit` output for each bit.
+    """
+
+    if digital_inputs.dtype not in (np.uint8, np.uint16):
+        raise ValueError("digital_inputs must be uint8 or uint16 packed words")
+    if chunk_samples < 1:
+        raise ValueError("chunk_samples must be positive")
+
+    n_bits = digital_inputs.dtype.itemsize * 8
+    n_samples = len(digital_inputs)
+    if n_samples == 0:
+        empty = tuple(np.zeros(0, dtype=np.int64) for _ in range(n_bits))
+        return TtlEdges(rising=empty, falling=empty, initial_word=0, n_samples=0)
+
+    rising_parts = [[] for _ in range(n_bits)]
+    falling_parts = [[] for _ in range(n_bits)]
+    initial_word = int(digital_inputs[0])
+    previous_word = digital_inputs[:1]
+
+    for start in range(0, n_samples, chunk_samples):
+        words = np.asarray(digital_inputs[start : start + chunk_samples])
+        changed = words ^ np.concatenate((previous_word, words[:-1]))
+        change_ticks = np.flatnonzero(changed)
+        previous_word = words[-1:]
+        if change_ticks.size == 0:
+            continue
+
+        changed_bits = changed[change_ticks]
+        new_words = words[change_ticks]
+        change_ticks = change_ticks.astype(np.int64) + start
+        for bit in range(n_bits):
+            mask = np.uint16(1 << bit)
+            flipped = (changed_bits & mask) != 0
+            if not flipped.any():
+                continue
+            is_high = (new_words[flipped] & mask) != 0
+            ticks = change_ticks[flipped]
+            rising_parts[bit].append(ticks[is_high])
+            falling_parts[bit].append(ticks[~is_high])
+
+    def join(parts):
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    return TtlEdges(
+        rising=tuple(join(parts) for parts in rising_parts),
+        falling=tuple(join(parts) for parts in falling_parts),
+        initial_word=initial_word,
+        n_samples=n_samples,
+    )
+
+
+def get_ttl_timestamps_from_edges(
+    ttl_edges,
+    ttl_index,
+    isTransitionLowToHigh=None,
+):
+    """
+
+    Same as :func:`get_ttl_timestamps_16bit`, but from precomputed edges,
+    so many TTL lines can be read from one pass over the digital inputs.
+
+    Parameters
+    ----------
+    ttl_edges: TtlEdges
+        Output of :func:`extract_ttl_edges`
+    ttl_index: int
+        zero based index of the TTL channel
+    isTransitionLowToHigh: bool or None
+        If None, the function will attempt to determine
+        the transition type from the data
+    Returns
+    -------
+    np.ndarray[int]:
+        Timestamps for the start of each event, adjusted so
+        that each has a matching off timestamp
+    np.ndarray[int]
+        Timestamps for the end of each event, adjusted so
+        that each has a matching on timestamp
+    """
+
+    if (ttl_index < 0) or (ttl_index >= ttl_edges.n_bits):
+        raise ValueError(f"TTL index must be between 0 and {ttl_edges.n_bits - 1}")
+
+    total_high_ttl = ttl_edges.high_sample_count(ttl_index)
+    transition_guess = _guess_transition_low_to_high(
+        total_high_ttl,
+        ttl_edges.n_samples - total_high_ttl,
+    )
+
+    if isTransitionLowToHigh is None:
+        isTransitionLowToHigh = transition_guess
+    elif isTransitionLowToHigh != transition_guess:
+        print("Warning: isTransitionLowToHigh does not match the data")
+        print("Transition guess: ", transition_guess)
+        print("isTransitionLowToHigh: ", isTransitionLowToHigh)
+
+    lowToHighTimestamps = ttl_edges.rising[ttl_index]
+    highToLowTimestamps = ttl_edges.falling[ttl_index]
+
+    if isTransitionLowToHigh:
+        return match_ttl_timestamps(lowToHighTimestamps, highToLowTimestamps)
+    else:
+        return match_ttl_timestamps(highToLowTimestamps, lowToHighTimestamps)
+
 
 def find_index_of_ttl_event_from_another(
     ttl_events_1,
@@ -20,15 +193,104 @@ def find_index_of_ttl_event_from_another(
 
     Returns
     -------
+    list[int]
+        Index into ttl_events_1 of the closest event for each event in
+        ttl_events_2. Equidistant matches resolve to the earlier event.
+
+    Notes
+    -----
+    Thin wrapper around :func:`match_nearest_events`; ttl_events_1 does not
+    need to be sorted.
+    """
+
+    ttl_events_1 = np.asarray(ttl_events_1).ravel()
+    if ttl_events_1.size == 0:
+        raise ValueError("ttl_events_1 must contain at least one event")
 
+    order = np.argsort(ttl_events_1, kind="stable")
+    indices, _ = match_nearest_events(ttl_events_1[order], ttl_events_2)
+
+    return order[indices].tolist()
+
+
+def match_nearest_events(
+    reference_events,
+    query_events,
+    mode="nearest",
+    max_distance=None,
+):
     """
 
-    output_event_indices = []
-    for event in ttl_events_2:
-        closest_index = np.argmin(np.abs(ttl_events_1 - event))
-        output_event_indices.append(closest_index)
+    Match every query event to an event in a sorted reference stream using
+    binary search, in O((N + M) log N) instead of one full scan per query.
 
-    return output_event_indices
+    Parameters
+    ----------
+    reference_events: np.ndarray
+        Sorted (non-decreasing) event times, e.g. camera frame ticks
+    query_events: np.ndarray
+        Event times to match, in any order, e.g. behavioral event ticks
+    mode: str
+        "nearest": closest reference event (ties go to the earlier one)
+        "left": last reference event at or before the query
+        "right": first reference event at or after the query
+    max_distance: float or None
+        Matches farther than this from the query are rejected
+
+    Returns
+    -------
+    np.ndarray[np.int64]:
+        Index into reference_events for each query, or -1 when there is no
+        match (no event on the requested side, or beyond max_distance).
+        With duplicate reference times, the first duplicate is returned.
+    np.ndarray:
+        Signed offsets reference_events[index] - query_events; 0 where the
+        index is -1
+    """
+
+    reference = np.asarray(reference_events).ravel()
+    query = np.asarray(query_events).ravel()
+    if mode not in ("nearest", "left", "right"):
+        raise ValueError(f"mode must be 'nearest', 'left', or 'right'; got {mode!r}")
+    if reference.size > 1 and np.any(reference[1:] < reference[:-1]):
+        raise ValueError("reference_events must be sorted in non-decreasing order")
+
+    n_reference = reference.size
+    indices = np.full(query.shape, -1, dtype=np.int64)
+    if n_reference == 0:
+        return indices, np.zeros(query.shape, dtype=np.result_type(reference, query))
+
+    # First reference >= query; the value before it is the last one < query
+    right = np.searchsorted(reference, query, side="left")
+    has_right = right < n_reference
+    if mode == "right":
+        indices[has_right] = right[has_right]
+    else:
+        at_or_before = np.searchsorted(reference, query, side="right") - 1
+        if mode == "left":
+            has_left = at_or_before >= 0
+            left_values = reference[at_or_before[has_left]]
+            indices[has_left] = np.searchsorted(reference, left_values, side="left")
+        else:
+            has_left = right > 0
+            left = np.where(has_left, right - 1, 0)
+            right_clipped = np.where(has_right, right, n_reference - 1)
+            left_distance = np.abs(query - reference[left])
+            right_distance = np.abs(reference[right_clipped] - query)
+            use_left = has_left & (~has_right | (left_distance <= right_distance))
+            left_first = np.searchsorted(reference, reference[left], side="left")
+            indices = np.where(use_left, left_first, np.where(has_right, right, -1))
+            indices = indices.astype(np.int64)
+
+    matched = indices >= 0
+    offsets = np.zeros(query.shape, dtype=np.result_type(reference, query))
+    offsets[matched] = reference[indices[matched]] - query[matched]
+    if max_distance is not None:
+        too_far = matched & (np.abs(offsets) > max_distance)
+        indices[too_far] = -1
+        offsets[too_far] = 0
+
+    return indices, offsets
 
 
 def get_ttl_timestamps_16bit(
@@ -198,6 +460,11 @@ def is_ttl_transition_low_to_high(ttl_boolean):
     total_high_ttl = np.count_nonzero(ttl_boolean)
     total_low_ttl = len(ttl_boolean) - total_high_ttl
 
+    return _guess_transition_low_to_high(total_high_ttl, total_low_ttl)
+
+
+def _guess_transition_low_to_high(total_high_ttl, total_low_ttl):
+    """Rest state is whichever level the input occupies most often."""
     print("Total High TTL Values: ", total_high_ttl)
     print("Total Low TTL Values: ", total_low_ttl)
     if total_high_ttl > total_low_ttl:
@@ -14,14 +14,17 @@ Key functionality:
 * Trial Sorting: :func:`sorted_subset_trials` provides convenient subsetting
   and sorting of parallel trial lists by first-spike latency.
 
-These utilities operate directly on lists of numpy arrays (spike times in
-seconds) and are agnostic to specific experimental paradigms.
+These utilities operate on lists of numpy arrays (spike times in seconds) or
+on :class:`~ephys.processing.ragged.RaggedArray` trials, which are merged,
+subset, and reordered without per-trial Python loops. They are agnostic to
+specific experimental paradigms.
 """
 
 from __future__ import annotations
 
 import numpy as np
 
+from ephys.processing.ragged import RaggedArray
 from ephys.processing.spike_align import (
     apply_trial_order,
     sort_order_by_first_spike,
@@ -52,26 +55,30 @@ def merge_spikes_chunk(chunk: list[np.ndarray]) -> np.ndarray:
 
 
 def bin_spike_lists(
-    spike_lists: list[np.ndarray],
+    spike_lists: list[np.ndarray] | RaggedArray,
     trials_per_bin: int,
-) -> list[np.ndarray]:
+) -> list[np.ndarray] | RaggedArray:
     """Collapse consecutive trials into fewer rows (spikes overlaid per row).
 
     Parameters
     ----------
     spike_lists
-        One spike array per trial row, in display order.
+        One spike array per trial row, in display order, or a
+        :class:`~ephys.processing.ragged.RaggedArray`.
     trials_per_bin
         Number of consecutive trials merged into each output row; must be >= 1.
 
     Returns
     -------
-    list[np.ndarray]
+    list[np.ndarray] or RaggedArray
         Shorter list where each element is from :func:`merge_spikes_chunk` over
-        a slice of ``spike_lists``.
+        a slice of ``spike_lists``. A ragged input is merged by dropping row
+        boundaries (no copy) and stays ragged.
     """
     if trials_per_bin <= 1:
         return spike_lists
+    if isinstance(spike_lists, RaggedArray):
+        return spike_lists.merge_rows(trials_per_bin)
     out: list[np.ndarray] = []
     for i in range(0, len(spike_lists), trials_per_bin):
         out.append(merge_spikes_chunk(spike_lists[i : i + trials_per_bin]))
@@ -151,17 +158,27 @@ def effective_raster_linelength(
     return float(min(linelength_cap, 0.82 * spacing))
 
 
+def _subset_trials(
+    trials: list[np.ndarray] | RaggedArray,
+    row_indices: np.ndarray,
+) -> list[np.ndarray] | RaggedArray:
+    if isinstance(trials, RaggedArray):
+        return trials.take(row_indices)
+    return [trials[int(i)] for i in row_indices]
+
+
 def sorted_subset_trials(
-    rel_primary: list[np.ndarray],
-    rel_secondary: list[np.ndarray],
+    rel_primary: list[np.ndarray] | RaggedArray,
+    rel_secondary: list[np.ndarray] | RaggedArray,
     row_indices: np.ndarray,
-) -> tuple[list[np.ndarray], list[np.ndarray]]:
+) -> tuple[list[np.ndarray] | RaggedArray, list[np.ndarray] | RaggedArray]:
     """Subset paired trial lists; sort by first-spike latency on the primary.
 
     Parameters
     ----------
     rel_primary
-        Spike times per trial for ordering (e.g. onset-aligned).
+        Spike times per trial for ordering (e.g. onset-aligned), as a list or
+        :class:`~ephys.processing.ragged.RaggedArray`.
     rel_secondary
         Parallel list (e.g. offset-aligned), same permutation as primary.
     row_indices
@@ -169,9 +186,9 @@ def sorted_subset_trials(
 
     Returns
     -------
-    tuple[list[np.ndarray], list[np.ndarray]]
-        ``(primary_sorted, secondary_sorted)``. Empty lists if
-        ``row_indices`` is empty.
+    tuple
+        ``(primary_sorted, secondary_sorted)``, each the same container type
+        as its input. Empty lists if ``row_indices`` is empty.
 
     Notes
     -----
@@ -180,25 +197,26 @@ def sorted_subset_trials(
     """
     if row_indices.size == 0:
         return [], []
-    r_pri = [rel_primary[int(i)] for i in row_indices]
+    r_pri = _subset_trials(rel_primary, row_indices)
     order = sort_order_by_first_spike(r_pri)
     r_pri_o = apply_trial_order(r_pri, order)
-    r_sec = [rel_secondary[int(i)] for i in row_indices]
+    r_sec = _subset_trials(rel_secondary, row_indices)
     r_sec_o = apply_trial_order(r_sec, order)
     return r_pri_o, r_sec_o
 
 
 def sorted_subset_trials_by_spike_count(
-    rel_primary: list[np.ndarray],
-    rel_secondary: list[np.ndarray],
+    rel_primary: list[np.ndarray] | RaggedArray,
+    rel_secondary: list[np.ndarray] | RaggedArray,
     row_indices: np.ndarray,
-) -> tuple[list[np.ndarray], list[np.ndarray]]:
+) -> tuple[list[np.ndarray] | RaggedArray, list[np.ndarray] | RaggedArray]:
     """Subset paired trial lists; sort by spike count for stacked rasters.
 
     Parameters
     ----------
     rel_primary
-        Spike times per trial for ordering (e.g. onset-aligned).
+        Spike times per trial for ordering (e.g. onset-aligned), as a list or
+        :class:`~ephys.processing.ragged.RaggedArray`.
     rel_secondary
         Parallel list (e.g. offset-aligned), same permutation as primary.
     row_indices
@@ -206,9 +224,9 @@ def sorted_subset_trials_by_spike_count(
 
     Returns
     -------
-    tuple[list[np.ndarray], list[np.ndarray]]
-        ``(primary_sorted, secondary_sorted)``. Empty lists if
-        ``row_indices`` is empty.
+    tuple
+        ``(primary_sorted, secondary_sorted)``, each the same container type
+        as its input. Empty lists if ``row_indices`` is empty.
 
     Notes
     -----
@@ -219,25 +237,26 @@ def sorted_subset_trials_by_spike_count(
     """
     if row_indices.size == 0:
         return [], []
-    r_pri = [rel_primary[int(i)] for i in row_indices]
+    r_pri = _subset_trials(rel_primary, row_indices)
     order = sort_order_by_spike_count_descending(r_pri)[::-1]
     r_pri_o = apply_trial_order(r_pri, order)
-    r_sec = [rel_secondary[int(i)] for i in row_indices]
+    r_sec = _subset_trials(rel_secondary, row_indices)
     r_sec_o = apply_trial_order(r_sec, order)
     return r_pri_o, r_sec_o
 
 
 def sorted_subset_trials_by_spike_count_then_first_spike(
-    rel_primary: list[np.ndarray],
-    rel_secondary: list[np.ndarray],
+    rel_primary: list[np.ndarray] | RaggedArray,
+    rel_secondary: list[np.ndarray] | RaggedArray,
     row_indices: np.ndarray,
-) -> tuple[list[np.ndarray], list[np.ndarray]]:
+) -> tuple[list[np.ndarray] | RaggedArray, list[np.ndarray] | RaggedArray]:
     """Subset paired trial lists; sort by count then first-spike latency.
 
     Parameters
     ----------
     rel_primary
-        Spike times per trial for ordering (e.g. onset-aligned).
+        Spike times per trial for ordering (e.g. onset-aligned), as a list or
+        :class:`~ephys.processing.ragged.RaggedArray`.
     rel_secondary
         Parallel list (e.g. offset-aligned), same permutation as primary.
     row_indices
@@ -245,9 +264,9 @@ def sorted_subset_trials_by_spike_count_then_first_spike(
 
     Returns
     -------
-    tuple[list[np.ndarray], list[np.ndarray]]
-        ``(primary_sorted, secondary_sorted)``. Empty lists if
-        ``row_indices`` is empty.
+    tuple
+        ``(primary_sorted, secondary_sorted)``, each the same container type
+        as its input. Empty lists if ``row_indices`` is empty.
 
     Notes
     -----
@@ -256,9 +275,9 @@ def sorted_subset_trials_by_spike_count_then_first_spike(
     """
     if row_indices.size == 0:
         return [], []
-    r_pri = [rel_primary[int(i)] for i in row_indices]
+    r_pri = _subset_trials(rel_primary, row_indices)
     order = sort_order_by_spike_count_then_first_spike(r_pri)
     r_pri_o = apply_trial_order(r_pri, order)
-    r_sec = [rel_secondary[int(i)] for i in row_indices]
+    r_sec = _subset_trials(rel_secondary, row_indices)
     r_sec_o = apply_trial_order(r_sec, order)
     return r_pri_o, r_sec_o
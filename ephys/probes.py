@@ -140,3 +140,44 @@ def get_probe(probe_type):
         return get_poly3_probe()
     else:
         raise ValueError(f"Unknown probe type: '{probe_type}'. Supported types: 'poly2', 'poly3'")
+
+
+def get_channel_positions(probe):
+    """Return contact positions indexed by device (recording) channel.
+
+    Row ``c`` holds the position of the contact wired to recording channel
+    ``c``, so the result can be indexed with the channel numbers used by
+    voltage arrays and ZCA fits. Contacts without a device channel are
+    dropped; channels without a contact are filled with ``nan``. An unwired
+    probe returns its contact positions in contact order.
+    """
+    if probe.device_channel_indices is None:
+        return np.array(probe.contact_positions, dtype=np.float64)
+    device_channels = np.asarray(probe.device_channel_indices)
+    wired = device_channels >= 0
+    positions = np.full((int(device_channels[wired].max()) + 1, probe.ndim), np.nan)
+    positions[device_channels[wired]] = probe.contact_positions[wired]
+    return positions
+
+
+def get_channel_groups(probe):
+    """Return an integer shank label per device (recording) channel.
+
+    Labels index the sorted unique ``probe.shank_ids`` (a probe without shank
+    ids is a single group ``0``). Channels without a contact get ``-1``, so
+    the result can be passed as ``channel_groups`` to
+    :func:`ephys.processing.referencing.apply_common_median_reference`.
+    An unwired probe returns labels in contact order.
+    """
+    if probe.shank_ids is None:
+        contact_groups = np.zeros(probe.get_contact_count(), dtype=np.int64)
+    else:
+        _, contact_groups = np.unique(np.asarray(probe.shank_ids), return_inverse=True)
+        contact_groups = contact_groups.astype(np.int64).ravel()
+    if probe.device_channel_indices is None:
+        return contact_groups
+    device_channels = np.asarray(probe.device_channel_indices)
+    wired = device_channels >= 0
+    groups = np.full(int(device_channels[wired].max()) + 1, -1, dtype=np.int64)
+    groups[device_channels[wired]] = contact_groups[wired]
+    return groups
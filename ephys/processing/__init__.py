@@ -1,6 +1,7 @@
 """Signal processing utilities for electrophysiology data."""
 
 from ephys.processing.basis import log_raised_cosine_basis, raised_cosine_basis
+from ephys.processing.ragged import RaggedArray, as_ragged
 from ephys.processing.resampling import whittaker_shannon_interpolate
 from ephys.processing.spike_intervals import (
     adjacent_isi_cv2,
@@ -10,7 +11,9 @@ from ephys.processing.spike_intervals import (
 )
 
 __all__ = [
+    "RaggedArray",
     "adjacent_isi_cv2",
+    "as_ragged",
     "collect_adjacent_isi_cv2",
     "collect_adjacent_isi_cv2_by_trial",
     "inter_spike_intervals",
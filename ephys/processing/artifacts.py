@@ -0,0 +1,186 @@
+"""Artifact detection as compact, sorted sample intervals.
+
+A sample is an artifact when any channel deviates from its median by at
+least a per-channel threshold (typically ``n_sigma`` robust standard
+deviations). Instead of a full-length boolean mask, detections are stored as
+sorted, non-overlapping ``[start, stop)`` sample intervals, and dilation is
+done by widening and re-merging those intervals. The same
+:class:`ArtifactIntervals` is stored with a :class:`~ephys.processing.zca.ZcaFit`
+so covariance estimation, spatial diagnostics, and spike alignment can reuse
+it without rescanning the recording.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+_DEFAULT_DETECT_CHUNK_SAMPLES = 65_536
+
+__all__ = [
+    "ArtifactIntervals",
+    "detect_artifact_intervals",
+    "merge_intervals",
+    "mask_to_intervals",
+]
+
+
+def mask_to_intervals(mask: np.ndarray, *, offset: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(starts, stops)`` of the ``True`` runs in a 1D boolean mask."""
+    edges = np.diff(np.asarray(mask, dtype=np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1).astype(np.int64) + int(offset)
+    stops = np.flatnonzero(edges == -1).astype(np.int64) + int(offset)
+    return starts, stops
+
+
+def merge_intervals(
+    starts: np.ndarray,
+    stops: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sort intervals and merge any that overlap or touch."""
+    starts = np.asarray(starts, dtype=np.int64).ravel()
+    stops = np.asarray(stops, dtype=np.int64).ravel()
+    if starts.size == 0:
+        return starts, stops
+    order = np.argsort(starts, kind="stable")
+    starts, stops = starts[order], stops[order]
+    reach = np.maximum.accumulate(stops)
+    opens_group = np.ones(starts.size, dtype=bool)
+    opens_group[1:] = starts[1:] > reach[:-1]
+    first = np.flatnonzero(opens_group)
+    return starts[first], np.maximum.reduceat(stops, first)
+
+
+@dataclass(frozen=True)
+class ArtifactIntervals:
+    """Sorted, non-overlapping artifact sample intervals.
+
+    Parameters
+    ----------
+    starts, stops
+        ``int64`` interval bounds; interval ``i`` covers samples
+        ``[starts[i], stops[i])``.
+    n_samples
+        Length of the recording (or selection) the intervals refer to.
+    """
+
+    starts: np.ndarray
+    stops: np.ndarray
+    n_samples: int
+
+    def __len__(self) -> int:
+        return int(self.starts.shape[0])
+
+    @property
+    def n_artifact_samples(self) -> int:
+        """Total number of samples covered by the intervals."""
+        return int(np.sum(self.stops - self.starts))
+
+    def dilate(self, pad_samples: int) -> ArtifactIntervals:
+        """Widen every interval by ``pad_samples`` on both sides and re-merge."""
+        if pad_samples <= 0 or len(self) == 0:
+            return self
+        starts, stops = merge_intervals(
+            np.maximum(self.starts - int(pad_samples), 0),
+            np.minimum(self.stops + int(pad_samples), self.n_samples),
+        )
+        return ArtifactIntervals(starts=starts, stops=stops, n_samples=self.n_samples)
+
+    def contains(self, samples: np.ndarray) -> np.ndarray:
+        """Return whether each sample index falls inside an interval."""
+        samples = np.asarray(samples, dtype=np.int64)
+        row = np.searchsorted(self.starts, samples, side="right") - 1
+        inside = row >= 0
+        inside[inside] = samples[inside] < self.stops[row[inside]]
+        return inside
+
+    def mask(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Boolean artifact mask for samples ``[start, stop)``."""
+        stop = self.n_samples if stop is None else int(stop)
+        start = int(start)
+        counts = np.zeros(stop - start + 1, dtype=np.int32)
+        first = np.searchsorted(self.stops, start, side="right")
+        last = np.searchsorted(self.starts, stop, side="left")
+        np.add.at(counts, np.clip(self.starts[first:last], start, stop) - start, 1)
+        np.add.at(counts, np.clip(self.stops[first:last], start, stop) - start, -1)
+        return np.cumsum(counts[:-1]) > 0
+
+    def clean_mask(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Boolean mask of non-artifact samples in ``[start, stop)``."""
+        return ~self.mask(start, stop)
+
+
+def detect_artifact_intervals(
+    voltage_matrix: np.ndarray,
+    thresholds: np.ndarray,
+    *,
+    channel_medians: np.ndarray | None = None,
+    channels: np.ndarray | list[int] | None = None,
+    pad_samples: int = 0,
+    chunk_samples: int = _DEFAULT_DETECT_CHUNK_SAMPLES,
+) -> ArtifactIntervals:
+    """Scan a recording chunk by chunk for threshold crossings.
+
+    Parameters
+    ----------
+    voltage_matrix
+        Voltage with shape ``(n_channels, n_samples)``; may be a
+        :class:`numpy.memmap`.
+    thresholds
+        Per-channel absolute deviation at which a sample is an artifact,
+        one per scanned row.
+    channel_medians
+        Per-channel centers subtracted before thresholding, one per scanned
+        row; ``None`` treats ``voltage_matrix`` as already centered.
+    channels
+        Rows to scan (e.g. the good channels); defaults to every row. Only
+        one block of these rows is copied at a time.
+    pad_samples
+        Dilation applied to the detected intervals.
+    chunk_samples
+        Samples scanned per block; only one block is held in memory.
+
+    Returns
+    -------
+    ArtifactIntervals
+        Intervals in the sample coordinates of ``voltage_matrix``.
+    """
+    n_channels, n_samples = voltage_matrix.shape
+    rows = None if channels is None else np.asarray(channels, dtype=np.intp).ravel()
+    if rows is not None:
+        n_channels = rows.size
+    limits = np.asarray(thresholds, dtype=np.float64).reshape(n_channels, 1)
+    centers = (
+        None
+        if channel_medians is None
+        else np.asarray(channel_medians, dtype=np.float64).reshape(n_channels, 1)
+    )
+    if chunk_samples < 1:
+        msg = f"chunk_samples must be positive, got {chunk_samples}"
+        raise ValueError(msg)
+
+    starts: list[np.ndarray] = []
+    stops: list[np.ndarray] = []
+    for start in range(0, n_samples, int(chunk_samples)):
+        block = voltage_matrix[:, start : start + int(chunk_samples)]
+        if rows is not None:
+            block = block[rows]
+        deviation = np.abs(block if centers is None else block - centers)
+        run_starts, run_stops = mask_to_intervals(
+            np.any(deviation >= limits, axis=0),
+            offset=start,
+        )
+        starts.append(run_starts)
+        stops.append(run_stops)
+
+    merged_starts, merged_stops = merge_intervals(
+        np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64),
+        np.concatenate(stops) if stops else np.zeros(0, dtype=np.int64),
+    )
+    intervals = ArtifactIntervals(
+        starts=merged_starts,
+        stops=merged_stops,
+        n_samples=int(n_samples),
+    )
+    return intervals.dilate(pad_samples)
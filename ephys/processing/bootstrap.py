@@ -0,0 +1,253 @@
+"""Vectorized bootstrap confidence intervals for trial-averaged responses.
+
+Resampling trials with replacement and averaging is the same as weighting
+each trial by a multinomial count. :func:`bootstrap_mean_ci` draws those
+weights for a batch of resamples at once (one ``integers`` draw of resampled
+trial indices, counted with one ``bincount``) and gets every bootstrap mean
+of every bin from one matrix product ``weights @ samples``, so 10^4 resamples
+cost a few BLAS calls instead of 10^4 Python iterations. Randomness comes
+only from the :class:`numpy.random.Generator` passed in, and
+:func:`bootstrap_mean_ci_per_unit` spawns one independent child generator per
+unit, so results do not depend on the number of worker processes.
+
+Intervals are either plain percentile intervals or bias-corrected and
+accelerated (BCa) intervals with the acceleration estimated by the
+jackknife.
+"""
+
+from __future__ import annotations
+
+import os
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Literal
+
+import numpy as np
+from scipy.stats import norm
+
+BootstrapMethod = Literal["percentile", "bca"]
+_BATCH_WEIGHTS = 2**22
+
+__all__ = [
+    "BootstrapMethod",
+    "bootstrap_mean_ci",
+    "bootstrap_mean_ci_per_unit",
+    "bootstrap_means",
+]
+
+
+def _as_generator(rng: np.random.Generator | int | None) -> np.random.Generator:
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng)
+
+
+def _as_trial_matrix(samples: np.ndarray) -> np.ndarray:
+    x = np.asarray(samples, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, np.newaxis]
+    if x.ndim != 2:
+        msg = f"samples must be 1D or 2D (trials x bins), got ndim={x.ndim}"
+        raise ValueError(msg)
+    if x.shape[0] < 1:
+        msg = "samples must contain at least one trial"
+        raise ValueError(msg)
+    return x
+
+
+def bootstrap_means(
+    samples: np.ndarray,
+    n_bootstrap: int,
+    *,
+    rng: np.random.Generator | int | None = None,
+    batch_size: int | None = None,
+) -> np.ndarray:
+    """Means of ``n_bootstrap`` trial resamples, shape ``(n_bootstrap, n_bins)``.
+
+    Parameters
+    ----------
+    samples
+        ``(n_trials, n_bins)`` per-trial values (1D is one bin).
+    n_bootstrap
+        Number of resamples.
+    rng
+        Generator, seed, or ``None`` for fresh OS entropy.
+    batch_size
+        Resamples whose multinomial weights are drawn together; defaults to
+        keeping about 4 M weights (32 MiB) per batch.
+    """
+    x = _as_trial_matrix(samples)
+    if n_bootstrap < 1:
+        msg = f"n_bootstrap must be positive, got {n_bootstrap}"
+        raise ValueError(msg)
+    generator = _as_generator(rng)
+    n_trials = x.shape[0]
+    if batch_size is None:
+        batch_size = max(1, _BATCH_WEIGHTS // n_trials)
+    batch_size = max(1, min(int(batch_size), int(n_bootstrap)))
+    out = np.empty((int(n_bootstrap), x.shape[1]), dtype=np.float64)
+    for start in range(0, int(n_bootstrap), batch_size):
+        n_batch = min(start + batch_size, int(n_bootstrap)) - start
+        # Multinomial trial weights, several times faster than Generator.multinomial.
+        picks = generator.integers(0, n_trials, size=(n_batch, n_trials))
+        picks += np.arange(n_batch)[:, np.newaxis] * n_trials
+        weights = np.bincount(picks.ravel(), minlength=n_batch * n_trials)
+        np.matmul(
+            weights.reshape(n_batch, n_trials).astype(np.float64),
+            x,
+            out=out[start : start + n_batch],
+        )
+    out /= n_trials
+    return out
+
+
+def _column_quantiles(sorted_values: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Per-column linear-interpolated quantiles of column-sorted values."""
+    n = sorted_values.shape[0]
+    position = np.clip(q, 0.0, 1.0) * (n - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, n - 1)
+    frac = position - lower
+    columns = np.arange(sorted_values.shape[1])
+    low_values = sorted_values[lower, columns]
+    return low_values + frac * (sorted_values[upper, columns] - low_values)
+
+
+def _bca_quantiles(
+    x: np.ndarray,
+    boot: np.ndarray,
+    alphas: tuple[float, float],
+) -> tuple[np.ndarray, np.ndarray]:
+    """BCa-adjusted lower/upper quantile levels per bin."""
+    n_trials = x.shape[0]
+    theta = x.mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z0 = norm.ppf(np.mean(boot < theta, axis=0))
+        if n_trials > 1:
+            jackknife = (x.sum(axis=0) - x) / (n_trials - 1)
+            deviation = jackknife.mean(axis=0) - jackknife
+            acceleration = np.sum(deviation**3, axis=0) / (
+                6.0 * np.sum(deviation**2, axis=0) ** 1.5
+            )
+        else:
+            acceleration = np.zeros_like(theta)
+        acceleration = np.where(np.isfinite(acceleration), acceleration, 0.0)
+        levels = []
+        for alpha in alphas:
+            z = norm.ppf(alpha)
+            adjusted = norm.cdf(z0 + (z0 + z) / (1.0 - acceleration * (z0 + z)))
+            levels.append(np.where(np.isfinite(adjusted), adjusted, alpha))
+    return levels[0], levels[1]
+
+
+def bootstrap_mean_ci(
+    samples: np.ndarray,
+    *,
+    n_bootstrap: int = 10_000,
+    ci_percentile: float = 95.0,
+    method: BootstrapMethod = "percentile",
+    rng: np.random.Generator | int | None = None,
+    batch_size: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Bootstrap confidence interval of the across-trial mean of each bin.
+
+    Parameters
+    ----------
+    samples
+        ``(n_trials, n_bins)`` per-trial values, e.g. per-trial PSTH counts
+        (1D is one bin).
+    n_bootstrap
+        Number of resamples.
+    ci_percentile
+        Interval coverage in percent.
+    method
+        ``"percentile"`` or ``"bca"`` (bias-corrected and accelerated).
+    rng
+        Generator, seed, or ``None`` for fresh OS entropy.
+    batch_size
+        See :func:`bootstrap_means`.
+
+    Returns
+    -------
+    tuple[numpy.ndarray, numpy.ndarray]
+        ``(lower, upper)``, each of shape ``(n_bins,)``.
+
+    Notes
+    -----
+    Percentile bounds match ``np.percentile`` (linear interpolation) of the
+    bootstrap means at ``(100 - ci_percentile) / 2`` and its complement. BCa
+    shifts those levels per bin by the bias correction ``z0`` (fraction of
+    bootstrap means below the sample mean) and the jackknife acceleration;
+    bins where either is undefined (e.g. constant bins) fall back to the
+    percentile levels.
+    """
+    if method not in ("percentile", "bca"):
+        msg = f"method must be 'percentile' or 'bca', got {method!r}"
+        raise ValueError(msg)
+    if not 0.0 < ci_percentile < 100.0:
+        msg = f"ci_percentile must be in (0, 100), got {ci_percentile}"
+        raise ValueError(msg)
+    x = _as_trial_matrix(samples)
+    boot = bootstrap_means(x, n_bootstrap, rng=rng, batch_size=batch_size)
+    tail = (100.0 - ci_percentile) / 200.0
+    alphas = (tail, 1.0 - tail)
+    if method == "percentile":
+        lower_q = np.full(x.shape[1], alphas[0])
+        upper_q = np.full(x.shape[1], alphas[1])
+    else:
+        lower_q, upper_q = _bca_quantiles(x, boot, alphas)
+    boot.sort(axis=0)
+    return _column_quantiles(boot, lower_q), _column_quantiles(boot, upper_q)
+
+
+def _unit_ci(args: tuple) -> tuple[np.ndarray, np.ndarray]:
+    samples, generator, kwargs = args
+    return bootstrap_mean_ci(samples, rng=generator, **kwargs)
+
+
+def bootstrap_mean_ci_per_unit(
+    samples_per_unit: Sequence[np.ndarray],
+    *,
+    n_bootstrap: int = 10_000,
+    ci_percentile: float = 95.0,
+    method: BootstrapMethod = "percentile",
+    rng: np.random.Generator | int | None = None,
+    batch_size: int | None = None,
+    n_workers: int | None = 1,
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """:func:`bootstrap_mean_ci` for many units, optionally in worker processes.
+
+    Parameters
+    ----------
+    samples_per_unit
+        One ``(n_trials, n_bins)`` array per unit; trial counts may differ.
+    n_bootstrap, ci_percentile, method, rng, batch_size
+        As in :func:`bootstrap_mean_ci`.
+    n_workers
+        Worker processes; ``None`` uses one per CPU and ``1`` runs serially.
+
+    Returns
+    -------
+    list[tuple[numpy.ndarray, numpy.ndarray]]
+        ``(lower, upper)`` per unit, in input order.
+
+    Notes
+    -----
+    Each unit draws from its own child of ``rng`` (``Generator.spawn``), so a
+    seeded run gives the same intervals for any ``n_workers``.
+    """
+    children = _as_generator(rng).spawn(len(samples_per_unit))
+    kwargs = {
+        "n_bootstrap": n_bootstrap,
+        "ci_percentile": ci_percentile,
+        "method": method,
+        "batch_size": batch_size,
+    }
+    jobs = [(samples, child, kwargs) for samples, child in zip(samples_per_unit, children)]
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(int(n_workers), len(jobs)))
+    if n_workers == 1:
+        return [_unit_ci(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_unit_ci, jobs))
@@ -0,0 +1,135 @@
+"""Batched per-trial histograms of spike times.
+
+:func:`per_trial_histogram` bins every trial's spikes against shared edges in
+one pass and returns a ``(n_trials, n_bins)`` array instead of a list of
+:func:`numpy.histogram` results. :func:`bin_indices` picks the bin of every
+value: for uniform edges by arithmetic (``(value - first_edge) / width``,
+corrected by one bin where rounding disagrees with the edges), otherwise by
+one :func:`numpy.searchsorted` over all values. Counts are then a single
+``bincount`` over flattened ``(trial, bin)`` indices, and optional Gaussian
+smoothing is one :func:`scipy.ndimage.gaussian_filter1d` call along the bin
+axis.
+
+Both paths reproduce :func:`numpy.histogram` exactly: bins are half-open
+except the last, which includes its right edge, and values outside the edges
+or NaN are not counted.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+from scipy.ndimage import gaussian_filter1d
+
+from ephys.processing.ragged import RaggedArray, as_ragged
+
+_UNIFORM_RTOL = 1e-9
+
+__all__ = [
+    "bin_indices",
+    "per_trial_histogram",
+    "uniform_bin_width",
+]
+
+
+def _validated_edges(bin_edges: np.ndarray) -> np.ndarray:
+    edges = np.asarray(bin_edges, dtype=np.float64).ravel()
+    if edges.size < 2:
+        msg = "bin_edges must have at least two entries"
+        raise ValueError(msg)
+    if np.any(np.diff(edges) < 0):
+        msg = "bin_edges must increase monotonically"
+        raise ValueError(msg)
+    return edges
+
+
+def uniform_bin_width(bin_edges: np.ndarray, *, rtol: float = _UNIFORM_RTOL) -> float | None:
+    """Return the common bin width if ``bin_edges`` are evenly spaced, else ``None``.
+
+    Edges from :func:`numpy.linspace` or :func:`numpy.arange` count as uniform;
+    spacing may differ from the mean width by ``rtol`` relative.
+    """
+    edges = _validated_edges(bin_edges)
+    widths = np.diff(edges)
+    width = (edges[-1] - edges[0]) / widths.size
+    if not width > 0.0 or not np.isfinite(width):
+        return None
+    if np.all(np.abs(widths - width) <= rtol * width):
+        return float(width)
+    return None
+
+
+def bin_indices(values: np.ndarray, bin_edges: np.ndarray) -> np.ndarray:
+    """Bin index of each value, or ``-1`` when :func:`numpy.histogram` would drop it.
+
+    Parameters
+    ----------
+    values
+        Values to bin; any shape is flattened.
+    bin_edges
+        Monotonic edges of length ``n_bins + 1``.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``int64`` indices in ``[0, n_bins)`` or ``-1``, one per value.
+    """
+    edges = _validated_edges(bin_edges)
+    n_bins = edges.size - 1
+    v = np.asarray(values, dtype=np.float64).ravel()
+    in_range = (v >= edges[0]) & (v <= edges[-1])
+    width = uniform_bin_width(edges)
+    if width is None:
+        idx = np.searchsorted(edges, v, side="right") - 1
+    else:
+        # Same estimate-and-correct scheme numpy.histogram uses for uniform bins.
+        idx = np.zeros(v.shape, dtype=np.int64)
+        idx[in_range] = ((v[in_range] - edges[0]) / width).astype(np.int64)
+        np.clip(idx, 0, n_bins - 1, out=idx)
+        idx[in_range & (v < edges[idx])] -= 1
+        idx[in_range & (v >= edges[idx + 1]) & (idx != n_bins - 1)] += 1
+    idx[v == edges[-1]] = n_bins - 1
+    idx[~in_range] = -1
+    return idx.astype(np.int64, copy=False)
+
+
+def per_trial_histogram(
+    spikes_per_trial: Sequence[np.ndarray] | RaggedArray,
+    bin_edges: np.ndarray,
+    *,
+    smooth_sigma: float | None = None,
+) -> np.ndarray:
+    """Histogram every trial against shared ``bin_edges`` in one pass.
+
+    Parameters
+    ----------
+    spikes_per_trial
+        One 1D array of spike times per trial, or a
+        :class:`~ephys.processing.ragged.RaggedArray` (no copy).
+    bin_edges
+        Monotonic edges of length ``n_bins + 1``, uniform or not.
+    smooth_sigma
+        When given, smooth each trial's counts along the bin axis with
+        :func:`scipy.ndimage.gaussian_filter1d` (sigma in bins).
+
+    Returns
+    -------
+    numpy.ndarray
+        Shape ``(n_trials, n_bins)``; ``int64`` counts, or ``float64`` when
+        smoothed. Row ``i`` equals ``np.histogram(spikes_per_trial[i],
+        bins=bin_edges)[0]`` (smoothed like a per-row ``gaussian_filter1d``).
+    """
+    edges = _validated_edges(bin_edges)
+    n_bins = edges.size - 1
+    trials = as_ragged(spikes_per_trial)
+    bins = bin_indices(trials.values, edges)
+    valid = bins >= 0
+    flat = trials.row_ids()[valid] * n_bins + bins[valid]
+    counts = np.bincount(flat, minlength=trials.n_rows * n_bins)
+    counts = counts.reshape(trials.n_rows, n_bins).astype(np.int64, copy=False)
+    if smooth_sigma is None:
+        return counts
+    if counts.size == 0:
+        return counts.astype(np.float64)
+    return gaussian_filter1d(counts.astype(np.float64), sigma=smooth_sigma, axis=1)
@@ -0,0 +1,267 @@
+"""Population spike counts: units x trials x bins in one vectorized pass.
+
+Population heatmaps need, for every unit, the per-trial histogram of spike
+times relative to a shared set of events. Instead of calling
+:func:`~ephys.processing.spike_align.spikes_relative_to_events_ticks` and
+:func:`~ephys.processing.spike_align.per_trial_bin_counts` once per unit,
+:func:`population_bin_counts` offsets each unit's spike ticks into a disjoint
+key range, finds every ``(unit, trial)`` window with one ``searchsorted``,
+and histograms all gathered spikes with one ``bincount``. Units can be
+processed in chunks to bound memory, on several threads, and returned as a
+dense array or as :class:`SparseBinCounts`.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Literal, overload
+
+import numpy as np
+from numpy.typing import ArrayLike, DTypeLike
+
+from ephys.processing.histogram import per_trial_histogram
+from ephys.processing.ragged import RaggedArray
+
+_MAX_KEY = 2**62
+
+__all__ = [
+    "SparseBinCounts",
+    "population_bin_counts",
+]
+
+
+@dataclass(frozen=True)
+class SparseBinCounts:
+    """Nonzero entries of a ``(n_units, n_trials, n_bins)`` count tensor.
+
+    Parameters
+    ----------
+    shape
+        ``(n_units, n_trials, n_bins)``.
+    units, trials, bins
+        ``int64`` coordinates of each nonzero entry, sorted unit-major.
+    counts
+        Spike count at each coordinate.
+    """
+
+    shape: tuple[int, int, int]
+    units: np.ndarray
+    trials: np.ndarray
+    bins: np.ndarray
+    counts: np.ndarray
+
+    @property
+    def nnz(self) -> int:
+        return int(self.counts.size)
+
+    def to_dense(self) -> np.ndarray:
+        """Expand to a dense array of ``counts.dtype``."""
+        out = np.zeros(self.shape, dtype=self.counts.dtype)
+        out[self.units, self.trials, self.bins] = self.counts
+        return out
+
+    def unit_counts(self, unit: int) -> np.ndarray:
+        """Dense ``(n_trials, n_bins)`` counts of one unit."""
+        start, stop = np.searchsorted(self.units, [unit, unit + 1])
+        out = np.zeros(self.shape[1:], dtype=self.counts.dtype)
+        out[self.trials[start:stop], self.bins[start:stop]] = self.counts[start:stop]
+        return out
+
+    def trial_mean(self) -> np.ndarray:
+        """Mean count per bin across trials, ``float64`` ``(n_units, n_bins)``."""
+        n_units, n_trials, n_bins = self.shape
+        totals = np.bincount(
+            self.units * n_bins + self.bins,
+            weights=self.counts,
+            minlength=n_units * n_bins,
+        ).reshape(n_units, n_bins)
+        return totals / n_trials if n_trials else np.full((n_units, n_bins), np.nan)
+
+
+def _chunk_bin_counts(
+    unit_ticks: RaggedArray,
+    events: np.ndarray,
+    window: tuple[int, int],
+    edges: np.ndarray,
+    sampling_rate_hz: float,
+) -> np.ndarray:
+    """Dense ``(n_units, n_trials, n_bins)`` int64 counts for a chunk of units."""
+    n_units, n_trials, n_bins = len(unit_ticks), events.size, edges.size - 1
+    ticks = unit_ticks.values
+    if ticks.size == 0 or n_trials == 0:
+        return np.zeros((n_units, n_trials, n_bins), dtype=np.int64)
+
+    lo_off, hi_off = window
+    base = min(int(ticks.min()), int(events.min()) + lo_off)
+    span = max(int(ticks.max()), int(events.max()) + hi_off) - base + 1
+    if n_units * span >= _MAX_KEY:
+        msg = "spike tick range too large for one chunk; lower units_per_chunk"
+        raise ValueError(msg)
+    keys = unit_ticks.row_ids() * span + (ticks - base)
+    if np.any(keys[1:] < keys[:-1]):
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        ticks = ticks[order]
+
+    unit_keys = np.arange(n_units, dtype=np.int64)[:, np.newaxis] * span - base
+    lower = np.searchsorted(keys, (unit_keys + (events + lo_off)).ravel(), side="left")
+    upper = np.searchsorted(keys, (unit_keys + (events + hi_off)).ravel(), side="left")
+    gathered = RaggedArray.from_ranges(ticks, lower, upper)
+
+    event_s = np.tile(events.astype(np.float64) / sampling_rate_hz, n_units)
+    rel_s = gathered.values.astype(np.float64) / sampling_rate_hz - np.repeat(
+        event_s, gathered.lengths
+    )
+    counts = per_trial_histogram(gathered.with_values(rel_s), edges)
+    return counts.reshape(n_units, n_trials, n_bins)
+
+
+@overload
+def population_bin_counts(
+    unit_spike_ticks: Sequence[np.ndarray] | RaggedArray,
+    event_ticks: ArrayLike,
+    bin_edges_s: ArrayLike,
+    sampling_rate_hz: float,
+    *,
+    units_per_chunk: int | None = None,
+    n_workers: int | None = 1,
+    sparse: Literal[False] = ...,
+    dtype: DTypeLike = np.int32,
+) -> np.ndarray: ...
+
+
+@overload
+def population_bin_counts(
+    unit_spike_ticks: Sequence[np.ndarray] | RaggedArray,
+    event_ticks: ArrayLike,
+    bin_edges_s: ArrayLike,
+    sampling_rate_hz: float,
+    *,
+    units_per_chunk: int | None = None,
+    n_workers: int | None = 1,
+    sparse: Literal[True],
+    dtype: DTypeLike = np.int32,
+) -> SparseBinCounts: ...
+
+
+def population_bin_counts(
+    unit_spike_ticks: Sequence[np.ndarray] | RaggedArray,
+    event_ticks: ArrayLike,
+    bin_edges_s: ArrayLike,
+    sampling_rate_hz: float,
+    *,
+    units_per_chunk: int | None = None,
+    n_workers: int | None = 1,
+    sparse: bool = False,
+    dtype: DTypeLike = np.int32,
+) -> np.ndarray | SparseBinCounts:
+    """Count every unit's spikes in event-relative bins for every trial.
+
+    Parameters
+    ----------
+    unit_spike_ticks
+        Spike sample indices per unit, as a list of arrays or a
+        :class:`~ephys.processing.ragged.RaggedArray` with one row per unit
+        (e.g. ``RaggedArray(index.spike_times, index.offsets)`` for a
+        :class:`~ephys.data_wrangling.spike_times.UnitSpikeIndex`). Rows
+        sorted in time skip an internal sort.
+    event_ticks
+        Alignment sample index of each trial.
+    bin_edges_s
+        Monotonic bin edges in seconds relative to each event.
+    sampling_rate_hz
+        Rate converting ticks to seconds.
+    units_per_chunk
+        Units processed together; bounds the temporary memory to about one
+        chunk's gathered spikes plus its dense counts. ``None`` processes all
+        units at once.
+    n_workers
+        Threads processing chunks concurrently; ``None`` uses one per CPU.
+    sparse
+        Return :class:`SparseBinCounts` instead of a dense array.
+    dtype
+        Count dtype of the result.
+
+    Returns
+    -------
+    numpy.ndarray or SparseBinCounts
+        Counts of shape ``(n_units, n_trials, n_bins)``.
+
+    Raises
+    ------
+    ValueError
+        If ``sampling_rate_hz`` or ``units_per_chunk`` is not positive, or the
+        bin edges are invalid.
+
+    Notes
+    -----
+    Relative times are computed as in
+    :func:`~ephys.processing.spike_align.spikes_relative_to_events_ticks` and
+    binned as :func:`numpy.histogram` does, so ``counts[u]`` equals
+    ``per_trial_bin_counts(spikes_relative_to_events_ticks(units[u], events,
+    win_ticks, fs), bin_edges_s)`` whenever the ``win_ticks`` window covers
+    the bin edges.
+    """
+    if sampling_rate_hz <= 0:
+        msg = f"sampling_rate_hz must be positive, got {sampling_rate_hz}"
+        raise ValueError(msg)
+    edges = np.asarray(bin_edges_s, dtype=np.float64).ravel()
+    if edges.size < 2 or np.any(np.diff(edges) < 0):
+        msg = "bin_edges_s must be monotonic with at least two entries"
+        raise ValueError(msg)
+    if isinstance(unit_spike_ticks, RaggedArray):
+        units = unit_spike_ticks.astype(np.int64)
+    else:
+        units = RaggedArray.from_list(unit_spike_ticks, dtype=np.int64)
+    events = np.asarray(event_ticks, dtype=np.int64).ravel()
+    n_units, n_trials, n_bins = len(units), events.size, edges.size - 1
+
+    if units_per_chunk is None:
+        units_per_chunk = max(1, n_units)
+    if units_per_chunk < 1:
+        msg = f"units_per_chunk must be positive, got {units_per_chunk}"
+        raise ValueError(msg)
+    window = (
+        math.floor(edges[0] * sampling_rate_hz) - 1,
+        math.ceil(edges[-1] * sampling_rate_hz) + 2,
+    )
+    starts = range(0, n_units, int(units_per_chunk))
+    dense = None if sparse else np.zeros((n_units, n_trials, n_bins), dtype=dtype)
+
+    def count_chunk(start: int) -> tuple[np.ndarray, ...] | None:
+        stop = min(start + int(units_per_chunk), n_units)
+        counts = _chunk_bin_counts(units[start:stop], events, window, edges, sampling_rate_hz)
+        if dense is not None:
+            dense[start:stop] = counts
+            return None
+        unit, trial, bin_ = np.nonzero(counts)
+        return unit + start, trial, bin_, counts[unit, trial, bin_].astype(dtype)
+
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, int(n_workers))
+    if n_workers == 1 or len(starts) == 1:
+        parts = [count_chunk(start) for start in starts]
+    else:
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            parts = list(executor.map(count_chunk, starts))
+
+    if dense is not None:
+        return dense
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return SparseBinCounts(
+            (n_units, n_trials, n_bins), empty, empty, empty, np.zeros(0, dtype=dtype)
+        )
+    unit, trial, bin_, counts = (np.concatenate(column) for column in zip(*parts))
+    return SparseBinCounts(
+        (n_units, n_trials, n_bins),
+        unit.astype(np.int64),
+        trial.astype(np.int64),
+        bin_.astype(np.int64),
+        counts,
+    )
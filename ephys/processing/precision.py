@@ -0,0 +1,44 @@
+"""Floating-point precision policy for the preprocessing pipeline.
+
+Raw Intan voltage is float32, but several SciPy/NumPy routines (float64 SOS
+coefficients in ``sosfiltfilt``, ``np.cov``, float64 whitening matrices)
+silently upcast it to float64. Functions that accept a ``dtype`` argument
+use :func:`resolve_processing_dtype` so that:
+
+* ``None`` keeps each function's historical behavior (float64 results),
+* ``"float32"`` keeps inputs, coefficients, and full-size temporaries in
+  float32, halving memory traffic at a precision well below one int16 count,
+* ``"float64"`` forces double precision regardless of the input dtype.
+"""
+
+from __future__ import annotations
+
+from typing import Literal
+
+import numpy as np
+
+ProcessingDtype = Literal["float32", "float64"]
+
+__all__ = [
+    "ProcessingDtype",
+    "resolve_processing_dtype",
+]
+
+
+def resolve_processing_dtype(
+    dtype: ProcessingDtype | np.dtype | type | None,
+) -> np.dtype | None:
+    """Validate a working dtype, returning ``None`` for the legacy default.
+
+    Raises
+    ------
+    ValueError
+        If ``dtype`` is not float32 or float64.
+    """
+    if dtype is None:
+        return None
+    resolved = np.dtype(dtype)
+    if resolved not in (np.dtype(np.float32), np.dtype(np.float64)):
+        msg = f"dtype must be float32 or float64, got {resolved}"
+        raise ValueError(msg)
+    return resolved
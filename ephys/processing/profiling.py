@@ -0,0 +1,204 @@
+"""Stage-level timing, byte counts, and peak memory for preprocessing runs.
+
+Pipelines wrap each named step in :meth:`StageProfiler.stage`; repeated
+stages (e.g. one per streamed chunk) are aggregated under their name. Library
+functions take an optional ``profiler`` and use :func:`profile_stage`, which
+is a no-op when it is ``None``.
+
+Peak resident memory is measured per stage on Linux by resetting the
+kernel's RSS high-water mark (``/proc/self/clear_refs``) when a stage starts
+and reading ``VmHWM`` when it ends. Where that is unavailable the
+process-lifetime peak from :func:`resource.getrusage` is reported instead,
+and :attr:`StageProfiler.peak_rss_per_stage` is ``False``.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import time
+from collections.abc import Generator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+PROFILE_REPORT_VERSION = 1
+_PROC_STATUS = Path("/proc/self/status")
+_PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+__all__ = [
+    "PROFILE_REPORT_VERSION",
+    "StageProfile",
+    "StageProfiler",
+    "profile_stage",
+]
+
+
+def _read_hwm_bytes() -> int | None:
+    """Return ``VmHWM`` from ``/proc/self/status`` in bytes, if available."""
+    try:
+        for line in _PROC_STATUS.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _reset_hwm() -> bool:
+    """Reset the RSS high-water mark to the current RSS (Linux >= 4.0)."""
+    try:
+        _PROC_CLEAR_REFS.write_text("5")
+    except OSError:
+        return False
+    return True
+
+
+def _process_peak_rss_bytes() -> int | None:
+    """Process-lifetime peak RSS from ``getrusage``."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+@dataclass(frozen=True)
+class StageProfile:
+    """Aggregated measurements for one named stage.
+
+    Parameters
+    ----------
+    stage
+        Stage name.
+    calls
+        Number of times the stage ran.
+    seconds
+        Total wall time over all calls.
+    n_bytes
+        Total bytes the stage processed, as declared by the caller.
+    peak_rss_bytes
+        Largest resident set size observed during any call, or ``None``.
+    """
+
+    stage: str
+    calls: int
+    seconds: float
+    n_bytes: int
+    peak_rss_bytes: int | None
+
+    @property
+    def mib_per_s(self) -> float | None:
+        """Throughput in MiB/s, or ``None`` when no bytes were declared."""
+        if self.n_bytes <= 0 or self.seconds <= 0.0:
+            return None
+        return self.n_bytes / 2**20 / self.seconds
+
+
+class StageProfiler:
+    """Collect :class:`StageProfile` records for the stages of a run."""
+
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self._stages: dict[str, StageProfile] = {}
+        self._active_child_peaks: list[int] = []
+        self.peak_rss_per_stage = _read_hwm_bytes() is not None and _reset_hwm()
+
+    @contextmanager
+    def stage(self, name: str, n_bytes: int = 0) -> Generator[None, None, None]:
+        """Time the enclosed block as ``name``, declaring ``n_bytes`` processed.
+
+        Stages may nest; an outer stage's peak includes its inner stages and
+        whatever it reached before an inner stage reset the high-water mark.
+        """
+        if self.peak_rss_per_stage:
+            if self._active_child_peaks:
+                before = _read_hwm_bytes()
+                if before is not None:
+                    self._active_child_peaks[-1] = max(self._active_child_peaks[-1], before)
+            _reset_hwm()
+        self._active_child_peaks.append(0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            child_peak = self._active_child_peaks.pop()
+            peak = _read_hwm_bytes() if self.peak_rss_per_stage else _process_peak_rss_bytes()
+            if peak is not None:
+                peak = max(peak, child_peak)
+                if self._active_child_peaks:
+                    self._active_child_peaks[-1] = max(self._active_child_peaks[-1], peak)
+            self._record(name, seconds, int(n_bytes), peak)
+
+    def _record(self, name: str, seconds: float, n_bytes: int, peak: int | None) -> None:
+        previous = self._stages.get(name)
+        if previous is None:
+            self._stages[name] = StageProfile(name, 1, seconds, n_bytes, peak)
+            return
+        peaks = [value for value in (previous.peak_rss_bytes, peak) if value is not None]
+        self._stages[name] = StageProfile(
+            name,
+            previous.calls + 1,
+            previous.seconds + seconds,
+            previous.n_bytes + n_bytes,
+            max(peaks) if peaks else None,
+        )
+
+    def stages(self) -> tuple[StageProfile, ...]:
+        """Stage records in the order each stage first ran."""
+        return tuple(self._stages.values())
+
+    def to_dict(self) -> dict[str, object]:
+        """JSON-ready report with every stage and the run totals."""
+        return {
+            "version": PROFILE_REPORT_VERSION,
+            "wall_seconds": time.perf_counter() - self._started,
+            "process_peak_rss_bytes": _process_peak_rss_bytes(),
+            "peak_rss_per_stage": self.peak_rss_per_stage,
+            "stages": [
+                {**asdict(record), "mib_per_s": record.mib_per_s} for record in self.stages()
+            ],
+        }
+
+    def write_json(self, path: str | Path) -> Path:
+        """Write :meth:`to_dict` to ``path`` and return it."""
+        output = Path(path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(self.to_dict(), indent=2))
+        return output
+
+    def format_table(self) -> str:
+        """Fixed-width summary table of the stages, slowest share first column."""
+        records = self.stages()
+        total = sum(record.seconds for record in records)
+        lines = [
+            f"{'stage':<18} {'calls':>6} {'seconds':>9} {'share':>6} "
+            f"{'MiB':>10} {'MiB/s':>9} {'peak RSS MiB':>13}"
+        ]
+        for record in records:
+            share = record.seconds / total if total > 0.0 else 0.0
+            throughput = "-" if record.mib_per_s is None else f"{record.mib_per_s:.1f}"
+            peak = (
+                "-" if record.peak_rss_bytes is None else f"{record.peak_rss_bytes / 2**20:.1f}"
+            )
+            lines.append(
+                f"{record.stage:<18} {record.calls:>6d} {record.seconds:>9.3f} {share:>6.1%} "
+                f"{record.n_bytes / 2**20:>10.1f} {throughput:>9} {peak:>13}"
+            )
+        return "\n".join(lines)
+
+
+def profile_stage(
+    profiler: StageProfiler | None,
+    name: str,
+    n_bytes: int = 0,
+) -> AbstractContextManager[None]:
+    """Return ``profiler.stage(name, n_bytes)``, or a no-op when ``profiler`` is ``None``."""
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name, n_bytes)
@@ -13,6 +13,7 @@ from __future__ import annotations
 
 import numpy as np
 
+from ephys.processing.ragged import RaggedArray, as_ragged
 from ephys.processing.spike_align import (
     mean_spike_probability_per_bin,
     per_trial_bin_counts,
@@ -20,7 +21,7 @@ from ephys.processing.spike_align import (
 
 
 def mean_psth_from_relative_spikes(
-    rel_per_trial: list[np.ndarray],
+    rel_per_trial: list[np.ndarray] | RaggedArray,
     bin_edges: np.ndarray,
 ) -> np.ndarray | None:
     """Mean spike count per bin across trials; shape ``(n_bins,)``.
@@ -28,7 +29,8 @@ def mean_psth_from_relative_spikes(
     Parameters
     ----------
     rel_per_trial
-        Spike times (seconds) relative to one alignment event per trial.
+        Spike times (seconds) relative to one alignment event per trial, as
+        a list or :class:`~ephys.processing.ragged.RaggedArray`.
     bin_edges
         Shared histogram edges in seconds.
 
@@ -46,7 +48,7 @@ def mean_psth_from_relative_spikes(
 
 
 def burst_trial_fraction_within_onset_window(
-    rel_per_trial: list[np.ndarray],
+    rel_per_trial: list[np.ndarray] | RaggedArray,
     *,
     window_end_s: float = 0.005,
     window_start_s: float = 0.0,
@@ -60,7 +62,8 @@ def burst_trial_fraction_within_onset_window(
     Parameters
     ----------
     rel_per_trial
-        Per-trial spike times in seconds relative to contact onset.
+        Per-trial spike times in seconds relative to contact onset, as a list
+        or :class:`~ephys.processing.ragged.RaggedArray`.
     window_end_s
         Right edge of the inclusion window (default ``0.005`` = 5 ms).
     window_start_s
@@ -73,14 +76,10 @@ def burst_trial_fraction_within_onset_window(
     """
     if not rel_per_trial:
         return None
-    n_trials = len(rel_per_trial)
-    n_burst_trials = 0
-    for rel in rel_per_trial:
-        t = np.asarray(rel, dtype=np.float64)
-        in_win = (t >= window_start_s) & (t <= window_end_s)
-        if int(np.sum(in_win)) > 1:
-            n_burst_trials += 1
-    return float(n_burst_trials) / float(n_trials)
+    trials = as_ragged(rel_per_trial)
+    t = trials.values
+    n_in_window = trials.row_counts((t >= window_start_s) & (t <= window_end_s))
+    return float(np.count_nonzero(n_in_window > 1)) / float(len(trials))
 
 
 def peak_bin_center_times_from_mean_psth(
@@ -5,6 +5,8 @@ from __future__ import annotations
 import numpy as np
 from scipy.signal import resample_poly
 
+from ephys.processing.precision import ProcessingDtype, resolve_processing_dtype
+
 
 def whittaker_shannon_interpolate(
     data: np.ndarray,
@@ -13,6 +15,7 @@ def whittaker_shannon_interpolate(
     window_half_len: int | None = None,
     beta: float = 5.0,
     axis: int = -1,
+    dtype: ProcessingDtype | None = None,
 ) -> np.ndarray:
     """
     Upsample a signal using Whittaker-Shannon (windowed sinc) interpolation.
@@ -39,12 +42,20 @@ def whittaker_shannon_interpolate(
         good stopband attenuation.
     axis : int, optional
         The axis along which to resample. Default is -1.
+    dtype : {"float32", "float64"} or None, optional
+        Working and output dtype. The FIR filter is built in the dtype of the
+        (cast) input, so float32 data is interpolated without float64
+        temporaries. Default ``None`` resamples ``data`` as given.
 
     Returns
     -------
     np.ndarray
         The interpolated (resampled) signal.
     """
+    work_dtype = resolve_processing_dtype(dtype)
+    if work_dtype is not None:
+        data = np.asarray(data, dtype=work_dtype)
+
     if window_half_len is None:
         window_half_len = 10 * max(up_factor, down_factor)
 
@@ -0,0 +1,254 @@
+"""Lazy SpikeInterface recording that preprocesses Intan data on demand.
+
+:class:`IntanPreprocessedRecording` wraps a memory-mapped ``amplifier.dat``
+and runs the same bandpass -> CMR -> ZCA chain as
+:func:`~ephys.processing.streaming.preprocess_time_range` on each
+``get_traces`` request, reading only the requested frames plus filter
+padding. SpikeInterface motion estimation, interpolation, and the chunked
+binary writer can then consume it without the recording ever being
+materialized in memory.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+from spikeinterface.core import BaseRecording, BaseRecordingSegment, write_binary_recording
+from spikeinterface.preprocessing import scale
+
+from ephys.data_wrangling.intan import INTAN_BIT_TO_uV, IntanAmplifierReader
+from ephys.processing.filtering import (
+    DEFAULT_PAD_TOLERANCE,
+    design_intan_sos_bandpass,
+    sos_filtfilt_pad_samples,
+)
+from ephys.processing.precision import ProcessingDtype, resolve_processing_dtype
+from ephys.processing.streaming import preprocess_time_range
+from ephys.processing.zca import ZcaFit
+
+__all__ = [
+    "IntanPreprocessedRecording",
+    "write_intan_int16_recording",
+]
+
+
+class IntanPreprocessedRecording(BaseRecording):
+    """SpikeInterface recording of bandpassed (and referenced) Intan voltage.
+
+    Traces are returned in microvolts as ``(n_frames, n_channels)`` arrays of
+    ``dtype``; channel gains are ``1`` and offsets ``0``.
+
+    Parameters
+    ----------
+    filepath
+        Path to the interleaved int16 ``amplifier.dat``.
+    channel_count
+        Number of interleaved amplifier channels.
+    sampling_frequency
+        Sampling rate in hertz.
+    sos
+        Bandpass SOS coefficients; defaults to
+        :func:`~ephys.processing.filtering.design_intan_sos_bandpass` at
+        ``sampling_frequency``.
+    good_channels
+        Channels used for CMR and ZCA; defaults to every channel.
+    common_median_reference
+        Subtract the good-channel median at every sample.
+    cmr_channel_groups
+        Optional group label per channel for per-shank CMR.
+    cmr_dead_channels
+        Also subtract the median from channels outside ``good_channels``.
+    zca_fit
+        When given, whiten the good channels with this fit after CMR.
+    rescale_amplitude
+        Passed to :func:`~ephys.processing.zca.apply_zca_fit`.
+    pad_samples
+        Samples read on each side of a request before filtering; defaults to
+        :func:`~ephys.processing.filtering.sos_filtfilt_pad_samples` at
+        :data:`~ephys.processing.filtering.DEFAULT_PAD_TOLERANCE`.
+    bit_to_uV
+        Scale from ADC counts to microvolts.
+    dtype
+        Working and output dtype (``"float32"`` by default).
+
+    Notes
+    -----
+    Requests of any size agree with whole-recording processing to within the
+    pad tolerance, so results do not depend on SpikeInterface's chunking.
+    The recording pickles by its constructor arguments, which lets
+    ``n_jobs > 1`` process pools rebuild it in each worker.
+    """
+
+    def __init__(
+        self,
+        filepath: str | Path,
+        channel_count: int,
+        sampling_frequency: float,
+        *,
+        sos: np.ndarray | None = None,
+        good_channels: np.ndarray | list[int] | None = None,
+        common_median_reference: bool = False,
+        cmr_channel_groups: np.ndarray | list[int] | None = None,
+        cmr_dead_channels: bool = False,
+        zca_fit: ZcaFit | None = None,
+        rescale_amplitude: bool = True,
+        pad_samples: int | None = None,
+        bit_to_uV: float = INTAN_BIT_TO_uV,
+        dtype: ProcessingDtype = "float32",
+    ) -> None:
+        work_dtype = resolve_processing_dtype(dtype)
+        if work_dtype is None:
+            msg = "dtype must be float32 or float64, got None"
+            raise ValueError(msg)
+        if sos is None:
+            sos = design_intan_sos_bandpass(sampling_rate_hz=sampling_frequency)
+        sos = np.asarray(sos, dtype=np.float64)
+        if pad_samples is None:
+            pad_samples = sos_filtfilt_pad_samples(sos, tolerance=DEFAULT_PAD_TOLERANCE)
+        reader = IntanAmplifierReader(filepath, channel_count, bit_to_uV=bit_to_uV)
+
+        BaseRecording.__init__(
+            self,
+            sampling_frequency=float(sampling_frequency),
+            channel_ids=list(range(reader.n_channels)),
+            dtype=work_dtype,
+        )
+        self.set_channel_gains(1.0)
+        self.set_channel_offsets(0.0)
+        self.add_recording_segment(
+            _IntanPreprocessedSegment(
+                reader,
+                float(sampling_frequency),
+                sos=sos,
+                pad_samples=int(pad_samples),
+                good_channels=good_channels,
+                common_median_reference=common_median_reference,
+                cmr_channel_groups=cmr_channel_groups,
+                cmr_dead_channels=cmr_dead_channels,
+                zca_fit=zca_fit,
+                rescale_amplitude=rescale_amplitude,
+                dtype=work_dtype,
+            )
+        )
+        self._serializability["json"] = False
+        self._kwargs = {
+            "filepath": str(Path(filepath).absolute()),
+            "channel_count": int(channel_count),
+            "sampling_frequency": float(sampling_frequency),
+            "sos": sos,
+            "good_channels": good_channels,
+            "common_median_reference": common_median_reference,
+            "cmr_channel_groups": cmr_channel_groups,
+            "cmr_dead_channels": cmr_dead_channels,
+            "zca_fit": zca_fit,
+            "rescale_amplitude": rescale_amplitude,
+            "pad_samples": int(pad_samples),
+            "bit_to_uV": float(bit_to_uV),
+            "dtype": work_dtype.name,
+        }
+
+
+class _IntanPreprocessedSegment(BaseRecordingSegment):
+    """Single segment that preprocesses each requested frame range."""
+
+    def __init__(
+        self,
+        reader: IntanAmplifierReader,
+        sampling_frequency: float,
+        *,
+        sos: np.ndarray,
+        pad_samples: int,
+        good_channels: np.ndarray | list[int] | None,
+        common_median_reference: bool,
+        cmr_channel_groups: np.ndarray | list[int] | None,
+        cmr_dead_channels: bool,
+        zca_fit: ZcaFit | None,
+        rescale_amplitude: bool,
+        dtype: np.dtype,
+    ) -> None:
+        BaseRecordingSegment.__init__(self, sampling_frequency=sampling_frequency)
+        self._reader = reader
+        self._sos = sos
+        self._pad_samples = pad_samples
+        self._good_channels = good_channels
+        self._common_median_reference = common_median_reference
+        self._cmr_channel_groups = cmr_channel_groups
+        self._cmr_dead_channels = cmr_dead_channels
+        self._zca_fit = zca_fit
+        self._rescale_amplitude = rescale_amplitude
+        self._dtype = dtype
+
+    def get_num_samples(self) -> int:
+        return self._reader.n_samples
+
+    def get_traces(
+        self,
+        start_frame: int | None = None,
+        end_frame: int | None = None,
+        channel_indices: list | np.ndarray | tuple | None = None,
+    ) -> np.ndarray:
+        start = 0 if start_frame is None else int(start_frame)
+        stop = self._reader.n_samples if end_frame is None else int(end_frame)
+        voltage_uV = preprocess_time_range(
+            self._reader,
+            start,
+            stop,
+            sos=self._sos,
+            pad_samples=self._pad_samples,
+            good_channels=self._good_channels,
+            common_median_reference=self._common_median_reference,
+            cmr_channel_groups=self._cmr_channel_groups,
+            cmr_dead_channels=self._cmr_dead_channels,
+            zca_fit=self._zca_fit,
+            rescale_amplitude=self._rescale_amplitude,
+            dtype=self._dtype.name,
+        )
+        if channel_indices is not None:
+            voltage_uV = voltage_uV[channel_indices, :]
+        return voltage_uV.T
+
+
+def write_intan_int16_recording(
+    recording: BaseRecording,
+    output_filepath: str | Path,
+    *,
+    bit_to_uV: float = INTAN_BIT_TO_uV,
+    **job_kwargs,
+) -> Path:
+    """Write a microvolt recording as interleaved Intan int16 counts.
+
+    Values are divided by ``bit_to_uV`` and rounded, and the file is written
+    with SpikeInterface's chunked (optionally parallel) binary writer, so only
+    ``job_kwargs["chunk_duration"]``-sized blocks are held per worker.
+
+    Parameters
+    ----------
+    recording
+        Single-segment recording in microvolts.
+    output_filepath
+        Destination ``.dat``.
+    bit_to_uV
+        Microvolts per output count.
+    **job_kwargs
+        SpikeInterface job arguments (``n_jobs``, ``chunk_duration``, ...).
+
+    Returns
+    -------
+    pathlib.Path
+        ``output_filepath``.
+    """
+    if recording.get_num_segments() != 1:
+        msg = f"recording must have one segment, got {recording.get_num_segments()}"
+        raise ValueError(msg)
+    output = Path(output_filepath)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    counts = scale(recording, gain=1.0 / float(bit_to_uV), dtype="int16")
+    write_binary_recording(
+        counts,
+        file_paths=[output],
+        dtype="int16",
+        add_file_extension=False,
+        **job_kwargs,
+    )
+    return output
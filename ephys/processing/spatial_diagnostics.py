@@ -3,14 +3,19 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 import numpy as np
 
+if TYPE_CHECKING:
+    from ephys.processing.artifacts import ArtifactIntervals
+
 _MAD_TO_STD = 1.4826
 _DEFAULT_SEGMENT_SAMPLES = 30_000
 _DEFAULT_N_SEGMENTS = 3
 _INDEX_CHUNK_SIZE = 10_000
 _SPATIAL_MEDIAN_MIN_STD_UV = 1e-3
+_DEFAULT_MAX_MAD_SAMPLES = 100_000
 
 __all__ = [
     "SpatialDiagnostics",
@@ -82,9 +87,21 @@ def compute_spatial_diagnostics(
     voltage_matrix: np.ndarray,
     channel_indices: np.ndarray | list[int],
     sample_indices: np.ndarray,
+    *,
+    artifact_intervals: ArtifactIntervals | None = None,
+    sample_ticks: np.ndarray | None = None,
+    max_mad_samples: int = _DEFAULT_MAX_MAD_SAMPLES,
 ) -> SpatialDiagnostics:
     """Compute spatial diagnostics on a subsample using bounded working memory.
 
+    Each block of ``sample_indices`` is gathered once (only the selected
+    channels and samples are read, so memmapped input is never copied
+    whole). The block's spatial median is appended as an extra row and the
+    sums and cross-products of that augmented matrix give the channel
+    covariance, the PC1-vs-median correlation, and the median RMS in a
+    single pass. Per-channel MAD uses an evenly spaced subset of at most
+    ``max_mad_samples`` gathered columns.
+
     Parameters
     ----------
     voltage_matrix
@@ -93,6 +110,17 @@ def compute_spatial_diagnostics(
         Probe channel rows to include in the analysis.
     sample_indices
         Time indices returned by :func:`plan_spatial_subsample_indices`.
+    artifact_intervals
+        When given (e.g. :attr:`~ephys.processing.zca.ZcaFit.artifact_intervals`),
+        sample indices inside an artifact interval are skipped. Intervals are
+        in recording ticks.
+    sample_ticks
+        Recording tick of each column of ``voltage_matrix`` when it is a
+        subsample (e.g. concatenated segments), used to look up
+        ``artifact_intervals``. Defaults to the column index.
+    max_mad_samples
+        Samples per channel kept for the MAD estimate; the MAD is exact when
+        at least as many samples as this are analyzed.
 
     Returns
     -------
@@ -101,6 +129,9 @@ def compute_spatial_diagnostics(
     """
     channels = np.asarray(channel_indices, dtype=np.int64).ravel()
     indices = np.asarray(sample_indices, dtype=np.int64).ravel()
+    if artifact_intervals is not None:
+        ticks = indices if sample_ticks is None else np.asarray(sample_ticks)[indices]
+        indices = indices[~artifact_intervals.contains(ticks)]
     if channels.size < 1:
         msg = "channel_indices must contain at least one channel"
         raise ValueError(msg)
@@ -110,23 +141,48 @@ def compute_spatial_diagnostics(
             f"got {indices.size}"
         )
         raise ValueError(msg)
+    if max_mad_samples < 1:
+        msg = f"max_mad_samples must be positive, got {max_mad_samples}"
+        raise ValueError(msg)
 
     n_channels = channels.shape[0]
-    n_used = int(indices.shape[0])
-
-    sum_x = np.zeros(n_channels, dtype=np.float64)
-    sum_xx = np.zeros((n_channels, n_channels), dtype=np.float64)
-    count = 0
-
-    for start in range(0, n_used, _INDEX_CHUNK_SIZE):
+    count = int(indices.shape[0])
+    mad_positions = np.unique(
+        np.linspace(0, count - 1, min(count, int(max_mad_samples))).astype(np.int64)
+    )
+    mad_values = np.empty((n_channels, mad_positions.size), dtype=np.float64)
+
+    # Rows 0..n_channels-1 are channels, row n_channels is the spatial median.
+    # Sums are taken about the first block's means to limit cancellation.
+    shift: np.ndarray | None = None
+    sum_x = np.zeros(n_channels + 1, dtype=np.float64)
+    sum_xx = np.zeros((n_channels + 1, n_channels + 1), dtype=np.float64)
+    sum_median_sq = 0.0
+    augmented = np.empty((n_channels + 1, _INDEX_CHUNK_SIZE), dtype=np.float64)
+    mad_filled = 0
+    for start in range(0, count, _INDEX_CHUNK_SIZE):
         idx = indices[start : start + _INDEX_CHUNK_SIZE]
-        block = np.asarray(voltage_matrix[channels][:, idx], dtype=np.float64)
-        sum_x += block.sum(axis=1)
-        sum_xx += block @ block.T
-        count += block.shape[1]
-
-    mean = sum_x / count
-    covariance = (sum_xx / count) - np.outer(mean, mean)
+        width = idx.shape[0]
+        rows = augmented[:, :width]
+        rows[:n_channels] = voltage_matrix[np.ix_(channels, idx)]
+        np.median(rows[:n_channels], axis=0, out=rows[n_channels])
+        sum_median_sq += float(np.dot(rows[n_channels], rows[n_channels]))
+
+        stop = np.searchsorted(mad_positions, start + width)
+        mad_values[:, mad_filled:stop] = rows[:n_channels, mad_positions[mad_filled:stop] - start]
+        mad_filled = int(stop)
+
+        if shift is None:
+            shift = rows.mean(axis=1, keepdims=True)
+        rows -= shift
+        sum_x += rows.sum(axis=1)
+        sum_xx += rows @ rows.T
+
+    mean_shifted = sum_x / count
+    augmented_cov = (sum_xx / count) - np.outer(mean_shifted, mean_shifted)
+    covariance = augmented_cov[:n_channels, :n_channels]
+    median_cross = augmented_cov[:n_channels, n_channels]
+    median_var = max(float(augmented_cov[n_channels, n_channels]), 0.0)
 
     std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
     with np.errstate(divide="ignore", invalid="ignore"):
@@ -141,48 +197,21 @@ def compute_spatial_diagnostics(
         float(evals_sorted[0] / eval_sum) if eval_sum > 0.0 else 0.0
     )
 
+    residual_median_rms = float(np.sqrt(sum_median_sq / count))
+    median_std = float(np.sqrt(median_var))
     pc1 = u_mat[:, 0]
-    pc1_scores = np.empty(count, dtype=np.float64)
-    spatial_median = np.empty(count, dtype=np.float64)
-    offset = 0
-    for start in range(0, n_used, _INDEX_CHUNK_SIZE):
-        idx = indices[start : start + _INDEX_CHUNK_SIZE]
-        block = np.asarray(voltage_matrix[channels][:, idx], dtype=np.float64)
-        centered = block - mean[:, np.newaxis]
-        width = block.shape[1]
-        pc1_scores[offset : offset + width] = pc1 @ centered
-        spatial_median[offset : offset + width] = np.median(block, axis=0)
-        offset += width
-
-    residual_median_rms = float(np.sqrt(np.mean(spatial_median**2)))
-    median_std = float(np.std(spatial_median))
-    if (
-        median_std > _SPATIAL_MEDIAN_MIN_STD_UV
-        and np.std(pc1_scores) > 0.0
-    ):
+    pc1_var = float(pc1 @ covariance @ pc1)
+    if median_std > _SPATIAL_MEDIAN_MIN_STD_UV and pc1_var > 0.0:
         pc1_median_r: float | None = float(
-            np.corrcoef(pc1_scores, spatial_median)[0, 1]
+            np.clip((pc1 @ median_cross) / np.sqrt(pc1_var * median_var), -1.0, 1.0)
         )
     else:
         pc1_median_r = None
 
-    channel_mads = np.empty(n_channels, dtype=np.float64)
-    for channel_row in range(n_channels):
-        channel_values = np.empty(count, dtype=np.float64)
-        offset = 0
-        for start in range(0, n_used, _INDEX_CHUNK_SIZE):
-            idx = indices[start : start + _INDEX_CHUNK_SIZE]
-            block = np.asarray(
-                voltage_matrix[channels[channel_row], idx],
-                dtype=np.float64,
-            )
-            width = block.shape[0]
-            channel_values[offset : offset + width] = block
-            offset += width
-        channel_median = float(np.median(channel_values))
-        channel_mads[channel_row] = (
-            np.median(np.abs(channel_values - channel_median)) * _MAD_TO_STD
-        )
+    channel_medians = np.median(mad_values, axis=1, keepdims=True)
+    channel_mads = (
+        np.median(np.abs(mad_values - channel_medians), axis=1) * _MAD_TO_STD
+    )
 
     return SpatialDiagnostics(
         mean_abs_off_diag_corr=mean_abs_off_diag,
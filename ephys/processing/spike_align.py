@@ -5,12 +5,19 @@ per-trial windows around events, histogram relative times, and reorder trials
 by first-spike latency. Dense periodic events (e.g. high-rate pico trains) can
 use :func:`event_ticks_greedy_non_overlapping_half_windows` to subsample onsets
 before gathering so trial windows do not overlap.
+
+Per-trial inputs may be a ``list[np.ndarray]`` or a
+:class:`~ephys.processing.ragged.RaggedArray`; the ordering and counting
+helpers work on the ragged form in a few vectorized passes either way.
 """
 
 from __future__ import annotations
 
 import numpy as np
 
+from ephys.processing.histogram import per_trial_histogram
+from ephys.processing.ragged import RaggedArray, as_ragged
+
 
 def spike_times_ticks_from_seconds(
     spike_times_s: np.ndarray,
@@ -38,6 +45,60 @@ def spike_times_ticks_from_seconds(
     return np.round(st * sampling_rate_hz).astype(np.int64, copy=False)
 
 
+def spikes_relative_to_events_ragged(
+    spike_times_ticks: np.ndarray,
+    event_ticks: np.ndarray,
+    win_ticks: int,
+    sampling_rate_hz: float,
+) -> RaggedArray:
+    """Batched form of :func:`spikes_relative_to_events_ticks`.
+
+    All window bounds are located with one ``searchsorted`` call and every
+    in-window spike is gathered into one flat relative-time array, so the cost
+    is ``O((N + E) log N + S)`` for ``N`` spikes, ``E`` events, and ``S``
+    gathered spikes, with no per-event Python work or allocation.
+
+    Parameters
+    ----------
+    spike_times_ticks
+        Spike sample indices; converted to ``int64`` 1D and sorted (stable)
+        unless already non-decreasing.
+    event_ticks
+        Alignment sample indices (one per trial or condition row).
+    win_ticks
+        Half-width of the inclusion window in samples.
+    sampling_rate_hz
+        Rate used to convert tick offsets to seconds.
+
+    Returns
+    -------
+    RaggedArray
+        One row per event, in ``event_ticks`` order, of ``float64`` spike times
+        in seconds relative to that event. Row ``i`` equals
+        ``spikes_relative_to_events_ticks(...)[i]`` exactly.
+
+    Raises
+    ------
+    ValueError:
+        If ``sampling_rate_hz`` or ``win_ticks`` is not positive.
+    """
+    if sampling_rate_hz <= 0:
+        raise ValueError("sampling_rate_hz must be positive")
+    if win_ticks <= 0:
+        raise ValueError("win_ticks must be positive")
+
+    spikes = np.asarray(spike_times_ticks, dtype=np.int64).ravel()
+    if spikes.size > 1 and np.any(spikes[1:] < spikes[:-1]):
+        spikes = np.sort(spikes, kind="mergesort")
+    events = np.asarray(event_ticks, dtype=np.int64).ravel()
+
+    half = int(win_ticks)
+    bounds = np.searchsorted(spikes, np.stack((events - half, events + half)), side="left")
+    trials = RaggedArray.from_ranges(spikes, bounds[0], bounds[1])
+    event_s = np.repeat(events.astype(np.float64) / sampling_rate_hz, trials.lengths)
+    return trials.with_values(trials.values.astype(np.float64) / sampling_rate_hz - event_s)
+
+
 def spikes_relative_to_events_ticks(
     spike_times_ticks: np.ndarray,
     event_ticks: np.ndarray,
@@ -53,8 +114,8 @@ def spikes_relative_to_events_ticks(
     Parameters
     ----------
     spike_times_ticks
-        Spike sample indices; converted to ``int64`` 1D and **sorted in
-        place** on the working copy used internally.
+        Spike sample indices; converted to ``int64`` 1D and **sorted** on the
+        working copy used internally (the caller's array is not modified).
     event_ticks
         Alignment sample indices (one per trial or condition row).
     win_ticks
@@ -78,31 +139,14 @@ def spikes_relative_to_events_ticks(
     Notes
     -----
     Window membership uses ``searchsorted`` on sorted spike ticks; boundary
-    behavior matches half-open ``[lo, hi)`` sampling in index space.
+    behavior matches half-open ``[lo, hi)`` sampling in index space. The work
+    is done by :func:`spikes_relative_to_events_ragged`; the returned arrays
+    are views into its flat result. Use that function directly to keep the
+    compact ragged form.
     """
-    if sampling_rate_hz <= 0:
-        raise ValueError("sampling_rate_hz must be positive")
-    if win_ticks <= 0:
-        raise ValueError("win_ticks must be positive")
-
-    spike_times_ticks = np.sort(
-        np.asarray(spike_times_ticks, dtype=np.int64).ravel(),
-        kind="mergesort",
-    )
-
-    rel_per_trial: list[np.ndarray] = []
-    half = int(win_ticks)
-
-    for event_tick in np.asarray(event_ticks, dtype=np.int64).ravel():
-        lo = int(event_tick) - half
-        hi = int(event_tick) + half
-        i0 = int(np.searchsorted(spike_times_ticks, lo, side="left"))
-        i1 = int(np.searchsorted(spike_times_ticks, hi, side="left"))
-        chunk = spike_times_ticks[i0:i1]
-        rel_s = chunk.astype(np.float64) / sampling_rate_hz - float(event_tick) / sampling_rate_hz
-        rel_per_trial.append(rel_s)
-
-    return rel_per_trial
+    return spikes_relative_to_events_ragged(
+        spike_times_ticks, event_ticks, win_ticks, sampling_rate_hz
+    ).to_list()
 
 
 def event_ticks_greedy_non_overlapping_half_windows(
@@ -170,15 +214,16 @@ def event_ticks_greedy_non_overlapping_half_windows(
 
 
 def sort_order_by_first_spike(
-    spike_times_per_trial_s: list[np.ndarray],
+    spike_times_per_trial_s: list[np.ndarray] | RaggedArray,
 ) -> np.ndarray:
     """Return trial indices sorted by latency to the first spike.
 
     Parameters
     ----------
     spike_times_per_trial_s
-        One ``float`` array per trial (seconds relative to a common alignment);
-        empty arrays are allowed.
+        One ``float`` array per trial (seconds relative to a common alignment),
+        or a :class:`~ephys.processing.ragged.RaggedArray`; empty trials are
+        allowed.
 
     Returns
     -------
@@ -190,27 +235,21 @@ def sort_order_by_first_spike(
     Trials with no spikes are treated as having first spike time ``-inf`` so
     they sort **last** (legacy convention).
     """
-    n = len(spike_times_per_trial_s)
-    first_s = np.empty(n, dtype=np.float64)
-    for i, arr in enumerate(spike_times_per_trial_s):
-        a = np.asarray(arr, dtype=float).ravel()
-        if a.size > 0:
-            first_s[i] = float(np.min(a))
-        else:
-            first_s[i] = np.inf
+    first_s = as_ragged(spike_times_per_trial_s).row_min(empty=np.inf)
     return np.argsort(first_s, kind="mergesort")
 
 
 def sort_order_by_spike_count_descending(
-    spike_times_per_trial_s: list[np.ndarray],
+    spike_times_per_trial_s: list[np.ndarray] | RaggedArray,
 ) -> np.ndarray:
     """Return trial indices sorted by within-trial spike count (descending).
 
     Parameters
     ----------
     spike_times_per_trial_s
-        One 1D array per trial (relative spike times in seconds); empty arrays
-        are allowed.
+        One 1D array per trial (relative spike times in seconds), or a
+        :class:`~ephys.processing.ragged.RaggedArray`; empty trials are
+        allowed.
 
     Returns
     -------
@@ -225,23 +264,21 @@ def sort_order_by_spike_count_descending(
     raster row indices (matching ``plot_raster`` defaults with row ``0`` at
     the bottom). Ties break by stable ascending trial index.
     """
-    n = len(spike_times_per_trial_s)
-    cnt = np.empty(n, dtype=np.intp)
-    for i, arr in enumerate(spike_times_per_trial_s):
-        cnt[i] = int(np.asarray(arr, dtype=float).ravel().size)
+    cnt = _trial_lengths(spike_times_per_trial_s)
     return np.argsort(-cnt, kind="mergesort")
 
 
 def sort_order_by_spike_count_then_first_spike(
-    spike_times_per_trial_s: list[np.ndarray],
+    spike_times_per_trial_s: list[np.ndarray] | RaggedArray,
 ) -> np.ndarray:
     """Return trial indices sorted by spike count, then first-spike latency.
 
     Parameters
     ----------
     spike_times_per_trial_s
-        One 1D array per trial (relative spike times in seconds); empty arrays
-        are allowed.
+        One 1D array per trial (relative spike times in seconds), or a
+        :class:`~ephys.processing.ragged.RaggedArray`; empty trials are
+        allowed.
 
     Returns
     -------
@@ -256,17 +293,8 @@ def sort_order_by_spike_count_then_first_spike(
     by ascending first-spike latency; empty trials use ``inf`` and sort last
     within their count group. Ties break by stable ascending trial index.
     """
-    n = len(spike_times_per_trial_s)
-    cnt = np.empty(n, dtype=np.intp)
-    first_s = np.empty(n, dtype=np.float64)
-    for i, arr in enumerate(spike_times_per_trial_s):
-        a = np.asarray(arr, dtype=float).ravel()
-        cnt[i] = int(a.size)
-        if a.size > 0:
-            first_s[i] = float(np.min(a))
-        else:
-            first_s[i] = np.inf
-    return np.lexsort((first_s, cnt))
+    trials = as_ragged(spike_times_per_trial_s)
+    return np.lexsort((trials.row_min(empty=np.inf), trials.lengths))
 
 
 def sort_order_by_covariate(
@@ -305,30 +333,34 @@ def sort_order_by_covariate(
 
 
 def apply_trial_order(
-    trials: list[np.ndarray],
+    trials: list[np.ndarray] | RaggedArray,
     order: np.ndarray,
-) -> list[np.ndarray]:
+) -> list[np.ndarray] | RaggedArray:
     """Reorder a list of per-trial arrays.
 
     Parameters
     ----------
     trials
-        Parallel per-trial payloads (e.g. relative spike time arrays).
+        Parallel per-trial payloads (e.g. relative spike time arrays), or a
+        :class:`~ephys.processing.ragged.RaggedArray`.
     order
         Row indices, typically from :func:`sort_order_by_first_spike` or
         :func:`sort_order_by_spike_count_descending`.
 
     Returns
     -------
-    list[np.ndarray]
+    list[np.ndarray] or RaggedArray
         ``[trials[int(j)] for j in order]`` with the same element dtypes/shapes
-        as the inputs.
+        as the inputs; a ragged input is reordered in one gather via
+        :meth:`~ephys.processing.ragged.RaggedArray.take`.
     """
+    if isinstance(trials, RaggedArray):
+        return trials.take(order)
     return [trials[int(j)] for j in order]
 
 
 def per_trial_bin_counts(
-    spike_times_per_trial_s: list[np.ndarray],
+    spike_times_per_trial_s: list[np.ndarray] | RaggedArray,
     bin_edges_s: np.ndarray,
 ) -> list[np.ndarray]:
     """Histogram spike counts per trial using shared bin edges.
@@ -336,7 +368,8 @@ def per_trial_bin_counts(
     Parameters
     ----------
     spike_times_per_trial_s
-        One 1D ``float`` array per trial (seconds in the same reference frame).
+        One 1D ``float`` array per trial (seconds in the same reference frame),
+        or a :class:`~ephys.processing.ragged.RaggedArray`.
     bin_edges_s
         Monotonic bin edges in seconds (length ``n_bins + 1``), shared by all
         trials.
@@ -349,15 +382,23 @@ def per_trial_bin_counts(
 
     Notes
     -----
-    Uses :func:`numpy.histogram` with ``bins=bin_edges_s`` for each trial.
+    Counts match :func:`numpy.histogram` with ``bins=bin_edges_s`` for each
+    trial but are computed for all trials at once by
+    :func:`~ephys.processing.histogram.per_trial_histogram`; the returned
+    vectors are rows of one ``(n_trials, n_bins)`` array. Call that function
+    directly to keep the 2D array.
     """
-    edges = np.asarray(bin_edges_s, dtype=float).ravel()
-    out: list[np.ndarray] = []
-    for rel in spike_times_per_trial_s:
-        rel_f = np.asarray(rel, dtype=float).ravel()
-        counts, _ = np.histogram(rel_f, bins=edges)
-        out.append(counts.astype(np.float64, copy=False))
-    return out
+    counts = per_trial_histogram(spike_times_per_trial_s, bin_edges_s)
+    return list(counts.astype(np.float64))
+
+
+def _trial_lengths(trials: list[np.ndarray] | RaggedArray) -> np.ndarray:
+    """Number of values in each trial, without packing a list into a ragged array."""
+    if isinstance(trials, RaggedArray):
+        return trials.lengths.astype(np.intp)
+    return np.fromiter(
+        (np.asarray(arr).size for arr in trials), dtype=np.intp, count=len(trials)
+    )
 
 
 def mean_spike_probability_per_bin(
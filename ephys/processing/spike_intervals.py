@@ -6,6 +6,8 @@ from collections.abc import Sequence
 
 import numpy as np
 
+from ephys.processing.ragged import RaggedArray, as_ragged
+
 __all__ = [
     "adjacent_isi_cv2",
     "collect_adjacent_isi_cv2",
@@ -77,15 +79,37 @@ def adjacent_isi_cv2(spike_times: np.ndarray) -> np.ndarray:
     return 2.0 * np.abs(right[valid] - left[valid]) / denom[valid]
 
 
+def _ragged_adjacent_isi_cv2(trials: RaggedArray) -> RaggedArray:
+    """:func:`adjacent_isi_cv2` for every row of ``trials`` in one pass."""
+    spikes = trials.compress(np.isfinite(trials.values)).sort_rows()
+    spike_rows = spikes.row_ids()
+    same_trial = spike_rows[1:] == spike_rows[:-1]
+    isi = np.diff(spikes.values)[same_trial]
+    isi_rows = spike_rows[1:][same_trial]
+
+    left = isi[:-1]
+    right = isi[1:]
+    denom = left + right
+    valid = (
+        (isi_rows[1:] == isi_rows[:-1])
+        & np.isfinite(left)
+        & np.isfinite(right)
+        & (denom > 0.0)
+    )
+    cv2 = 2.0 * np.abs(right[valid] - left[valid]) / denom[valid]
+    return RaggedArray.from_row_ids(cv2, isi_rows[1:][valid], trials.n_rows)
+
+
 def collect_adjacent_isi_cv2_by_trial(
-    spike_times_per_trial: Sequence[np.ndarray],
+    spike_times_per_trial: Sequence[np.ndarray] | RaggedArray,
 ) -> tuple[np.ndarray, ...]:
     """Return per-trial CV2 arrays without crossing trial boundaries.
 
     Parameters
     ----------
     spike_times_per_trial
-        Sequence of per-trial spike-time arrays. Each array is processed
+        Sequence of per-trial spike-time arrays, or a
+        :class:`~ephys.processing.ragged.RaggedArray`. Each trial is processed
         independently.
 
     Returns
@@ -93,19 +117,25 @@ def collect_adjacent_isi_cv2_by_trial(
     tuple[numpy.ndarray, ...]
         One CV2 array per input trial, preserving trial order. Trials with too
         few spikes contribute empty arrays.
+
+    Notes
+    -----
+    All trials are sorted and differenced together as one ragged array;
+    values equal :func:`adjacent_isi_cv2` applied to each trial.
     """
-    return tuple(adjacent_isi_cv2(trial) for trial in spike_times_per_trial)
+    return tuple(_ragged_adjacent_isi_cv2(as_ragged(spike_times_per_trial)))
 
 
 def collect_adjacent_isi_cv2(
-    spike_times_per_trial: Sequence[np.ndarray],
+    spike_times_per_trial: Sequence[np.ndarray] | RaggedArray,
 ) -> np.ndarray:
     """Collect finite Holt CV2 values across independent trials.
 
     Parameters
     ----------
     spike_times_per_trial
-        Sequence of per-trial spike-time arrays.
+        Sequence of per-trial spike-time arrays, or a
+        :class:`~ephys.processing.ragged.RaggedArray`.
 
     Returns
     -------
@@ -118,8 +148,4 @@ def collect_adjacent_isi_cv2(
     The function computes each trial separately before concatenation, so the
     last spike in one trial is never paired with the first spike in the next.
     """
-    by_trial = collect_adjacent_isi_cv2_by_trial(spike_times_per_trial)
-    nonempty = [values for values in by_trial if values.size > 0]
-    if not nonempty:
-        return np.asarray([], dtype=np.float64)
-    return np.concatenate(nonempty)
+    return _ragged_adjacent_isi_cv2(as_ragged(spike_times_per_trial)).values
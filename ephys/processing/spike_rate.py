@@ -1,6 +1,9 @@
 import numpy as np
 from scipy.ndimage import gaussian_filter1d
 
+from ephys.processing.bootstrap import bootstrap_mean_ci
+from ephys.processing.histogram import per_trial_histogram
+
 
 def calculate_per_trial_spike_counts(
     spikes_per_trial,
@@ -13,15 +16,28 @@ def calculate_per_trial_spike_counts(
     Parameters
     ----------
     spikes_per_trial
+        list of per-trial spike time arrays, or a ``RaggedArray``.
     bins
+        bin edges shared by all trials, or anything ``np.histogram`` accepts.
     smooth
     sigma
 
     Returns
     -------
-
+    np.ndarray or list
+        ``(n_trials, n_bins)`` counts (float when smoothed) when ``bins`` is
+        an array of edges, computed for all trials at once by
+        :func:`ephys.processing.histogram.per_trial_histogram`; otherwise a
+        list of per-trial ``np.histogram`` counts.
     """
 
+    if np.ndim(bins) == 1:
+        return per_trial_histogram(
+            spikes_per_trial,
+            bins,
+            smooth_sigma=sigma if smooth else None,
+        )
+
     trial_histograms = []
     for trial_spike_times in spikes_per_trial:
         hist, _ = np.histogram(trial_spike_times, bins=bins)
@@ -86,41 +102,46 @@ def bootstrap_ci(
     bins,
     n_bootstrap=10000,
     ci_percentile=95,
+    method="percentile",
+    rng=None,
     **kwargs,
 ):
     """
     Calculate the confidence interval of a spike rate using bootstrap resampling.
 
     Parameters:
-    - spikes_per_trial: list of arrays, each array contains spike times for a trial.
+    - spikes_per_trial: list of arrays (or a RaggedArray), each array contains
+      spike times for a trial.
     - bins: array-like, the bin edges for histogram calculation.
     - n_bootstrap: int, number of bootstrap samples.
     - ci_percentile: float, the percentile for the confidence interval.
+    - method: "percentile" or "bca" (bias-corrected and accelerated).
+    - rng: numpy.random.Generator or seed for reproducible resampling. None
+      seeds a new generator from NumPy's legacy global state, so
+      ``np.random.seed`` still makes results reproducible as it did when
+      this function drew with ``np.random.choice``.
     - **kwargs: additional keyword arguments for calculate_per_trial_spike_counts.
 
     Returns:
     - ci_lower: array, the lower bound of the confidence interval for each bin.
     - ci_upper: array, the upper bound of the confidence interval for each bin.
+
+    All resamples are computed as multinomial trial weights times the trial
+    matrix; see ephys.processing.bootstrap.bootstrap_mean_ci.
     """
-    n_trials = len(spikes_per_trial)
-    bin_centers = (bins[:-1] + bins[1:]) / 2
     bin_width = bins[1] - bins[0]
-    bootstrap_means = np.zeros((n_bootstrap, len(bin_centers)))
-
     trial_histograms = calculate_per_trial_spike_counts(
         spikes_per_trial,
         bins,
         **kwargs,
     )
-
-    trial_histograms = np.array(trial_histograms)
-
-    for i in range(n_bootstrap):
-        resampled_indices = np.random.choice(n_trials, n_trials, replace=True)
-        resampled_histograms = trial_histograms[resampled_indices]
-        hist_sum = np.sum(resampled_histograms, axis=0)
-        bootstrap_means[i, :] = hist_sum / n_trials / bin_width
-
-    ci_lower = np.percentile(bootstrap_means, (100 - ci_percentile) / 2, axis=0)
-    ci_upper = np.percentile(bootstrap_means, 100 - (100 - ci_percentile) / 2, axis=0)
-    return ci_lower, ci_upper
+    trial_rates = np.asarray(trial_histograms, dtype=float) / bin_width
+    if rng is None:
+        rng = int(np.random.randint(np.iinfo(np.int64).max, dtype=np.int64))
+    return bootstrap_mean_ci(
+        trial_rates,
+        n_bootstrap=n_bootstrap,
+        ci_percentile=ci_percentile,
+        method=method,
+        rng=rng,
+    )
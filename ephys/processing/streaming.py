@@ -0,0 +1,485 @@
+"""Bounded-memory, chunked preprocessing of long multichannel recordings.
+
+The in-memory preprocessing path loads a whole recording, filters it, applies
+a spatial reference, and writes the result in one call. This module runs the
+same bandpass -> CMR -> ZCA -> int16 chain on overlapping time chunks read
+from an :class:`~ephys.data_wrangling.intan.IntanAmplifierReader`, so peak
+memory depends on the chunk size rather than the recording length.
+
+Each chunk is padded on both sides by :func:`~ephys.processing.filtering.sos_filtfilt_pad_samples`
+samples before zero-phase filtering and the padding is discarded afterwards,
+so filtered chunks agree with whole-recording filtering to within the pad
+tolerance. Spatial reference steps act on single time samples and are exact
+per chunk. The ZCA fit is estimated once, up front, from a spread subsample
+whose size can be bounded by the same memory budget.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from ephys.processing.filtering import (
+    DEFAULT_PAD_TOLERANCE,
+    sos_bandpass_filter,
+    sos_filtfilt_pad_samples,
+)
+from ephys.processing.precision import ProcessingDtype, resolve_processing_dtype
+from ephys.processing.profiling import StageProfiler, profile_stage
+from ephys.processing.referencing import apply_common_median_reference
+from ephys.processing.zca import ZcaFit, apply_zca_fit
+
+if TYPE_CHECKING:
+    from ephys.data_wrangling.intan import IntanAmplifierReader
+
+# Working bytes per (channel, sample) value of a padded chunk: the float32
+# read, the float64 filter output plus sosfiltfilt's extended/intermediate
+# copies, spatial-reference temporaries, and the int16 output.
+STREAM_BYTES_PER_VALUE = 48
+# Copies of the kept subsample alive at once while fitting ZCA on it: the
+# subsample, its median-centered copy, the clean-sample selection, and the
+# centered copy numpy.cov (or the median/MAD partition) makes.
+SUBSAMPLE_WORKING_COPIES = 4
+_MIN_CHUNK_SAMPLES = 1024
+_DEFAULT_SUBSAMPLE_SEGMENTS = 10
+_DEFAULT_SUBSAMPLE_SEGMENT_SAMPLES = 30_000
+
+__all__ = [
+    "STREAM_BYTES_PER_VALUE",
+    "SUBSAMPLE_WORKING_COPIES",
+    "TimeChunk",
+    "chunk_samples_for_memory_budget",
+    "plan_subsample_segments",
+    "plan_subsample_segments_for_memory_budget",
+    "plan_time_chunks",
+    "preprocess_time_range",
+    "read_preprocessed_segments",
+    "segment_sample_ticks",
+    "stream_preprocess_intan",
+]
+
+
+@dataclass(frozen=True)
+class TimeChunk:
+    """One output time range and the padded range read to produce it.
+
+    Parameters
+    ----------
+    start, stop
+        Output samples ``[start, stop)`` written for this chunk.
+    padded_start, padded_stop
+        Input samples read and filtered, clipped to the recording.
+    """
+
+    start: int
+    stop: int
+    padded_start: int
+    padded_stop: int
+
+    @property
+    def n_samples(self) -> int:
+        """Number of output samples in the chunk."""
+        return self.stop - self.start
+
+
+def plan_time_chunks(
+    n_samples: int,
+    chunk_samples: int,
+    pad_samples: int,
+) -> list[TimeChunk]:
+    """Split ``[0, n_samples)`` into consecutive padded chunks.
+
+    Parameters
+    ----------
+    n_samples
+        Recording length in samples.
+    chunk_samples
+        Output samples per chunk; the final chunk may be shorter.
+    pad_samples
+        Overlap read on each side of a chunk (clipped at the recording edges).
+
+    Returns
+    -------
+    list[TimeChunk]
+        Chunks whose output ranges tile ``[0, n_samples)`` without gaps.
+    """
+    if n_samples < 1:
+        msg = f"n_samples must be positive, got {n_samples}"
+        raise ValueError(msg)
+    if chunk_samples < 1:
+        msg = f"chunk_samples must be positive, got {chunk_samples}"
+        raise ValueError(msg)
+    if pad_samples < 0:
+        msg = f"pad_samples must be non-negative, got {pad_samples}"
+        raise ValueError(msg)
+    chunks: list[TimeChunk] = []
+    for start in range(0, int(n_samples), int(chunk_samples)):
+        stop = min(start + int(chunk_samples), int(n_samples))
+        chunks.append(
+            TimeChunk(
+                start=start,
+                stop=stop,
+                padded_start=max(0, start - int(pad_samples)),
+                padded_stop=min(int(n_samples), stop + int(pad_samples)),
+            )
+        )
+    return chunks
+
+
+def chunk_samples_for_memory_budget(
+    max_memory_bytes: int,
+    n_channels: int,
+    pad_samples: int,
+    *,
+    bytes_per_value: int = STREAM_BYTES_PER_VALUE,
+) -> int:
+    """Return the largest chunk length whose working set fits a memory budget.
+
+    Parameters
+    ----------
+    max_memory_bytes
+        Budget for per-chunk working buffers (excludes interpreter overhead).
+    n_channels
+        Channels processed per chunk.
+    pad_samples
+        Overlap added to both sides of every chunk.
+    bytes_per_value
+        Working bytes per ``(channel, sample)`` value of a padded chunk.
+
+    Returns
+    -------
+    int
+        Output samples per chunk.
+
+    Raises
+    ------
+    ValueError
+        If the budget cannot hold a chunk of at least 1024 samples plus padding.
+    """
+    padded_samples = int(max_memory_bytes) // (int(n_channels) * int(bytes_per_value))
+    chunk_samples = padded_samples - 2 * int(pad_samples)
+    if chunk_samples < _MIN_CHUNK_SAMPLES:
+        needed = (_MIN_CHUNK_SAMPLES + 2 * int(pad_samples)) * n_channels * bytes_per_value
+        msg = (
+            f"memory budget of {max_memory_bytes} bytes is too small for "
+            f"{n_channels} channels; need at least {needed} bytes"
+        )
+        raise ValueError(msg)
+    return chunk_samples
+
+
+def plan_subsample_segments(
+    n_samples: int,
+    *,
+    n_segments: int = _DEFAULT_SUBSAMPLE_SEGMENTS,
+    samples_per_segment: int = _DEFAULT_SUBSAMPLE_SEGMENT_SAMPLES,
+) -> list[tuple[int, int]]:
+    """Return evenly spread contiguous ``(start, stop)`` segments.
+
+    Segments always include the start and end of the recording and never
+    overlap. When the recording is shorter than the requested total, a single
+    segment covering the whole recording is returned.
+    """
+    if n_samples < 1:
+        msg = f"n_samples must be positive, got {n_samples}"
+        raise ValueError(msg)
+    if n_segments < 1 or samples_per_segment < 1:
+        msg = (
+            "n_segments and samples_per_segment must be positive; got "
+            f"{n_segments} and {samples_per_segment}"
+        )
+        raise ValueError(msg)
+    if n_segments * samples_per_segment >= n_samples:
+        return [(0, int(n_samples))]
+    starts = np.linspace(0, n_samples - samples_per_segment, n_segments)
+    return [(int(s), int(s) + int(samples_per_segment)) for s in np.round(starts)]
+
+
+def plan_subsample_segments_for_memory_budget(
+    n_samples: int,
+    max_memory_bytes: int,
+    n_channels: int,
+    pad_samples: int,
+    *,
+    n_kept_channels: int | None = None,
+    dtype: ProcessingDtype | None = None,
+) -> list[tuple[int, int]]:
+    """Return :func:`plan_subsample_segments` shortened to fit a memory budget.
+
+    Half of the budget bounds each segment's padded read, as
+    :func:`chunk_samples_for_memory_budget` does for streamed chunks. The
+    other half holds :data:`SUBSAMPLE_WORKING_COPIES` copies of the
+    subsample read by :func:`read_preprocessed_segments`, which is what
+    fitting ZCA on it needs. Segments keep their default count and are
+    shortened until both halves fit.
+
+    Parameters
+    ----------
+    n_samples
+        Recording length in samples.
+    max_memory_bytes
+        Budget for the subsample and its working copies.
+    n_channels
+        Channels read per segment.
+    pad_samples
+        Overlap read on each side of a segment.
+    n_kept_channels
+        Channels kept in the subsample (``keep_channels`` of
+        :func:`read_preprocessed_segments`); defaults to ``n_channels``.
+    dtype
+        Working dtype of the subsample; ``None`` means float64.
+
+    Raises
+    ------
+    ValueError
+        If the budget cannot hold segments of at least 1024 samples.
+    """
+    if n_kept_channels is None:
+        n_kept_channels = n_channels
+    half_budget = int(max_memory_bytes) // 2
+    itemsize = (resolve_processing_dtype(dtype) or np.dtype(np.float64)).itemsize
+    segment_read_samples = chunk_samples_for_memory_budget(half_budget, n_channels, pad_samples)
+    subsample_samples = half_budget // (
+        max(1, int(n_kept_channels)) * SUBSAMPLE_WORKING_COPIES * itemsize
+    )
+    samples_per_segment = min(
+        _DEFAULT_SUBSAMPLE_SEGMENT_SAMPLES,
+        segment_read_samples,
+        subsample_samples // _DEFAULT_SUBSAMPLE_SEGMENTS,
+    )
+    if samples_per_segment < _MIN_CHUNK_SAMPLES:
+        needed = (
+            2
+            * _DEFAULT_SUBSAMPLE_SEGMENTS
+            * _MIN_CHUNK_SAMPLES
+            * n_kept_channels
+            * SUBSAMPLE_WORKING_COPIES
+            * itemsize
+        )
+        msg = (
+            f"memory budget of {max_memory_bytes} bytes is too small for a "
+            f"{n_kept_channels}-channel ZCA subsample; need at least {needed} bytes"
+        )
+        raise ValueError(msg)
+    return plan_subsample_segments(n_samples, samples_per_segment=samples_per_segment)
+
+
+def preprocess_time_range(
+    reader: IntanAmplifierReader,
+    start: int,
+    stop: int,
+    *,
+    sos: np.ndarray,
+    pad_samples: int,
+    good_channels: np.ndarray | list[int] | None = None,
+    common_median_reference: bool = False,
+    cmr_channel_groups: np.ndarray | list[int] | None = None,
+    cmr_dead_channels: bool = False,
+    zca_fit: ZcaFit | None = None,
+    rescale_amplitude: bool = True,
+    dtype: ProcessingDtype | None = None,
+    profiler: StageProfiler | None = None,
+) -> np.ndarray:
+    """Bandpass and spatially reference samples ``[start, stop)``.
+
+    Parameters
+    ----------
+    reader
+        Source recording.
+    start, stop
+        Output sample range.
+    sos
+        Bandpass SOS coefficients.
+    pad_samples
+        Samples read on each side of the range before filtering.
+    good_channels
+        Channels used for CMR and ZCA; defaults to every channel.
+    common_median_reference
+        Subtract the good-channel median at every sample.
+    cmr_channel_groups
+        Optional group label per channel; each group is referenced to its own
+        median (see :func:`~ephys.processing.referencing.apply_common_median_reference`).
+    cmr_dead_channels
+        Also subtract the median from channels outside ``good_channels``.
+    zca_fit
+        When given, whiten the good channels with this fit after CMR.
+    rescale_amplitude
+        Passed to :func:`~ephys.processing.zca.apply_zca_fit`.
+    dtype
+        Working dtype of every step (see :mod:`ephys.processing.precision`);
+        ``None`` filters and whitens in float64.
+    profiler
+        When given, records the ``read``, ``bandpass``, ``cmr``, and
+        ``zca_apply`` stages.
+
+    Returns
+    -------
+    numpy.ndarray
+        Voltage with shape ``(n_channels, stop - start)``, in ``dtype``
+        (float64 when ``dtype`` is ``None``).
+    """
+    if good_channels is None:
+        good_channels = np.arange(reader.n_channels)
+    padded_start = max(0, int(start) - int(pad_samples))
+    padded_stop = min(reader.n_samples, int(stop) + int(pad_samples))
+    raw_bytes = (padded_stop - padded_start) * reader.n_channels * reader.dtype.itemsize
+    with profile_stage(profiler, "read", raw_bytes):
+        raw = reader.read(padded_start, padded_stop)
+    with profile_stage(profiler, "bandpass", raw.nbytes):
+        block = sos_bandpass_filter(raw, sos, axis=1, dtype=dtype)
+        del raw
+        offset = int(start) - padded_start
+        voltage_uV = np.ascontiguousarray(block[:, offset : offset + int(stop) - int(start)])
+        del block
+
+    if common_median_reference:
+        with profile_stage(profiler, "cmr", voltage_uV.nbytes):
+            apply_common_median_reference(
+                voltage_uV,
+                good_channels,
+                channel_groups=cmr_channel_groups,
+                reference_dead_channels=cmr_dead_channels,
+            )
+    if zca_fit is not None:
+        with profile_stage(profiler, "zca_apply", voltage_uV.nbytes):
+            voltage_uV[good_channels, :] = apply_zca_fit(
+                voltage_uV[good_channels, :],
+                zca_fit,
+                rescale_amplitude=rescale_amplitude,
+                dtype=dtype,
+            )
+    return voltage_uV
+
+
+def read_preprocessed_segments(
+    reader: IntanAmplifierReader,
+    segments: list[tuple[int, int]],
+    *,
+    sos: np.ndarray,
+    pad_samples: int,
+    good_channels: np.ndarray | list[int] | None = None,
+    common_median_reference: bool = False,
+    cmr_channel_groups: np.ndarray | list[int] | None = None,
+    zca_fit: ZcaFit | None = None,
+    keep_channels: np.ndarray | list[int] | None = None,
+    dtype: ProcessingDtype | None = None,
+    profiler: StageProfiler | None = None,
+) -> np.ndarray:
+    """Concatenate bandpassed (and optionally referenced) segments along time.
+
+    Used to fit ZCA and log spatial diagnostics from a bounded subsample;
+    :func:`segment_sample_ticks` gives the recording tick of each column.
+    ``zca_fit`` and ``profiler`` are passed to :func:`preprocess_time_range`.
+    Each segment is written into one preallocated array, keeping only the
+    rows in ``keep_channels`` (default: every channel), so peak memory is
+    the result plus one segment.
+    """
+    n_rows = reader.n_channels if keep_channels is None else len(keep_channels)
+    n_columns = sum(int(stop) - int(start) for start, stop in segments)
+    out_dtype = resolve_processing_dtype(dtype) or np.dtype(np.float64)
+    subsample = np.empty((n_rows, n_columns), dtype=out_dtype)
+    column = 0
+    for start, stop in segments:
+        part = preprocess_time_range(
+            reader,
+            start,
+            stop,
+            sos=sos,
+            pad_samples=pad_samples,
+            good_channels=good_channels,
+            common_median_reference=common_median_reference,
+            cmr_channel_groups=cmr_channel_groups,
+            zca_fit=zca_fit,
+            dtype=dtype,
+            profiler=profiler,
+        )
+        width = part.shape[1]
+        subsample[:, column : column + width] = (
+            part if keep_channels is None else part[keep_channels, :]
+        )
+        column += width
+    return subsample
+
+
+def segment_sample_ticks(segments: list[tuple[int, int]]) -> np.ndarray:
+    """Recording sample index of each column of :func:`read_preprocessed_segments`."""
+    if not segments:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(
+        [np.arange(start, stop, dtype=np.int64) for start, stop in segments]
+    )
+
+
+def stream_preprocess_intan(
+    reader: IntanAmplifierReader,
+    output_filepath: str | Path,
+    *,
+    sos: np.ndarray,
+    chunk_samples: int,
+    pad_samples: int | None = None,
+    good_channels: np.ndarray | list[int] | None = None,
+    common_median_reference: bool = False,
+    cmr_channel_groups: np.ndarray | list[int] | None = None,
+    zca_fit: ZcaFit | None = None,
+    rescale_amplitude: bool = True,
+    dtype: ProcessingDtype | None = None,
+    profiler: StageProfiler | None = None,
+) -> None:
+    """Preprocess ``reader`` chunk by chunk and write Intan int16 output.
+
+    Parameters
+    ----------
+    reader
+        Source recording.
+    output_filepath
+        Destination ``.dat``; written with the same interleaved int16 layout
+        and ``reader.bit_to_uV`` scale as the input.
+    sos
+        Bandpass SOS coefficients.
+    chunk_samples
+        Output samples per chunk (see :func:`chunk_samples_for_memory_budget`).
+    pad_samples
+        Chunk overlap; defaults to :func:`~ephys.processing.filtering.sos_filtfilt_pad_samples`
+        at :data:`~ephys.processing.filtering.DEFAULT_PAD_TOLERANCE`.
+    good_channels, common_median_reference, cmr_channel_groups, zca_fit, rescale_amplitude
+        Spatial reference settings passed to :func:`preprocess_time_range`.
+    dtype
+        Working dtype passed to :func:`preprocess_time_range`.
+    profiler
+        Passed to :func:`preprocess_time_range`; also records the
+        ``quantize_write`` stage.
+
+    Notes
+    -----
+    With the same ``zca_fit``, output matches the in-memory pipeline to
+    within one int16 count (``reader.bit_to_uV`` microvolts): chunk edges only
+    perturb the filtered signal by the pad tolerance, which can flip the
+    rounding of values that land within that distance of a half-count.
+    """
+    if pad_samples is None:
+        pad_samples = sos_filtfilt_pad_samples(sos, tolerance=DEFAULT_PAD_TOLERANCE)
+    chunks = plan_time_chunks(reader.n_samples, chunk_samples, pad_samples)
+    output = Path(output_filepath)
+    with output.open("wb") as handle:
+        for chunk in chunks:
+            voltage_uV = preprocess_time_range(
+                reader,
+                chunk.start,
+                chunk.stop,
+                sos=sos,
+                pad_samples=pad_samples,
+                good_channels=good_channels,
+                common_median_reference=common_median_reference,
+                cmr_channel_groups=cmr_channel_groups,
+                zca_fit=zca_fit,
+                rescale_amplitude=rescale_amplitude,
+                dtype=dtype,
+                profiler=profiler,
+            )
+            with profile_stage(profiler, "quantize_write", voltage_uV.size * 2):
+                voltage_int16 = np.round(voltage_uV / reader.bit_to_uV).astype(np.int16)
+                del voltage_uV
+                np.ascontiguousarray(voltage_int16.T).tofile(handle)
@@ -7,29 +7,45 @@ channels while staying close to the original waveform geometry.
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
+from typing import Any, Literal, overload
 
 import numpy as np
+from scipy import sparse
 
+from ephys.processing.artifacts import (
+    ArtifactIntervals,
+    detect_artifact_intervals,
+    merge_intervals,
+)
 from ephys.processing.filtering import (
     DEFAULT_INTAN_BANDPASS_ORDER,
     DEFAULT_INTAN_FS_HZ,
     DEFAULT_INTAN_HIGHCUT_HZ,
     DEFAULT_INTAN_LOWCUT_HZ,
 )
+from ephys.processing.precision import ProcessingDtype, resolve_processing_dtype
 
-ZCA_FIT_NPZ_VERSION = 2
+ZCA_FIT_NPZ_VERSION = 3
 _MAD_TO_STD = 1.4826
 _DEFAULT_ARTIFACT_N_SIGMA = 4.0
 _DEFAULT_ARTIFACT_PAD_MS = 0.5
+_DEFAULT_FIT_CHUNK_SAMPLES = 65_536
+_DEFAULT_RESERVOIR_SAMPLES = 200_000
+_DEFAULT_APPLY_CHUNK_SAMPLES = 65_536
 
 __all__ = [
     "ZCA_FIT_NPZ_VERSION",
+    "ZcaConvergence",
     "ZcaFit",
     "apply_zca_fit",
+    "apply_zca_fit_chunked",
     "apply_zca_whitening",
+    "detect_zca_artifact_intervals",
     "fit_zca_whitening",
+    "fit_zca_whitening_chunked",
+    "localize_zca_fit",
     "load_zca_fit_npz",
     "save_zca_fit_npz",
     "zca_matrix_from_covariance",
@@ -59,6 +75,16 @@ class ZcaFit:
         dilated before covariance estimation.
     sampling_rate_hz, lowcut_hz, highcut_hz, filter_order
         Bandpass provenance stored for validation at apply time.
+    whitening_operator
+        Optional sparse ``(n_good, n_good)`` CSR whitening operator from
+        :func:`localize_zca_fit`. When set it replaces the dense matrix
+        derived from :attr:`covariance`.
+    artifact_intervals
+        Artifact intervals excluded from the covariance when ``robust_cov``
+        is enabled, as recording sample indices (ticks) and already dilated
+        by ``artifact_pad_samples`` ticks. For a fit on a subsample or a
+        ``sample_indices`` selection, runs are split wherever the fit input
+        skips samples, so only fitted samples (plus padding) are covered.
     """
 
     good_channels: np.ndarray
@@ -72,9 +98,17 @@ class ZcaFit:
     lowcut_hz: float = DEFAULT_INTAN_LOWCUT_HZ
     highcut_hz: float = DEFAULT_INTAN_HIGHCUT_HZ
     filter_order: int = DEFAULT_INTAN_BANDPASS_ORDER
+    whitening_operator: sparse.csr_matrix | None = None
+    artifact_intervals: ArtifactIntervals | None = None
 
     def zca_matrix(self) -> np.ndarray:
-        """Return the whitening matrix derived from :attr:`covariance`."""
+        """Return the dense whitening matrix.
+
+        This is :attr:`whitening_operator` densified when a local operator is
+        set, and the ZCA matrix of :attr:`covariance` otherwise.
+        """
+        if self.whitening_operator is not None:
+            return self.whitening_operator.toarray()
         return zca_matrix_from_covariance(self.covariance, self.epsilon)
 
     def validate_filter_params(
@@ -112,6 +146,24 @@ class ZcaFit:
         return int(matches[0])
 
 
+@dataclass(frozen=True)
+class ZcaConvergence:
+    """Covariance convergence of :func:`fit_zca_whitening_chunked`.
+
+    Parameters
+    ----------
+    samples_used
+        Clean samples accumulated at each checkpoint (increasing; the last
+        entry is the total used by the fit).
+    relative_change
+        Frobenius norm of ``covariance_k - covariance_final`` divided by that
+        of ``covariance_final`` at each checkpoint.
+    """
+
+    samples_used: np.ndarray
+    relative_change: np.ndarray
+
+
 def _validate_voltage_matrix(
     voltage_matrix: np.ndarray,
     *,
@@ -208,16 +260,6 @@ def _robust_std_per_channel(centered: np.ndarray) -> np.ndarray:
     return np.median(np.abs(centered), axis=1, keepdims=True) * _MAD_TO_STD
 
 
-def _dilate_rejected_mask(is_clean: np.ndarray, pad_samples: int) -> np.ndarray:
-    """Expand rejected samples by ``pad_samples`` on each side."""
-    if pad_samples <= 0:
-        return is_clean
-    rejected = ~is_clean
-    kernel = np.ones(2 * pad_samples + 1, dtype=np.int8)
-    dilated_rejected = np.convolve(rejected.astype(np.int8), kernel, mode="same") > 0
-    return ~dilated_rejected
-
-
 def _clean_sample_mask(
     centered: np.ndarray,
     *,
@@ -227,8 +269,85 @@ def _clean_sample_mask(
     """Return a boolean mask of samples to keep for covariance estimation."""
     artifact_pad_samples = _validate_artifact_pad_samples(artifact_pad_samples)
     robust_std = _robust_std_per_channel(centered)
-    is_clean = np.all(np.abs(centered) < (n_sigma * robust_std), axis=0)
-    return _dilate_rejected_mask(is_clean, artifact_pad_samples)
+    intervals = detect_artifact_intervals(
+        centered,
+        n_sigma * robust_std[:, 0],
+        pad_samples=artifact_pad_samples,
+    )
+    return intervals.clean_mask()
+
+
+def _resolve_channel_ids(
+    good_channels: np.ndarray | list[int] | None,
+    n_channels: int,
+) -> np.ndarray:
+    """Return probe indices for each fit row, defaulting to ``0 .. n-1``."""
+    if good_channels is None:
+        return np.arange(n_channels, dtype=np.int64)
+    channel_ids = np.asarray(good_channels, dtype=np.int64).ravel()
+    if channel_ids.shape != (n_channels,):
+        msg = (
+            "good_channels must have length n_channels="
+            f"{n_channels}; got {channel_ids.shape}"
+        )
+        raise ValueError(msg)
+    return channel_ids
+
+
+def _covariance_in_place(samples: np.ndarray) -> np.ndarray:
+    """Sample covariance of ``samples`` in its own dtype; demeans in place."""
+    samples -= samples.mean(axis=1, keepdims=True)
+    return (samples @ samples.T) / (samples.shape[1] - 1)
+
+
+def _selection_intervals_to_ticks(
+    starts: np.ndarray,
+    stops: np.ndarray,
+    selected: np.ndarray | None,
+    n_samples: int,
+) -> ArtifactIntervals:
+    """Map intervals over selected columns back to recording sample indices.
+
+    ``selected`` holds the recording tick of each column (``None`` means
+    column ``i`` is tick ``i``). Runs are split wherever ``selected`` skips
+    ticks, so unselected samples never fall inside an interval.
+    """
+    starts, stops = merge_intervals(starts, stops)
+    if selected is not None and starts.size:
+        breaks = np.flatnonzero(np.diff(selected) != 1) + 1
+        run = np.maximum(np.searchsorted(starts, breaks, side="right") - 1, 0)
+        inner = breaks[(breaks > starts[run]) & (breaks < stops[run])]
+        starts = np.sort(np.concatenate((starts, inner)))
+        stops = np.sort(np.concatenate((stops, inner)))
+        starts, stops = merge_intervals(selected[starts], selected[stops - 1] + 1)
+    return ArtifactIntervals(starts=starts, stops=stops, n_samples=int(n_samples))
+
+
+def _validated_sample_ticks(
+    sample_ticks: np.ndarray,
+    n_samples: int,
+    n_recording_samples: int | None,
+) -> tuple[np.ndarray, int]:
+    """Return ``sample_ticks`` as int64 and the recording length they index."""
+    sample_ticks = np.asarray(sample_ticks, dtype=np.int64).ravel()
+    if sample_ticks.shape != (n_samples,) or np.any(np.diff(sample_ticks) <= 0):
+        msg = f"sample_ticks must be {n_samples} increasing sample indices"
+        raise ValueError(msg)
+    recording_length = int(sample_ticks[-1]) + 1 if n_samples else 0
+    if n_recording_samples is not None:
+        if n_recording_samples < recording_length:
+            msg = (
+                f"n_recording_samples={n_recording_samples} is shorter than "
+                f"the last sample tick {recording_length - 1}"
+            )
+            raise ValueError(msg)
+        recording_length = int(n_recording_samples)
+    return sample_ticks, recording_length
+
+
+def _covariance_from_sums(total: np.ndarray, outer: np.ndarray, n_used: int) -> np.ndarray:
+    """Unbiased covariance from a sum and a sum of outer products."""
+    return (outer - np.outer(total, total) / n_used) / (n_used - 1)
 
 
 def zca_matrix_from_covariance(covariance: np.ndarray, epsilon: float) -> np.ndarray:
@@ -251,6 +370,9 @@ def fit_zca_whitening(
     lowcut_hz: float = DEFAULT_INTAN_LOWCUT_HZ,
     highcut_hz: float = DEFAULT_INTAN_HIGHCUT_HZ,
     filter_order: int = DEFAULT_INTAN_BANDPASS_ORDER,
+    dtype: ProcessingDtype | None = None,
+    sample_ticks: np.ndarray | None = None,
+    n_recording_samples: int | None = None,
 ) -> ZcaFit:
     """Fit ZCA whitening on bandpassed multichannel voltage data.
 
@@ -272,6 +394,20 @@ def fit_zca_whitening(
         omitted, defaults to ``0 .. n_good-1``.
     sampling_rate_hz, lowcut_hz, highcut_hz, filter_order
         Bandpass metadata stored in the returned :class:`ZcaFit`.
+    dtype
+        Working dtype for centering and covariance (see
+        :mod:`ephys.processing.precision`). ``None`` uses :func:`numpy.cov`,
+        which works in float64; otherwise covariance is a matrix product in
+        ``dtype`` with no float64 temporaries. The fit is stored as float64.
+    sample_ticks
+        Increasing recording sample index of each column when
+        ``voltage_matrix`` is a subsample (e.g. concatenated segments from
+        :func:`~ephys.processing.streaming.read_preprocessed_segments`).
+        Artifact padding and :attr:`ZcaFit.artifact_intervals` are then in
+        recording ticks. Defaults to ``0 .. n_samples-1``.
+    n_recording_samples
+        Length of the recording ``sample_ticks`` index into; defaults to
+        ``sample_ticks[-1] + 1``.
 
     Returns
     -------
@@ -299,25 +435,39 @@ def fit_zca_whitening(
         )
         raise ValueError(msg)
 
-    if good_channels is None:
-        channel_ids = np.arange(n_channels, dtype=np.int64)
-    else:
-        channel_ids = np.asarray(good_channels, dtype=np.int64).ravel()
-        if channel_ids.shape != (n_channels,):
-            msg = (
-                "good_channels must have length n_channels="
-                f"{n_channels}; got {channel_ids.shape}"
-            )
-            raise ValueError(msg)
+    channel_ids = _resolve_channel_ids(good_channels, n_channels)
+    recording_length = n_samples
+    if sample_ticks is not None:
+        sample_ticks, recording_length = _validated_sample_ticks(
+            sample_ticks,
+            n_samples,
+            n_recording_samples,
+        )
 
-    centered = voltage_matrix - np.median(voltage_matrix, axis=1, keepdims=True)
+    work_dtype = resolve_processing_dtype(dtype)
+    if work_dtype is not None:
+        voltage_matrix = np.asarray(voltage_matrix, dtype=work_dtype)
+    channel_medians = np.median(voltage_matrix, axis=1, keepdims=True)
+    centered = voltage_matrix - channel_medians
     robust_std = _robust_std_per_channel(centered)
 
+    artifact_intervals = None
     if robust_cov:
-        is_clean_sample = _clean_sample_mask(
+        runs = detect_artifact_intervals(
             centered,
-            artifact_pad_samples=artifact_pad_samples,
+            _DEFAULT_ARTIFACT_N_SIGMA * robust_std[:, 0],
         )
+        if sample_ticks is None:
+            artifact_intervals = runs.dilate(artifact_pad_samples)
+            is_clean_sample = artifact_intervals.clean_mask()
+        else:
+            artifact_intervals = _selection_intervals_to_ticks(
+                runs.starts,
+                runs.stops,
+                sample_ticks,
+                recording_length,
+            ).dilate(artifact_pad_samples)
+            is_clean_sample = ~artifact_intervals.contains(sample_ticks)
         n_clean = int(is_clean_sample.sum())
         if n_clean < 2:
             msg = (
@@ -325,14 +475,18 @@ def fit_zca_whitening(
                 f"artifact gate; got {n_clean}. Try robust_cov=False."
             )
             raise ValueError(msg)
-        covariance = np.cov(centered[:, is_clean_sample])
+        cov_samples = centered[:, is_clean_sample]
     else:
-        covariance = np.cov(centered)
+        cov_samples = centered
+    if work_dtype is None:
+        covariance = np.cov(cov_samples)
+    else:
+        covariance = _covariance_in_place(cov_samples)
 
     return ZcaFit(
         good_channels=channel_ids,
         covariance=np.asarray(covariance, dtype=np.float64),
-        channel_medians=np.median(voltage_matrix, axis=1).astype(np.float64),
+        channel_medians=channel_medians[:, 0].astype(np.float64),
         mean_robust_std=float(np.mean(robust_std)),
         epsilon=float(epsilon),
         robust_cov=bool(robust_cov),
@@ -341,14 +495,425 @@ def fit_zca_whitening(
         lowcut_hz=float(lowcut_hz),
         highcut_hz=float(highcut_hz),
         filter_order=int(filter_order),
+        artifact_intervals=artifact_intervals,
     )
 
 
+@overload
+def fit_zca_whitening_chunked(
+    voltage_matrix: np.ndarray,
+    *,
+    sample_indices: np.ndarray | None = None,
+    chunk_samples: int = _DEFAULT_FIT_CHUNK_SAMPLES,
+    reservoir_samples: int = _DEFAULT_RESERVOIR_SAMPLES,
+    epsilon: float = 10.0,
+    robust_cov: bool = True,
+    artifact_pad_samples: int | None = None,
+    good_channels: np.ndarray | list[int] | None = None,
+    sampling_rate_hz: float = DEFAULT_INTAN_FS_HZ,
+    lowcut_hz: float = DEFAULT_INTAN_LOWCUT_HZ,
+    highcut_hz: float = DEFAULT_INTAN_HIGHCUT_HZ,
+    filter_order: int = DEFAULT_INTAN_BANDPASS_ORDER,
+    dtype: ProcessingDtype | None = None,
+    return_convergence: Literal[False] = ...,
+) -> ZcaFit: ...
+
+
+@overload
+def fit_zca_whitening_chunked(
+    voltage_matrix: np.ndarray,
+    *,
+    sample_indices: np.ndarray | None = None,
+    chunk_samples: int = _DEFAULT_FIT_CHUNK_SAMPLES,
+    reservoir_samples: int = _DEFAULT_RESERVOIR_SAMPLES,
+    epsilon: float = 10.0,
+    robust_cov: bool = True,
+    artifact_pad_samples: int | None = None,
+    good_channels: np.ndarray | list[int] | None = None,
+    sampling_rate_hz: float = DEFAULT_INTAN_FS_HZ,
+    lowcut_hz: float = DEFAULT_INTAN_LOWCUT_HZ,
+    highcut_hz: float = DEFAULT_INTAN_HIGHCUT_HZ,
+    filter_order: int = DEFAULT_INTAN_BANDPASS_ORDER,
+    dtype: ProcessingDtype | None = None,
+    return_convergence: Literal[True],
+) -> tuple[ZcaFit, ZcaConvergence]: ...
+
+
+def fit_zca_whitening_chunked(
+    voltage_matrix: np.ndarray,
+    *,
+    sample_indices: np.ndarray | None = None,
+    chunk_samples: int = _DEFAULT_FIT_CHUNK_SAMPLES,
+    reservoir_samples: int = _DEFAULT_RESERVOIR_SAMPLES,
+    epsilon: float = 10.0,
+    robust_cov: bool = True,
+    artifact_pad_samples: int | None = None,
+    good_channels: np.ndarray | list[int] | None = None,
+    sampling_rate_hz: float = DEFAULT_INTAN_FS_HZ,
+    lowcut_hz: float = DEFAULT_INTAN_LOWCUT_HZ,
+    highcut_hz: float = DEFAULT_INTAN_HIGHCUT_HZ,
+    filter_order: int = DEFAULT_INTAN_BANDPASS_ORDER,
+    dtype: ProcessingDtype | None = None,
+    return_convergence: bool = False,
+) -> ZcaFit | tuple[ZcaFit, ZcaConvergence]:
+    """Fit ZCA whitening from block-wise covariance statistics.
+
+    Equivalent to :func:`fit_zca_whitening` except that channel medians and
+    robust scales come from a bounded, evenly spread reservoir of samples,
+    and covariance is accumulated as sums and outer products over time
+    blocks. Peak memory is one block plus the reservoir, so
+    ``voltage_matrix`` can be a :class:`numpy.memmap` of a whole session.
+
+    Parameters
+    ----------
+    voltage_matrix
+        Bandpassed voltage with shape ``(n_good, n_samples)``. Not modified.
+    sample_indices
+        Increasing time indices to fit on, e.g. from
+        :func:`~ephys.processing.spatial_diagnostics.plan_spatial_subsample_indices`.
+        Artifacts are dilated in recording ticks, exactly as if
+        ``voltage_matrix[:, sample_indices]`` were passed to
+        :func:`fit_zca_whitening` with ``sample_ticks=sample_indices``.
+        Defaults to every sample.
+    chunk_samples
+        Selected samples per accumulation block.
+    reservoir_samples
+        Maximum samples used to estimate medians and robust scales.
+    epsilon, robust_cov, artifact_pad_samples, good_channels
+        As in :func:`fit_zca_whitening`.
+    sampling_rate_hz, lowcut_hz, highcut_hz, filter_order
+        Bandpass metadata stored in the returned :class:`ZcaFit`.
+    dtype
+        Working dtype of each block (see :mod:`ephys.processing.precision`);
+        ``None`` uses float64. Sums are always accumulated in float64.
+    return_convergence
+        Also return a :class:`ZcaConvergence` with a checkpoint at every
+        doubling of the number of clean samples used.
+
+    Returns
+    -------
+    ZcaFit or tuple
+        The fit, or ``(fit, convergence)`` when ``return_convergence`` is
+        ``True``.
+
+    Notes
+    -----
+    When the reservoir covers the whole selection, the result matches
+    :func:`fit_zca_whitening` on the selected samples (with
+    ``sample_ticks=sample_indices`` and ``n_recording_samples=n_samples``)
+    up to rounding.
+    """
+    artifact_pad_samples = _resolve_artifact_pad_samples(
+        artifact_pad_samples,
+        sampling_rate_hz,
+    )
+    n_channels, n_samples = _validate_voltage_matrix(
+        voltage_matrix,
+        epsilon=epsilon,
+        robust_cov=robust_cov,
+    )
+    if chunk_samples < 1 or reservoir_samples < 1:
+        msg = (
+            "chunk_samples and reservoir_samples must be positive; got "
+            f"{chunk_samples} and {reservoir_samples}"
+        )
+        raise ValueError(msg)
+    channel_ids = _resolve_channel_ids(good_channels, n_channels)
+    work_dtype = resolve_processing_dtype(dtype) or np.dtype(np.float64)
+
+    if sample_indices is None:
+        selected = None
+        n_selected = n_samples
+    else:
+        selected = np.asarray(sample_indices, dtype=np.int64).ravel()
+        n_selected = int(selected.size)
+        if n_selected and (
+            np.any(np.diff(selected) <= 0) or selected[0] < 0 or selected[-1] >= n_samples
+        ):
+            msg = f"sample_indices must be increasing and within [0, {n_samples})"
+            raise ValueError(msg)
+    if n_selected < 2:
+        msg = f"Covariance estimation needs at least 2 samples; got {n_selected}"
+        raise ValueError(msg)
+
+    def read_columns(rows: slice | np.ndarray) -> np.ndarray:
+        """Selected columns (a view for contiguous slices of the input)."""
+        columns = rows if selected is None else selected[rows]
+        return voltage_matrix[:, columns]
+
+    reservoir_rows = np.unique(
+        np.round(np.linspace(0, n_selected - 1, min(int(reservoir_samples), n_selected)))
+    ).astype(np.int64)
+    reservoir = np.asarray(read_columns(reservoir_rows), dtype=work_dtype)
+    channel_medians = np.median(reservoir, axis=1, keepdims=True)
+    reservoir -= channel_medians
+    robust_std = _robust_std_per_channel(reservoir)
+    del reservoir
+    thresholds = _DEFAULT_ARTIFACT_N_SIGMA * robust_std[:, 0]
+
+    pad = artifact_pad_samples if robust_cov else 0
+    run_starts: list[np.ndarray] = []
+    run_stops: list[np.ndarray] = []
+    total = np.zeros(n_channels, dtype=np.float64)
+    outer = np.zeros((n_channels, n_channels), dtype=np.float64)
+    n_used = 0
+    checkpoints: list[tuple[int, np.ndarray]] = []
+    next_checkpoint = 2
+
+    for start in range(0, n_selected, int(chunk_samples)):
+        stop = min(start + int(chunk_samples), n_selected)
+        padded_start = max(0, start - pad)
+        padded_stop = min(n_selected, stop + pad)
+        block = np.subtract(
+            read_columns(slice(padded_start, padded_stop)),
+            channel_medians,
+            dtype=work_dtype,
+        )
+        if robust_cov:
+            # Runs detected in the padded block are mapped to recording ticks
+            # and dilated there (as the stored intervals are) to decide which
+            # core samples are clean; the undilated runs inside the core are
+            # kept for the session-wide interval list.
+            core_start, core_stop = start - padded_start, stop - padded_start
+            runs = detect_artifact_intervals(block, thresholds, chunk_samples=block.shape[1])
+            block_ticks = (
+                np.arange(padded_start, padded_stop, dtype=np.int64)
+                if selected is None
+                else selected[padded_start:padded_stop]
+            )
+            rejected = _selection_intervals_to_ticks(
+                runs.starts,
+                runs.stops,
+                block_ticks,
+                n_samples,
+            ).dilate(pad)
+            is_clean = ~rejected.contains(block_ticks[core_start:core_stop])
+            clipped_starts = np.clip(runs.starts, core_start, core_stop)
+            clipped_stops = np.clip(runs.stops, core_start, core_stop)
+            nonempty = clipped_stops > clipped_starts
+            run_starts.append(clipped_starts[nonempty] + padded_start)
+            run_stops.append(clipped_stops[nonempty] + padded_start)
+            block = block[:, core_start:core_stop][:, is_clean]
+        total += block.sum(axis=1, dtype=np.float64)
+        outer += block @ block.T
+        n_used += block.shape[1]
+        if return_convergence and n_used >= next_checkpoint:
+            checkpoints.append((n_used, _covariance_from_sums(total, outer, n_used)))
+            next_checkpoint = 2 * n_used
+
+    if n_used < 2:
+        msg = (
+            "robust_cov requires at least 2 samples passing the clean "
+            f"artifact gate; got {n_used}. Try robust_cov=False."
+        )
+        raise ValueError(msg)
+    covariance = _covariance_from_sums(total, outer, n_used)
+    artifact_intervals = None
+    if robust_cov:
+        artifact_intervals = _selection_intervals_to_ticks(
+            np.concatenate(run_starts),
+            np.concatenate(run_stops),
+            selected,
+            n_samples,
+        ).dilate(pad)
+    fit = ZcaFit(
+        good_channels=channel_ids,
+        covariance=covariance,
+        channel_medians=channel_medians[:, 0].astype(np.float64),
+        mean_robust_std=float(np.mean(robust_std)),
+        epsilon=float(epsilon),
+        robust_cov=bool(robust_cov),
+        artifact_pad_samples=artifact_pad_samples,
+        sampling_rate_hz=float(sampling_rate_hz),
+        lowcut_hz=float(lowcut_hz),
+        highcut_hz=float(highcut_hz),
+        filter_order=int(filter_order),
+        artifact_intervals=artifact_intervals,
+    )
+    if not return_convergence:
+        return fit
+    if not checkpoints or checkpoints[-1][0] != n_used:
+        checkpoints.append((n_used, covariance))
+    norm = float(np.linalg.norm(covariance))
+    convergence = ZcaConvergence(
+        samples_used=np.array([n for n, _ in checkpoints], dtype=np.int64),
+        relative_change=np.array(
+            [float(np.linalg.norm(c - covariance)) / norm for _, c in checkpoints]
+        ),
+    )
+    return fit, convergence
+
+
+def detect_zca_artifact_intervals(
+    voltage_matrix: np.ndarray,
+    *,
+    channels: np.ndarray | list[int] | None = None,
+    artifact_pad_samples: int | None = None,
+    sampling_rate_hz: float = DEFAULT_INTAN_FS_HZ,
+    reservoir_samples: int = _DEFAULT_RESERVOIR_SAMPLES,
+    sample_ticks: np.ndarray | None = None,
+    n_recording_samples: int | None = None,
+) -> ArtifactIntervals:
+    """Detect artifacts with the all-channel gate used by the ZCA fits.
+
+    A sample is an artifact when any scanned channel deviates from its
+    median by at least four robust standard deviations. As in
+    :func:`fit_zca_whitening_chunked`, medians and scales come from an evenly
+    spread reservoir and crossings are scanned block-wise, so extra memory is
+    the reservoir plus one block. Intended to pick, once, the samples that
+    every :func:`~ephys.processing.spatial_diagnostics.compute_spatial_diagnostics`
+    stage of a run skips.
+
+    Parameters
+    ----------
+    voltage_matrix
+        Bandpassed voltage with shape ``(n_channels, n_samples)``; may be a
+        :class:`numpy.memmap`. Not modified.
+    channels
+        Rows to gate on (e.g. the good channels); defaults to every row.
+    artifact_pad_samples, sampling_rate_hz
+        Dilation as in :func:`fit_zca_whitening` (default ``0.5`` ms).
+    reservoir_samples
+        Maximum samples used to estimate medians and robust scales.
+    sample_ticks, n_recording_samples
+        Recording tick of each column when ``voltage_matrix`` is a
+        subsample, as in :func:`fit_zca_whitening`.
+
+    Returns
+    -------
+    ArtifactIntervals
+        Dilated intervals in recording ticks.
+    """
+    pad = _resolve_artifact_pad_samples(artifact_pad_samples, sampling_rate_hz)
+    n_samples = int(voltage_matrix.shape[1])
+    recording_length = n_samples
+    if sample_ticks is not None:
+        sample_ticks, recording_length = _validated_sample_ticks(
+            sample_ticks,
+            n_samples,
+            n_recording_samples,
+        )
+    if reservoir_samples < 1:
+        msg = f"reservoir_samples must be positive, got {reservoir_samples}"
+        raise ValueError(msg)
+    if n_samples == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return ArtifactIntervals(starts=empty, stops=empty, n_samples=recording_length)
+    columns = np.unique(
+        np.round(np.linspace(0, n_samples - 1, min(int(reservoir_samples), n_samples)))
+    ).astype(np.int64)
+    reservoir = np.asarray(voltage_matrix[:, columns], dtype=np.float64)
+    if channels is not None:
+        reservoir = reservoir[np.asarray(channels, dtype=np.intp).ravel()]
+    channel_medians = np.median(reservoir, axis=1, keepdims=True)
+    reservoir -= channel_medians
+    robust_std = _robust_std_per_channel(reservoir)
+    del reservoir
+    runs = detect_artifact_intervals(
+        voltage_matrix,
+        _DEFAULT_ARTIFACT_N_SIGMA * robust_std[:, 0],
+        channel_medians=channel_medians[:, 0],
+        channels=channels,
+    )
+    return _selection_intervals_to_ticks(
+        runs.starts,
+        runs.stops,
+        sample_ticks,
+        recording_length,
+    ).dilate(pad)
+
+
+def localize_zca_fit(
+    fit: ZcaFit,
+    channel_positions: np.ndarray,
+    *,
+    n_neighbors: int | None = None,
+    radius_um: float | None = None,
+) -> ZcaFit:
+    """Return ``fit`` with a sparse, local-neighborhood whitening operator.
+
+    Each channel is whitened against only nearby contacts: row ``i`` of the
+    operator is channel ``i``'s row of the ZCA matrix of the covariance
+    restricted to its neighborhood. Applying the operator costs
+    ``O(n_good * k)`` per sample instead of ``O(n_good**2)``.
+
+    Parameters
+    ----------
+    fit
+        Dense fit from :func:`fit_zca_whitening` or
+        :func:`fit_zca_whitening_chunked`.
+    channel_positions
+        Contact positions indexed by probe channel, e.g. from
+        :func:`ephys.probes.get_channel_positions`; rows are selected with
+        :attr:`ZcaFit.good_channels`.
+    n_neighbors
+        Neighborhood size, including the channel itself.
+    radius_um
+        Include every good channel within this distance instead.
+
+    Returns
+    -------
+    ZcaFit
+        Copy of ``fit`` with :attr:`ZcaFit.whitening_operator` set.
+
+    Raises
+    ------
+    ValueError
+        Unless exactly one of ``n_neighbors`` and ``radius_um`` is given, or
+        if a good channel has no position.
+
+    Notes
+    -----
+    With ``n_neighbors`` equal to the number of good channels the operator
+    equals the dense ZCA matrix.
+    """
+    if (n_neighbors is None) == (radius_um is None):
+        msg = "Pass exactly one of n_neighbors and radius_um"
+        raise ValueError(msg)
+    if n_neighbors is not None and n_neighbors < 1:
+        msg = f"n_neighbors must be positive, got {n_neighbors}"
+        raise ValueError(msg)
+    positions = np.asarray(channel_positions, dtype=np.float64)[fit.good_channels]
+    if np.isnan(positions).any():
+        msg = "channel_positions has no position for some good channels"
+        raise ValueError(msg)
+    offsets = positions[:, np.newaxis, :] - positions[np.newaxis, :, :]
+    distances = np.sqrt(np.sum(offsets**2, axis=-1))
+    nearest = np.argsort(distances, axis=1, kind="stable")
+    radius = np.inf if radius_um is None else float(radius_um)
+
+    n_good = positions.shape[0]
+    rows: list[np.ndarray] = []
+    columns: list[np.ndarray] = []
+    weights: list[np.ndarray] = []
+    for channel in range(n_good):
+        if n_neighbors is not None:
+            neighborhood = nearest[channel, : min(int(n_neighbors), n_good)]
+        else:
+            order = nearest[channel]
+            neighborhood = order[distances[channel, order] <= radius]
+        local = zca_matrix_from_covariance(
+            fit.covariance[np.ix_(neighborhood, neighborhood)],
+            fit.epsilon,
+        )
+        rows.append(np.full(neighborhood.size, channel))
+        columns.append(neighborhood)
+        weights.append(local[np.flatnonzero(neighborhood == channel)[0]])
+
+    operator = sparse.csr_matrix(
+        (np.concatenate(weights), (np.concatenate(rows), np.concatenate(columns))),
+        shape=(n_good, n_good),
+    )
+    operator.sort_indices()
+    return replace(fit, whitening_operator=operator)
+
+
 def apply_zca_fit(
     voltage_matrix: np.ndarray,
     fit: ZcaFit,
     *,
     rescale_amplitude: bool = True,
+    dtype: ProcessingDtype | None = None,
 ) -> np.ndarray:
     """Apply a saved :class:`ZcaFit` to bandpassed multichannel data.
 
@@ -361,6 +926,9 @@ def apply_zca_fit(
         Parameters from :func:`fit_zca_whitening`.
     rescale_amplitude
         Multiply whitened data by :attr:`ZcaFit.mean_robust_std` when ``True``.
+    dtype
+        Precision of the whitening product (see
+        :mod:`ephys.processing.precision`). ``None`` multiplies in float64.
 
     Returns
     -------
@@ -370,9 +938,68 @@ def apply_zca_fit(
     Notes
     -----
     Caller must bandpass-filter before calling. Session medians from ``fit``
-    are subtracted (not snippet-local medians).
+    are subtracted (not snippet-local medians). Time blocks are whitened
+    through :func:`apply_zca_fit_chunked`, so extra memory is bounded by one
+    block.
     """
-    n_channels, _ = _validate_voltage_matrix(
+    return apply_zca_fit_chunked(
+        voltage_matrix,
+        fit,
+        out=voltage_matrix,
+        rescale_amplitude=rescale_amplitude,
+        dtype=dtype,
+    )
+
+
+def apply_zca_fit_chunked(
+    voltage_matrix: np.ndarray,
+    fit: ZcaFit,
+    *,
+    out: np.ndarray | None = None,
+    chunk_samples: int = _DEFAULT_APPLY_CHUNK_SAMPLES,
+    rescale_amplitude: bool = True,
+    bit_to_uV: float | None = None,
+    dtype: ProcessingDtype | None = None,
+) -> np.ndarray:
+    """Whiten time blocks of ``voltage_matrix`` into a preallocated output.
+
+    Parameters
+    ----------
+    voltage_matrix
+        Bandpassed voltage with shape ``(n_good, n_samples)``; may be a
+        :class:`numpy.memmap`. Not modified unless ``out`` is the same array.
+    fit
+        Parameters from :func:`fit_zca_whitening`.
+    out
+        Destination with the same shape, e.g. a writable memmap or the
+        transposed ``(n_samples, n_channels)`` view of an Intan ``.dat``
+        memmap. May be ``voltage_matrix`` itself. Allocated when omitted, as
+        int16 when ``bit_to_uV`` is set and in the input dtype otherwise.
+    chunk_samples
+        Samples per block.
+    rescale_amplitude
+        Multiply whitened data by :attr:`ZcaFit.mean_robust_std` when ``True``.
+    bit_to_uV
+        When set, fuse quantization: whitened microvolts are divided by this
+        scale and rounded before being written (e.g. to an int16 ``out``).
+    dtype
+        Working dtype of each block (see :mod:`ephys.processing.precision`);
+        ``None`` uses float64.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``out``.
+
+    Notes
+    -----
+    Each block is median-centered into one reusable buffer and multiplied
+    by the whitening matrix (with the amplitude and quantization scales
+    folded in) into a second, so peak extra memory is two blocks regardless
+    of recording length. A local :attr:`ZcaFit.whitening_operator` is
+    applied with a sparse matrix product.
+    """
+    n_channels, n_samples = _validate_voltage_matrix(
         voltage_matrix,
         epsilon=fit.epsilon,
         rescale_amplitude=rescale_amplitude,
@@ -383,13 +1010,42 @@ def apply_zca_fit(
             f"got {n_channels}, expected {fit.good_channels.shape[0]}"
         )
         raise ValueError(msg)
+    if chunk_samples < 1:
+        msg = f"chunk_samples must be positive, got {chunk_samples}"
+        raise ValueError(msg)
+    if out is None:
+        out_dtype = np.int16 if bit_to_uV is not None else voltage_matrix.dtype
+        out = np.empty(voltage_matrix.shape, dtype=out_dtype)
+    elif out.shape != voltage_matrix.shape:
+        msg = f"out must have shape {voltage_matrix.shape}, got {out.shape}"
+        raise ValueError(msg)
 
-    voltage_matrix -= fit.channel_medians[:, np.newaxis]
-    zca_matrix = fit.zca_matrix()
-    voltage_matrix[:] = zca_matrix @ voltage_matrix
-    if rescale_amplitude:
-        voltage_matrix *= fit.mean_robust_std
-    return voltage_matrix
+    work_dtype = resolve_processing_dtype(dtype) or np.dtype(np.float64)
+    scale = float(fit.mean_robust_std) if rescale_amplitude else 1.0
+    if bit_to_uV is not None:
+        scale /= float(bit_to_uV)
+    is_sparse = fit.whitening_operator is not None
+    if is_sparse:
+        operator = (fit.whitening_operator * scale).astype(work_dtype)
+    else:
+        operator = (fit.zca_matrix() * scale).astype(work_dtype)
+    medians = fit.channel_medians.astype(work_dtype)[:, np.newaxis]
+
+    block_width = min(int(chunk_samples), n_samples)
+    centered = np.empty((n_channels, block_width), dtype=work_dtype)
+    whitened = None if is_sparse else np.empty((n_channels, block_width), dtype=work_dtype)
+    for start in range(0, n_samples, block_width):
+        stop = min(start + block_width, n_samples)
+        width = stop - start
+        np.subtract(voltage_matrix[:, start:stop], medians, out=centered[:, :width])
+        if whitened is None:
+            block = operator @ centered[:, :width]
+        else:
+            block = np.matmul(operator, centered[:, :width], out=whitened[:, :width])
+        if bit_to_uV is not None:
+            np.round(block, out=block)
+        out[:, start:stop] = block
+    return out
 
 
 def apply_zca_whitening(
@@ -399,6 +1055,7 @@ def apply_zca_whitening(
     robust_cov: bool = True,
     artifact_pad_samples: int | None = None,
     sampling_rate_hz: float = DEFAULT_INTAN_FS_HZ,
+    dtype: ProcessingDtype | None = None,
 ) -> np.ndarray:
     """Whiten a voltage matrix with ZCA using robust per-channel scaling.
 
@@ -435,6 +1092,9 @@ def apply_zca_whitening(
     sampling_rate_hz : float, optional
         Sample rate used to resolve the default ``artifact_pad_samples``.
         Default is :data:`~ephys.processing.filtering.DEFAULT_INTAN_FS_HZ`.
+    dtype : {"float32", "float64"} or None, optional
+        Working precision passed to :func:`fit_zca_whitening` and
+        :func:`apply_zca_fit`. Default ``None`` keeps float64 arithmetic.
 
     Returns
     -------
@@ -459,23 +1119,43 @@ def apply_zca_whitening(
         robust_cov=robust_cov,
     )
     fit = fit_zca_whitening(
-        np.array(voltage_matrix, copy=True),
+        voltage_matrix,
         epsilon=epsilon,
         robust_cov=robust_cov,
         artifact_pad_samples=artifact_pad_samples,
         sampling_rate_hz=sampling_rate_hz,
+        dtype=dtype,
     )
     return apply_zca_fit(
         voltage_matrix,
         fit,
         rescale_amplitude=rescale_amplitude,
+        dtype=dtype,
     )
 
 
 def save_zca_fit_npz(path: str | Path, fit: ZcaFit) -> None:
-    """Write a :class:`ZcaFit` to an ``.npz`` artifact."""
+    """Write a :class:`ZcaFit` to an ``.npz`` artifact.
+
+    A local :attr:`ZcaFit.whitening_operator` is stored as its CSR
+    ``indptr``/``indices``/``data`` arrays, and
+    :attr:`ZcaFit.artifact_intervals` as ``artifact_starts``/``artifact_stops``.
+    """
     output = Path(path)
     output.parent.mkdir(parents=True, exist_ok=True)
+    optional_arrays: dict[str, Any] = {}
+    if fit.artifact_intervals is not None:
+        optional_arrays = {
+            "artifact_starts": fit.artifact_intervals.starts.astype(np.int64),
+            "artifact_stops": fit.artifact_intervals.stops.astype(np.int64),
+            "artifact_n_samples": np.int64(fit.artifact_intervals.n_samples),
+        }
+    if fit.whitening_operator is not None:
+        optional_arrays |= {
+            "operator_indptr": fit.whitening_operator.indptr.astype(np.int64),
+            "operator_indices": fit.whitening_operator.indices.astype(np.int64),
+            "operator_data": fit.whitening_operator.data.astype(np.float64),
+        }
     np.savez(
         output,
         version=np.int32(ZCA_FIT_NPZ_VERSION),
@@ -490,6 +1170,7 @@ def save_zca_fit_npz(path: str | Path, fit: ZcaFit) -> None:
         lowcut_hz=np.float64(fit.lowcut_hz),
         highcut_hz=np.float64(fit.highcut_hz),
         filter_order=np.int32(fit.filter_order),
+        **optional_arrays,
     )
 
 
@@ -497,15 +1178,33 @@ def load_zca_fit_npz(path: str | Path) -> ZcaFit:
     """Load a :class:`ZcaFit` written by :func:`save_zca_fit_npz`."""
     with np.load(Path(path), allow_pickle=False) as archive:
         version = int(archive["version"])
-        if version not in (1, ZCA_FIT_NPZ_VERSION):
+        if version not in (1, 2, ZCA_FIT_NPZ_VERSION):
             msg = (
                 f"Unsupported ZCA fit npz version {version}; "
-                f"expected 1 or {ZCA_FIT_NPZ_VERSION}"
+                f"expected 1 to {ZCA_FIT_NPZ_VERSION}"
             )
             raise ValueError(msg)
         artifact_pad_samples = (
             0 if version < 2 else int(archive["artifact_pad_samples"])
         )
+        n_good = archive["good_channels"].shape[0]
+        whitening_operator = None
+        if "operator_data" in archive.files:
+            whitening_operator = sparse.csr_matrix(
+                (
+                    archive["operator_data"],
+                    archive["operator_indices"],
+                    archive["operator_indptr"],
+                ),
+                shape=(n_good, n_good),
+            )
+        artifact_intervals = None
+        if "artifact_starts" in archive.files:
+            artifact_intervals = ArtifactIntervals(
+                starts=np.asarray(archive["artifact_starts"], dtype=np.int64),
+                stops=np.asarray(archive["artifact_stops"], dtype=np.int64),
+                n_samples=int(archive["artifact_n_samples"]),
+            )
         return ZcaFit(
             good_channels=np.asarray(archive["good_channels"], dtype=np.int64),
             covariance=np.asarray(archive["covariance"], dtype=np.float64),
@@ -518,4 +1217,6 @@ def load_zca_fit_npz(path: str | Path) -> ZcaFit:
             lowcut_hz=float(archive["lowcut_hz"]),
             highcut_hz=float(archive["highcut_hz"]),
             filter_order=int(archive["filter_order"]),
+            whitening_operator=whitening_operator,
+            artifact_intervals=artifact_intervals,
         )
@@ -0,0 +1,263 @@
+"""On-disk cache of :class:`~ephys.processing.zca.ZcaFit` artifacts.
+
+Refitting ZCA dominates reprocessing a session with different output
+options. Fits are stored as ``.npz`` files (see
+:func:`~ephys.processing.zca.save_zca_fit_npz`) named by a key that hashes
+
+* a cheap fingerprint of the input recording (size, modification time, and
+  a hash of evenly spaced byte blocks), and
+* every parameter that changes the fit (epsilon, artifact gating, channel
+  selection, bandpass provenance, preceding referencing, precision, ...).
+
+The cache directory is bounded by total size; the least recently used fits
+are evicted first. A hit refreshes the file's modification time, which is
+the recency order used for eviction.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import warnings
+from collections.abc import Callable, Mapping
+from pathlib import Path
+
+import numpy as np
+
+from ephys.processing.zca import (
+    ZCA_FIT_NPZ_VERSION,
+    ZcaFit,
+    load_zca_fit_npz,
+    save_zca_fit_npz,
+)
+
+ZCA_CACHE_DIR_ENV = "EPHYS_ZCA_CACHE_DIR"
+DEFAULT_ZCA_CACHE_MAX_BYTES = 256 * 2**20
+_FINGERPRINT_BLOCKS = 16
+_FINGERPRINT_BLOCK_BYTES = 64 * 2**10
+
+__all__ = [
+    "DEFAULT_ZCA_CACHE_MAX_BYTES",
+    "ZCA_CACHE_DIR_ENV",
+    "ZcaFitCache",
+    "default_zca_cache_dir",
+    "recording_fingerprint",
+    "zca_fit_cache_key",
+]
+
+
+def default_zca_cache_dir() -> Path:
+    """Return ``$EPHYS_ZCA_CACHE_DIR`` or ``~/.cache/ephys/zca``."""
+    configured = os.environ.get(ZCA_CACHE_DIR_ENV)
+    if configured:
+        return Path(configured).expanduser()
+    return Path.home() / ".cache" / "ephys" / "zca"
+
+
+def recording_fingerprint(
+    path: str | Path,
+    *,
+    n_blocks: int = _FINGERPRINT_BLOCKS,
+    block_bytes: int = _FINGERPRINT_BLOCK_BYTES,
+) -> str:
+    """Hash a recording's size, mtime, and evenly spaced byte blocks.
+
+    Reads at most ``n_blocks * block_bytes`` bytes, so fingerprinting a
+    multi-gigabyte ``.dat`` is effectively free. A rewritten file changes
+    the modification time; a file edited in place without touching the
+    mtime is still caught if any sampled block differs.
+    """
+    source = Path(path)
+    status = source.stat()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{status.st_size}:{status.st_mtime_ns}".encode())
+    n_blocks = max(1, int(n_blocks))
+    block_bytes = max(1, int(block_bytes))
+    last_offset = max(0, status.st_size - block_bytes)
+    offsets = np.unique(np.linspace(0, last_offset, n_blocks).astype(np.int64))
+    with source.open("rb") as handle:
+        for offset in offsets:
+            handle.seek(int(offset))
+            digest.update(handle.read(block_bytes))
+    return digest.hexdigest()
+
+
+def _json_ready(value: object) -> object:
+    """Convert numpy scalars/arrays and paths for canonical JSON encoding."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, Mapping):
+        return {str(key): _json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_ready(item) for item in value]
+    return value
+
+
+def zca_fit_cache_key(fingerprint: str, params: Mapping[str, object]) -> str:
+    """Combine a recording fingerprint and fit parameters into a cache key.
+
+    ``params`` must be JSON-serializable (numpy arrays and scalars are
+    converted); key order does not matter. The npz format version is part of
+    the key so format changes never load stale files.
+    """
+    payload = json.dumps(
+        {
+            "fingerprint": fingerprint,
+            "npz_version": ZCA_FIT_NPZ_VERSION,
+            "params": _json_ready(params),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ZcaFitCache:
+    """Size-bounded LRU directory of ZCA fit ``.npz`` files.
+
+    Parameters
+    ----------
+    directory
+        Cache directory; defaults to :func:`default_zca_cache_dir`. Created
+        on first store.
+    max_bytes
+        Total size the directory is trimmed to after every store.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path | None = None,
+        *,
+        max_bytes: int = DEFAULT_ZCA_CACHE_MAX_BYTES,
+    ) -> None:
+        if max_bytes < 0:
+            msg = f"max_bytes must be non-negative, got {max_bytes}"
+            raise ValueError(msg)
+        self.directory = (
+            default_zca_cache_dir() if directory is None else Path(directory)
+        )
+        self.max_bytes = int(max_bytes)
+
+    def path_for(self, key: str) -> Path:
+        """Return the ``.npz`` path used for ``key``."""
+        return self.directory / f"zca-{key}.npz"
+
+    def entries(self) -> list[Path]:
+        """Cached fit files, least recently used first."""
+        if not self.directory.is_dir():
+            return []
+        paths = []
+        for path in self.directory.glob("zca-*.npz"):
+            if path.name.endswith(".partial.npz"):
+                continue
+            try:
+                paths.append((path.stat().st_mtime_ns, path))
+            except FileNotFoundError:
+                continue
+        return [path for _, path in sorted(paths)]
+
+    def total_bytes(self) -> int:
+        """Combined size of the cached fit files."""
+        total = 0
+        for path in self.entries():
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                continue
+        return total
+
+    def load(self, key: str) -> ZcaFit | None:
+        """Return the cached fit for ``key``, or ``None`` on a miss.
+
+        Unreadable files are removed (when possible) and treated as misses.
+        """
+        path = self.path_for(key)
+        try:
+            fit = load_zca_fit_npz(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return fit
+
+    def store(self, key: str, fit: ZcaFit) -> Path:
+        """Write ``fit`` under ``key`` atomically, then evict to ``max_bytes``."""
+        path = self.path_for(key)
+        partial = path.with_name(f"{path.stem}.{os.getpid()}.partial.npz")
+        try:
+            save_zca_fit_npz(partial, fit)
+            os.replace(partial, path)
+        except OSError:
+            try:
+                partial.unlink(missing_ok=True)
+            except OSError:
+                pass
+            raise
+        self.evict(keep=path)
+        return path
+
+    def evict(self, *, keep: Path | None = None) -> list[Path]:
+        """Delete least recently used fits until the cache fits ``max_bytes``.
+
+        ``keep`` (typically the fit just stored) is never evicted.
+        """
+        sized = []
+        for path in self.entries():
+            try:
+                sized.append((path, path.stat().st_size))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size in sized)
+        removed: list[Path] = []
+        for path, size in sized:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            removed.append(path)
+            total -= size
+        return removed
+
+    def get_or_fit(
+        self,
+        key: str,
+        fit_fn: Callable[[], ZcaFit],
+    ) -> tuple[ZcaFit, bool]:
+        """Return ``(fit, cache_hit)``, calling and storing ``fit_fn()`` on a miss.
+
+        A fit that cannot be written (e.g. a read-only or full cache
+        directory) is returned anyway, with a warning.
+        """
+        cached = self.load(key)
+        if cached is not None:
+            return cached, True
+        fit = fit_fn()
+        try:
+            self.store(key, fit)
+        except OSError as error:
+            warnings.warn(f"Could not write ZCA fit cache {self.directory}: {error}", stacklevel=2)
+        return fit, False
+
+    def get_or_fit_recording(
+        self,
+        recording_path: str | Path,
+        params: Mapping[str, object],
+        fit_fn: Callable[[], ZcaFit],
+    ) -> tuple[ZcaFit, bool]:
+        """:meth:`get_or_fit` keyed by :func:`recording_fingerprint` and ``params``."""
+        key = zca_fit_cache_key(recording_fingerprint(recording_path), params)
+        return self.get_or_fit(key, fit_fn)
@@ -0,0 +1,399 @@
+"""
+Run :func:`preprocessing.preprocess_intan` over many sessions from a manifest.
+
+The manifest is a JSON file with optional ``defaults`` and a list of
+``sessions``; each session needs ``input`` and ``output`` and may override
+any preprocessing option::
+
+    {
+      "defaults": {"channel_count": 32, "spatial_reference": "cmr_zca"},
+      "sessions": [
+        {"input": "/data/m1/d1/amplifier.dat", "output": "/proc/m1/d1/amplifier.dat",
+         "dead_channels": [3, 17]},
+        {"input": "/data/m1/d2/amplifier.dat", "output": "/proc/m1/d2/amplifier.dat"}
+      ]
+    }
+
+Sessions run in a process pool. A session is only started while the summed
+peak-memory estimates of running sessions stay within ``--memory-budget-gb``
+(default: physical RAM; one session always runs). When several sessions run
+at once, a session without an explicit ``n_workers`` gets an equal share of
+the CPUs (``cpu_count // max_workers`` threads) instead of one thread per
+CPU. Each output is written to a ``.partial`` file and renamed on success,
+and a ``<output>.report.json`` with timing, throughput, and the per-stage
+profile of :mod:`ephys.processing.profiling` is written last. A session
+whose report is ``ok``, whose settings hash matches, and whose output is
+newer than its input is skipped, so rerunning the same manifest after a
+crash resumes where it stopped.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field
+
+# Make both 'ephys' and the sibling 'preprocessing' script importable
+scripts_dir = str(Path(__file__).resolve().parent)
+project_root = str(Path(scripts_dir).parent)
+for path in (project_root, scripts_dir):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from ephys.processing.filtering import design_intan_sos_bandpass, sos_filtfilt_pad_samples
+from ephys.processing.precision import resolve_processing_dtype
+from ephys.processing.streaming import (
+    SUBSAMPLE_WORKING_COPIES,
+    plan_subsample_segments_for_memory_budget,
+)
+
+REPORT_SUFFIX = ".report.json"
+REPORT_VERSION = 1
+_IN_MEMORY_BYTES_PER_VALUE = {None: 4 + 3 * 8, "float64": 4 + 3 * 8, "float32": 4 + 3 * 4}
+
+
+class SessionSpec(BaseModel):
+    """One manifest entry; fields mirror :func:`preprocessing.preprocess_intan`."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    input: Path
+    output: Path
+    channel_count: int = Field(32, gt=0)
+    sampling_rate_hz: float = Field(30000.0, gt=0.0)
+    lowcut: float = 300.0
+    highcut: float = 5000.0
+    filter_type: str = "bessel"
+    order: int = Field(2, gt=0)
+    dead_channels: list[int] = Field(default_factory=list)
+    spatial_reference: str = "zca"
+    epsilon: float = 10.0
+    max_memory_mb: float | None = None
+    n_workers: int | None = None
+    dtype: str | None = None
+    cmr_probe: Path | None = None
+    zca_cache: bool = True
+    zca_cache_dir: Path | None = None
+
+    def preprocess_kwargs(self):
+        """Keyword arguments for ``preprocess_intan`` (without paths)."""
+        return self.model_dump(mode="json", exclude={"input", "output"})
+
+    def settings_hash(self):
+        """Hash of every setting that changes the output."""
+        settings = self.model_dump(
+            mode="json",
+            exclude={"n_workers", "zca_cache", "zca_cache_dir"},
+        )
+        payload = json.dumps(settings, sort_keys=True).encode()
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def report_path(self):
+        return self.output.with_name(self.output.name + REPORT_SUFFIX)
+
+    def estimate_peak_bytes(self):
+        """Rough peak resident memory of one run, used for scheduling.
+
+        Streaming runs peak either while streaming chunks (the
+        ``max_memory_mb`` budget) or while the ZCA subsample is resident
+        alongside one segment read or its fit's working copies, whichever is
+        larger.
+        """
+        n_samples = self.input.stat().st_size // (2 * self.channel_count)
+        if self.max_memory_mb is None:
+            per_value = _IN_MEMORY_BYTES_PER_VALUE.get(self.dtype, 4 + 3 * 8)
+            return n_samples * self.channel_count * per_value
+        budget_bytes = int(self.max_memory_mb * 2**20)
+        n_kept = self.channel_count - len(set(self.dead_channels))
+        sos = design_intan_sos_bandpass(
+            lowcut_hz=self.lowcut,
+            highcut_hz=self.highcut,
+            sampling_rate_hz=self.sampling_rate_hz,
+            order=self.order,
+            filter_type=self.filter_type,
+        )
+        segments = plan_subsample_segments_for_memory_budget(
+            n_samples,
+            budget_bytes,
+            self.channel_count,
+            sos_filtfilt_pad_samples(sos),
+            n_kept_channels=n_kept,
+            dtype=self.dtype,
+        )
+        itemsize = (resolve_processing_dtype(self.dtype) or np.dtype(np.float64)).itemsize
+        subsample_bytes = sum(stop - start for start, stop in segments) * n_kept * itemsize
+        subsample_peak = subsample_bytes + max(
+            budget_bytes // 2,
+            SUBSAMPLE_WORKING_COPIES * subsample_bytes,
+        )
+        return max(budget_bytes, subsample_peak)
+
+
+class Manifest(BaseModel):
+    """Batch manifest: shared ``defaults`` merged into every session."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    defaults: dict = Field(default_factory=dict)
+    sessions: list[dict]
+
+    def resolve(self, base_dir):
+        specs = []
+        for entry in self.sessions:
+            spec = SessionSpec(**{**self.defaults, **entry})
+            specs.append(
+                spec.model_copy(
+                    update={
+                        "input": (base_dir / spec.input).resolve(),
+                        "output": (base_dir / spec.output).resolve(),
+                        "cmr_probe": (
+                            None
+                            if spec.cmr_probe is None
+                            else (base_dir / spec.cmr_probe).resolve()
+                        ),
+                        "zca_cache_dir": (
+                            None
+                            if spec.zca_cache_dir is None
+                            else (base_dir / spec.zca_cache_dir).resolve()
+                        ),
+                    }
+                )
+            )
+        outputs = [spec.output for spec in specs]
+        if len(set(outputs)) != len(outputs):
+            msg = "manifest lists the same output path more than once"
+            raise ValueError(msg)
+        return specs
+
+
+def load_manifest(path):
+    """Read a manifest and return its resolved :class:`SessionSpec` list.
+
+    Relative input, output, CMR probe, and ZCA cache paths are resolved
+    against the manifest's directory.
+    """
+    manifest_path = Path(path)
+    manifest = Manifest.model_validate_json(manifest_path.read_text())
+    return manifest.resolve(manifest_path.parent)
+
+
+def is_up_to_date(spec):
+    """Return whether ``spec`` already has a matching successful report and output."""
+    try:
+        report = json.loads(spec.report_path().read_text())
+        output_mtime = spec.output.stat().st_mtime_ns
+        input_mtime = spec.input.stat().st_mtime_ns
+    except (OSError, ValueError):
+        return False
+    return (
+        report.get("status") == "ok"
+        and report.get("settings_hash") == spec.settings_hash()
+        and output_mtime >= input_mtime
+    )
+
+
+def _write_json_atomic(path, payload):
+    partial = path.with_name(path.name + ".partial")
+    partial.write_text(json.dumps(payload, indent=2))
+    os.replace(partial, path)
+
+
+def run_session(spec):
+    """Preprocess one session in a worker; always writes and returns its report."""
+    from preprocessing import preprocess_intan
+
+    spec.output.parent.mkdir(parents=True, exist_ok=True)
+    partial_output = spec.output.with_name(spec.output.name + ".partial")
+    log_path = spec.output.with_name(spec.output.name + ".log")
+    profile_path = spec.output.with_name(spec.output.name + ".profile.json")
+    n_samples = spec.input.stat().st_size // (2 * spec.channel_count)
+    report = {
+        "report_version": REPORT_VERSION,
+        "input": str(spec.input),
+        "output": str(spec.output),
+        "settings": spec.preprocess_kwargs(),
+        "settings_hash": spec.settings_hash(),
+        "pid": os.getpid(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "n_channels": spec.channel_count,
+        "n_samples": n_samples,
+        "input_bytes": spec.input.stat().st_size,
+        "estimated_peak_bytes": spec.estimate_peak_bytes(),
+        "log": str(log_path),
+    }
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        with log_path.open("w") as log, contextlib.redirect_stdout(log):
+            preprocess_intan(
+                spec.input,
+                partial_output,
+                profile_path=profile_path,
+                **spec.preprocess_kwargs(),
+            )
+        os.replace(partial_output, spec.output)
+        report["status"] = "ok"
+        report["stages"] = json.loads(profile_path.read_text())["stages"]
+    except Exception as error:
+        partial_output.unlink(missing_ok=True)
+        report["status"] = "failed"
+        report["error"] = f"{type(error).__name__}: {error}"
+        report["traceback"] = traceback.format_exc()
+    seconds = time.perf_counter() - started
+    report["wall_seconds"] = seconds
+    report["cpu_seconds"] = time.process_time() - cpu_started
+    report["realtime_factor"] = n_samples / spec.sampling_rate_hz / seconds if seconds else None
+    report["samples_per_s"] = n_samples * spec.channel_count / seconds if seconds else None
+    report["input_mib_per_s"] = report["input_bytes"] / 2**20 / seconds if seconds else None
+    _write_json_atomic(spec.report_path(), report)
+    return report
+
+
+def physical_memory_bytes():
+    """Total physical RAM in bytes, or ``None`` where ``sysconf`` cannot report it."""
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def run_batch(specs, *, max_workers=None, memory_budget_bytes=None, force=False):
+    """Schedule sessions across a process pool within a memory budget.
+
+    ``memory_budget_bytes`` defaults to :func:`physical_memory_bytes` (no
+    cap where that is unknown). Returns the reports of every session run,
+    plus ``skipped`` entries and ``failed`` entries for sessions that could
+    not be scheduled (e.g. a missing input or a budget too small for its
+    ZCA subsample). Sessions without ``n_workers`` share the CPUs evenly
+    when more than one runs at a time.
+    """
+    pending = []
+    reports = []
+    for spec in specs:
+        if not force and is_up_to_date(spec):
+            print(f"[skip] {spec.output} is up to date")
+            reports.append({"input": str(spec.input), "output": str(spec.output), "status": "skipped"})
+            continue
+        try:
+            estimate = spec.estimate_peak_bytes()
+        except (OSError, ValueError) as error:
+            report = {
+                "input": str(spec.input),
+                "output": str(spec.output),
+                "status": "failed",
+                "error": f"{type(error).__name__}: {error}",
+            }
+            print(f"[fail] {spec.input}: {report['error']}")
+            reports.append(report)
+            continue
+        pending.append((spec, estimate))
+    if not pending:
+        return reports
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(int(max_workers), len(pending)))
+    if max_workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // max_workers)
+        pending = [
+            (spec if spec.n_workers is not None else spec.model_copy(update={"n_workers": threads}), estimate)
+            for spec, estimate in pending
+        ]
+    if memory_budget_bytes is None:
+        memory_budget_bytes = physical_memory_bytes()
+    budget = float("inf") if memory_budget_bytes is None else float(memory_budget_bytes)
+
+    running = {}
+    in_use = 0
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            index = 0
+            while index < len(pending) and len(running) < max_workers:
+                spec, estimate = pending[index]
+                if running and in_use + estimate > budget:
+                    index += 1
+                    continue
+                pending.pop(index)
+                print(f"[start] {spec.input} (~{estimate / 2**30:.1f} GiB)")
+                running[executor.submit(run_session, spec)] = (spec, estimate)
+                in_use += estimate
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                spec, estimate = running.pop(future)
+                in_use -= estimate
+                try:
+                    report = future.result()
+                except Exception as error:
+                    report = {
+                        "input": str(spec.input),
+                        "output": str(spec.output),
+                        "status": "failed",
+                        "error": f"worker crashed: {type(error).__name__}: {error}",
+                    }
+                reports.append(report)
+                if report["status"] == "ok":
+                    print(
+                        f"[done] {spec.output} in {report['wall_seconds']:.1f} s "
+                        f"({report['realtime_factor']:.1f}x realtime)"
+                    )
+                else:
+                    print(f"[fail] {spec.input}: {report['error']}")
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("manifest", type=str, help="Path to the JSON session manifest")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Sessions processed concurrently (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--memory-budget-gb",
+        type=float,
+        default=None,
+        help="Cap on the summed peak-memory estimates of running sessions (default: physical RAM)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess sessions even when their outputs are up to date",
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        default=None,
+        help="Also write all session reports to this JSON file",
+    )
+    args = parser.parse_args()
+
+    specs = load_manifest(args.manifest)
+    started = time.perf_counter()
+    reports = run_batch(
+        specs,
+        max_workers=args.max_workers,
+        memory_budget_bytes=None if args.memory_budget_gb is None else args.memory_budget_gb * 2**30,
+        force=args.force,
+    )
+    counts = {status: sum(r["status"] == status for r in reports) for status in ("ok", "skipped", "failed")}
+    print(
+        f"Batch finished in {time.perf_counter() - started:.1f} s: "
+        f"{counts['ok']} processed, {counts['skipped']} skipped, {counts['failed']} failed"
+    )
+    if args.summary is not None:
+        _write_json_atomic(Path(args.summary), {"sessions": reports})
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark dense vs. local-neighborhood ZCA application as channel count grows.
+
+Synthetic noise with distance-decaying spatial correlation is generated for a
+two-column probe (20 um row pitch), a dense ZCA fit is made, and the same fit
+is localized to ``k`` nearest contacts. Apply time per second of 30 kHz data
+is reported for both operators, along with the relative whitening error of
+the local operator against the dense one.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from ephys.processing.zca import (
+    apply_zca_fit_chunked,
+    fit_zca_whitening_chunked,
+    localize_zca_fit,
+)
+
+SAMPLING_RATE_HZ = 30_000.0
+
+
+def two_column_positions(n_channels, pitch_um=20.0, column_spacing_um=32.0):
+    rows = np.arange(n_channels) // 2
+    columns = np.arange(n_channels) % 2
+    return np.column_stack([columns * column_spacing_um, rows * pitch_um])
+
+
+def correlated_noise(positions, n_samples, seed=0):
+    offsets = positions[:, np.newaxis, :] - positions[np.newaxis, :, :]
+    distances = np.sqrt(np.sum(offsets**2, axis=-1))
+    covariance = 100.0 * np.exp(-distances / 60.0) + 25.0 * np.eye(positions.shape[0])
+    rng = np.random.default_rng(seed)
+    latent = rng.standard_normal((positions.shape[0], n_samples)).astype(np.float32)
+    return (np.linalg.cholesky(covariance).astype(np.float32) @ latent).astype(np.float32)
+
+
+def best_seconds(function, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--channels",
+        type=int,
+        nargs="+",
+        default=[32, 64, 128, 256, 384],
+        help="Channel counts to benchmark (default: 32 64 128 256 384)",
+    )
+    parser.add_argument("--neighbors", type=int, default=16, help="Local neighborhood size k")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Seconds of data to whiten")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats (best is kept)")
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "float64"],
+        default="float32",
+        help="Working precision (default: float32)",
+    )
+    args = parser.parse_args()
+
+    n_samples = int(args.seconds * SAMPLING_RATE_HZ)
+    print(
+        f"{'channels':>8} {'dense s':>9} {'local s':>9} {'speedup':>8} "
+        f"{'nnz/row':>8} {'rel err':>9}"
+    )
+    for n_channels in args.channels:
+        positions = two_column_positions(n_channels)
+        voltage = correlated_noise(positions, n_samples)
+        fit = fit_zca_whitening_chunked(voltage, epsilon=1.0, dtype=args.dtype)
+        local = localize_zca_fit(fit, positions, n_neighbors=min(args.neighbors, n_channels))
+        dense_out = np.empty_like(voltage)
+        local_out = np.empty_like(voltage)
+
+        dense_s = best_seconds(
+            lambda: apply_zca_fit_chunked(voltage, fit, out=dense_out, dtype=args.dtype),
+            args.repeats,
+        )
+        local_s = best_seconds(
+            lambda: apply_zca_fit_chunked(voltage, local, out=local_out, dtype=args.dtype),
+            args.repeats,
+        )
+        relative_error = np.linalg.norm(local_out - dense_out) / np.linalg.norm(dense_out)
+        nnz_per_row = local.whitening_operator.nnz / n_channels
+        print(
+            f"{n_channels:>8d} {dense_s:>9.4f} {local_s:>9.4f} {dense_s / local_s:>8.2f} "
+            f"{nnz_per_row:>8.1f} {relative_error:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,5 @@
-import numpy as np
 import argparse
 from pathlib import Path
-from scipy.signal import butter, sosfiltfilt
 import sys
 
 # Add project root to path so we can import 'ephys'
@@ -10,10 +8,26 @@ if project_root not in sys.path:
     sys.path.append(project_root)
 
 from ephys.data_wrangling import intan
-from ephys.processing.zca import apply_zca_whitening
+from ephys.processing.filtering import design_intan_sos_bandpass, sos_filtfilt_pad_samples
+from ephys.processing.profiling import StageProfiler, profile_stage
+from ephys.processing.si_recording import (
+    IntanPreprocessedRecording,
+    write_intan_int16_recording,
+)
+from ephys.processing.spatial_diagnostics import (
+    compute_spatial_diagnostics,
+    format_spatial_diagnostics_line,
+    plan_spatial_subsample_indices,
+)
+from ephys.processing.streaming import (
+    plan_subsample_segments,
+    read_preprocessed_segments,
+    segment_sample_ticks,
+)
+from ephys.processing.zca import fit_zca_whitening
+from ephys.processing.zca_cache import ZcaFitCache
 from ephys.probes import get_probe
 
-import spikeinterface.extractors as se
 from spikeinterface.preprocessing import correct_motion
 from spikeinterface.sortingcomponents.motion import interpolate_motion
 
@@ -31,57 +45,151 @@ def preprocess_motion_zca(
     spatial_interpolation_method="kriging",
     probe_type="poly2",
     dead_channels=None,
+    zca_cache=True,
+    zca_cache_dir=None,
+    n_jobs=1,
+    chunk_duration="1s",
+    profile_path=None,
 ):
     """
     Advanced preprocessing pipeline incorporating motion correction and ZCA whitening.
     Branch 1: Estimates motion using a CMR filter.
     Branch 2: Applies ZCA spatial whitening to raw bandpassed data, then interpolates motion.
+    Both branches are lazy SpikeInterface recordings that bandpass and reference
+    the memory-mapped input per chunk, so the recording is never loaded whole.
+    ZCA is fit on a spread subsample and reused from the fit cache
+    (``zca_cache_dir``) when the same recording was already whitened with the
+    same parameters. Spatial diagnostics of the whitened subsample, skipping
+    the fit's artifact intervals, are logged after the fit. The output is
+    written chunkwise with ``n_jobs`` workers.
+    When ``profile_path`` is set, the ZCA fit, motion estimation, and
+    interpolate/write stages are timed and written there as a JSON report.
+    Bandpass and CMR/ZCA run lazily inside the last two stages.
     """
     if dead_channels is None:
         dead_channels = []
 
     good_channels = [ch for ch in range(channel_count) if ch not in dead_channels]
+    profiler = StageProfiler() if profile_path is not None else None
+    sos = design_intan_sos_bandpass(
+        lowcut_hz=lowcut,
+        highcut_hz=highcut,
+        sampling_rate_hz=sampling_rate_hz,
+        order=3,
+        filter_type="butterworth",
+    )
+    pad_samples = sos_filtfilt_pad_samples(sos)
 
-    print(f"Loading data from {input_filepath}...")
-    voltage_uV = intan.load_voltage(str(input_filepath), channel_count)
-    voltage_uV = np.swapaxes(voltage_uV, 0, 1)
-
-    print(f"Applying SOS bandpass filter ({lowcut}-{highcut} Hz)...")
-    nyq = 0.5 * sampling_rate_hz
-    sos = butter(3, [lowcut / nyq, highcut / nyq], btype="band", output="sos")
-    voltage_uV_filtered = sosfiltfilt(sos, voltage_uV, axis=1)
+    print(f"Mapping data from {input_filepath}...")
+    reader = intan.IntanAmplifierReader(input_filepath, channel_count)
+    probe = get_probe(probe_type)
 
-    print("Applying CMR filter for motion estimation branch (excluding dead channels)...")
-    cmr_median = np.median(voltage_uV_filtered[good_channels, :], axis=0)
-    voltage_uV_cmr = voltage_uV_filtered - cmr_median
+    def lazy_recording(**spatial_reference):
+        recording = IntanPreprocessedRecording(
+            input_filepath,
+            channel_count,
+            sampling_rate_hz,
+            sos=sos,
+            good_channels=good_channels,
+            pad_samples=pad_samples,
+            **spatial_reference,
+        )
+        recording.set_probe(probe)
+        return recording
 
-    print(f"Setting up SpikeInterface recording for motion estimation (Probe: {probe_type})...")
-    recording_cmr = se.NumpyRecording(
-        traces_list=voltage_uV_cmr.transpose(), sampling_frequency=sampling_rate_hz
+    print(
+        f"Setting up lazy bandpass ({lowcut}-{highcut} Hz) + CMR recording for motion "
+        f"estimation (Probe: {probe_type}, excluding dead channels)..."
     )
-    probe = get_probe(probe_type)
-    recording_cmr = recording_cmr.set_probe(probe)
+    recording_cmr = lazy_recording(common_median_reference=True, cmr_dead_channels=True)
 
     print(f"Estimating motion vectors using preset '{motion_preset}'...")
-    _, motion, _ = correct_motion(
-        recording=recording_cmr, preset=motion_preset, output_motion=True, output_motion_info=True
-    )
+    with profile_stage(profiler, "motion_estimation", reader.n_samples * channel_count * 2):
+        _, motion, _ = correct_motion(
+            recording=recording_cmr,
+            preset=motion_preset,
+            output_motion=True,
+            output_motion_info=True,
+        )
 
-    print("Applying robust ZCA whitening to bandpass filtered data (excluding dead channels)...")
-    voltage_uV_zca = voltage_uV_filtered.copy()
-    voltage_uV_zca[good_channels, :] = apply_zca_whitening(
-        voltage_uV_filtered[good_channels, :],
-        epsilon=epsilon,
-        rescale_amplitude=True,
-        robust_cov=True,
-        sampling_rate_hz=sampling_rate_hz,
-    )
+    print("Fitting robust ZCA whitening on a bandpassed subsample (excluding dead channels)...")
+    segments = plan_subsample_segments(reader.n_samples)
+    subsample_ticks = segment_sample_ticks(segments)
 
-    print("Setting up SpikeInterface recording for interpolation...")
-    recording_zca = se.NumpyRecording(
-        traces_list=voltage_uV_zca.transpose(), sampling_frequency=sampling_rate_hz
-    )
-    recording_zca = recording_zca.set_probe(probe)
+    def fit_zca():
+        subsample = read_preprocessed_segments(
+            reader,
+            segments,
+            sos=sos,
+            pad_samples=pad_samples,
+            good_channels=good_channels,
+            keep_channels=good_channels,
+            dtype="float32",
+        )
+        return fit_zca_whitening(
+            subsample,
+            epsilon=epsilon,
+            robust_cov=True,
+            good_channels=good_channels,
+            sampling_rate_hz=sampling_rate_hz,
+            lowcut_hz=lowcut,
+            highcut_hz=highcut,
+            filter_order=3,
+            dtype="float32",
+            sample_ticks=subsample_ticks,
+            n_recording_samples=reader.n_samples,
+        )
+
+    with profile_stage(profiler, "zca_fit"):
+        if zca_cache:
+            zca_fit, cache_hit = ZcaFitCache(zca_cache_dir).get_or_fit_recording(
+                input_filepath,
+                {
+                    "spatial_reference": "zca",
+                    "cmr_channel_groups": None,
+                    "channel_count": channel_count,
+                    "dead_channels": sorted(dead_channels),
+                    "epsilon": epsilon,
+                    "robust_cov": True,
+                    "sampling_rate_hz": sampling_rate_hz,
+                    "lowcut_hz": lowcut,
+                    "highcut_hz": highcut,
+                    "filter_type": "butterworth",
+                    "filter_order": 3,
+                    "dtype": "float32",
+                    "fit_source": "subsample",
+                },
+                fit_zca,
+            )
+            if cache_hit:
+                print("Reusing cached ZCA fit...")
+        else:
+            zca_fit = fit_zca()
+
+    with profile_stage(profiler, "diagnostics"):
+        whitened = read_preprocessed_segments(
+            reader,
+            segments,
+            sos=sos,
+            pad_samples=pad_samples,
+            good_channels=good_channels,
+            zca_fit=zca_fit,
+            keep_channels=good_channels,
+            dtype="float32",
+        )
+        diagnostics = compute_spatial_diagnostics(
+            whitened,
+            list(range(len(good_channels))),
+            plan_spatial_subsample_indices(whitened.shape[1]),
+            artifact_intervals=zca_fit.artifact_intervals,
+            sample_ticks=subsample_ticks,
+        )
+        del whitened
+    print("Spatial diagnostics (subsampled; good channels only):")
+    print(format_spatial_diagnostics_line("after ZCA", diagnostics))
+
+    print("Setting up lazy ZCA recording for interpolation...")
+    recording_zca = lazy_recording(zca_fit=zca_fit)
 
     print(f"Applying motion correction (interpolation) using {spatial_interpolation_method}...")
     recording_motion_corrected = interpolate_motion(
@@ -91,15 +199,20 @@ def preprocess_motion_zca(
         spatial_interpolation_method=spatial_interpolation_method,
     )
 
-    voltage_uV_final = recording_motion_corrected.get_traces().transpose()
-
-    print("Converting to 16-bit Intan integers and saving...")
-    INTAN_BIT_TO_uV = 0.195
-    v_new_int16 = np.round(voltage_uV_final / INTAN_BIT_TO_uV).astype(np.int16)
-    v_new_int16 = np.swapaxes(v_new_int16, 0, 1)
-
-    v_new_int16.tofile(str(output_filepath))
+    print(f"Converting to 16-bit Intan integers and saving ({n_jobs} job(s))...")
+    with profile_stage(profiler, "interpolate_write", reader.n_samples * channel_count * 2):
+        write_intan_int16_recording(
+            recording_motion_corrected,
+            output_filepath,
+            bit_to_uV=reader.bit_to_uV,
+            n_jobs=n_jobs,
+            chunk_duration=chunk_duration,
+        )
     print(f"Preprocessing complete! Saved to {output_filepath}")
+    if profiler is not None:
+        print("Stage profile:")
+        print(profiler.format_table())
+        print(f"Wrote stage profile to {profiler.write_json(profile_path)}")
 
 
 if __name__ == "__main__":
@@ -143,6 +256,35 @@ if __name__ == "__main__":
         default=None,
         help="List of channel indices to exclude",
     )
+    parser.add_argument(
+        "--no-zca-cache",
+        action="store_true",
+        help="Always refit ZCA instead of reusing a cached fit for this recording",
+    )
+    parser.add_argument(
+        "--zca-cache-dir",
+        type=str,
+        default=None,
+        help="ZCA fit cache directory (default: $EPHYS_ZCA_CACHE_DIR or ~/.cache/ephys/zca)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Write a per-stage timing/throughput/peak-RSS JSON report to this path",
+    )
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=1,
+        help="Parallel jobs for the chunked output writer (default: 1)",
+    )
+    parser.add_argument(
+        "--chunk-duration",
+        type=str,
+        default="1s",
+        help="Chunk duration processed per writer job (default: 1s)",
+    )
 
     args = parser.parse_args()
 
@@ -159,4 +301,9 @@ if __name__ == "__main__":
         spatial_interpolation_method=args.spatial_interpolation_method,
         probe_type=args.probe_type,
         dead_channels=args.dead_channels,
+        zca_cache=not args.no_zca_cache,
+        zca_cache_dir=args.zca_cache_dir,
+        n_jobs=args.n_jobs,
+        chunk_duration=args.chunk_duration,
+        profile_path=args.profile,
     )
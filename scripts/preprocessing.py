@@ -1,37 +1,41 @@
+from pathlib import Path
+
 import numpy as np
+import probeinterface
+from probeinterface import Probe
 
+from ephys import probes
 from ephys.data_wrangling import intan
 
-from ephys.processing.filtering import design_intan_sos_bandpass, sos_bandpass_filter
+from ephys.processing.filtering import (
+    design_intan_sos_bandpass,
+    parallel_sos_bandpass_filter,
+    sos_filtfilt_pad_samples,
+)
+from ephys.processing.profiling import StageProfiler, profile_stage
+from ephys.processing.referencing import apply_common_median_reference
 
 from ephys.processing.spatial_diagnostics import (
     compute_spatial_diagnostics,
     format_spatial_diagnostics_line,
     plan_spatial_subsample_indices,
 )
-from ephys.processing.zca import apply_zca_whitening
-
-INTAN_BIT_TO_uV = 0.195
-
-
-def apply_common_median_reference(voltage_uV, good_channels):
-    """Subtract the across-channel median computed from good channels.
-
-    Parameters
-    ----------
-    voltage_uV
-        Voltage array with shape ``(n_channels, n_samples)``. Modified in place.
-    good_channels
-        Channel indices used to estimate the common median reference.
+from ephys.processing.streaming import (
+    chunk_samples_for_memory_budget,
+    plan_subsample_segments_for_memory_budget,
+    read_preprocessed_segments,
+    segment_sample_ticks,
+    stream_preprocess_intan,
+)
+from ephys.processing.zca import (
+    apply_zca_fit,
+    apply_zca_fit_chunked,
+    detect_zca_artifact_intervals,
+    fit_zca_whitening,
+)
+from ephys.processing.zca_cache import ZcaFitCache
 
-    Returns
-    -------
-    numpy.ndarray
-        The same array as ``voltage_uV``.
-    """
-    reference = np.median(voltage_uV[good_channels, :], axis=0, keepdims=True)
-    voltage_uV[good_channels, :] -= reference
-    return voltage_uV
+INTAN_BIT_TO_uV = intan.INTAN_BIT_TO_uV
 
 
 def preprocess_intan(
@@ -46,6 +50,13 @@ def preprocess_intan(
     dead_channels=None,
     spatial_reference="zca",
     epsilon=10.0,
+    max_memory_mb=None,
+    n_workers=None,
+    dtype=None,
+    cmr_probe=None,
+    zca_cache=True,
+    zca_cache_dir=None,
+    profile_path=None,
 ):
     """
 
@@ -57,6 +68,9 @@ def preprocess_intan(
 
     3. Applies spatial reference on good channels (ZCA, CMR, or CMR then ZCA).
 
+       Spatial diagnostics are logged after each stage; every line skips the
+       same artifact intervals, detected once after bandpassing.
+
     4. Saves the results as Intan-compatible 16-bit integers to a new binary file.
 
     Args:
@@ -83,6 +97,38 @@ def preprocess_intan(
 
         epsilon (float): Regularization parameter for ZCA whitening
 
+        max_memory_mb (float or None): When set, stream the recording in
+            overlapping time chunks whose working buffers fit in this many MiB
+            instead of loading it whole. ZCA is then fit once on a spread
+            subsample of the good channels, shortened to fit the same budget,
+            and output matches the in-memory path to within one int16 count
+            for the same ZCA fit.
+
+        n_workers (int or None): Threads used to bandpass channels and to
+            compute the common median reference in parallel on the in-memory
+            path (default: one per CPU)
+
+        dtype (str or None): Working precision, ``"float32"`` or ``"float64"``.
+            ``None`` (default) filters and whitens in float64; ``"float32"``
+            halves working memory at an error far below one int16 count.
+
+        cmr_probe (str/Path, probeinterface.Probe, or None): Multi-shank
+            probe, or a probeinterface JSON file holding one, whose shanks are
+            referenced separately by CMR. It must wire exactly
+            ``channel_count`` channels. ``None`` (default) uses one median
+            across all good channels.
+
+        zca_cache (bool): Reuse a ZCA fit cached for the same recording and
+            fit parameters, and cache new fits (default: ``True``)
+
+        zca_cache_dir (str/Path or None): Cache directory (default:
+            ``$EPHYS_ZCA_CACHE_DIR`` or ``~/.cache/ephys/zca``)
+
+        profile_path (str/Path or None): When set, time every stage (load,
+            bandpass, diagnostics, CMR, ZCA fit/apply, quantize/write) with
+            bytes processed and peak RSS, print a summary table, and write the
+            report to this JSON file.
+
     """
 
     if dead_channels is None:
@@ -95,14 +141,26 @@ def preprocess_intan(
         )
         raise ValueError(msg)
 
-    print(f"Loading data from {input_filepath}...")
-    voltage_uV = intan.load_voltage(str(input_filepath), channel_count)
-    voltage_uV = np.swapaxes(voltage_uV, 0, 1)
-
-    print(
-        f"Applying {order}th order {filter_type.capitalize()} SOS bandpass filter "
-        f"({lowcut}-{highcut} Hz)..."
-    )
+    cmr_channel_groups = None
+    if cmr_probe is not None:
+        cmr_channel_groups = _cmr_channel_groups(cmr_probe, channel_count)
+
+    cache = ZcaFitCache(zca_cache_dir) if zca_cache else None
+    zca_cache_params = {
+        "spatial_reference": spatial_reference,
+        "cmr_channel_groups": cmr_channel_groups,
+        "channel_count": channel_count,
+        "dead_channels": sorted(dead_channels),
+        "epsilon": epsilon,
+        "robust_cov": True,
+        "sampling_rate_hz": sampling_rate_hz,
+        "lowcut_hz": lowcut,
+        "highcut_hz": highcut,
+        "filter_type": filter_type,
+        "filter_order": order,
+        "dtype": dtype,
+        "fit_source": "full" if max_memory_mb is None else "subsample",
+    }
 
     sos = design_intan_sos_bandpass(
         lowcut_hz=lowcut,
@@ -111,18 +169,75 @@ def preprocess_intan(
         order=order,
         filter_type=filter_type,
     )
+    profiler = StageProfiler() if profile_path is not None else None
+
+    if max_memory_mb is not None:
+        _preprocess_intan_streaming(
+            input_filepath,
+            output_filepath,
+            sos,
+            channel_count=channel_count,
+            sampling_rate_hz=sampling_rate_hz,
+            lowcut=lowcut,
+            highcut=highcut,
+            order=order,
+            dead_channels=dead_channels,
+            spatial_reference=spatial_reference,
+            epsilon=epsilon,
+            max_memory_mb=max_memory_mb,
+            dtype=dtype,
+            cmr_channel_groups=cmr_channel_groups,
+            cache=cache,
+            zca_cache_params=zca_cache_params,
+            profiler=profiler,
+        )
+        _report_profile(profiler, profile_path)
+        return
+
+    print(f"Loading data from {input_filepath}...")
+    with profile_stage(profiler, "load", Path(input_filepath).stat().st_size):
+        voltage_uV = intan.load_voltage(str(input_filepath), channel_count)
+        voltage_uV = np.swapaxes(voltage_uV, 0, 1)
+
+    print(
+        f"Applying {order}th order {filter_type.capitalize()} SOS bandpass filter "
+        f"({lowcut}-{highcut} Hz)..."
+    )
 
-    voltage_uV = sos_bandpass_filter(voltage_uV, sos, axis=1)
+    with profile_stage(profiler, "bandpass", voltage_uV.nbytes):
+        voltage_uV, filter_stages = parallel_sos_bandpass_filter(
+            voltage_uV,
+            sos,
+            axis=1,
+            n_workers=n_workers,
+            return_throughput=True,
+            dtype=dtype,
+        )
+    filter_total = filter_stages[-1]
+    print(
+        f"Bandpass filtered {filter_total.n_values} channel-samples in "
+        f"{filter_total.seconds:.2f} s ({filter_total.samples_per_s:.3g} samples/s)"
+    )
 
     good_channels = [ch for ch in range(channel_count) if ch not in dead_channels]
     diagnostic_indices = plan_spatial_subsample_indices(voltage_uV.shape[1])
 
-    def log_spatial_diagnostics(label: str) -> None:
-        diagnostics = compute_spatial_diagnostics(
+    # Every stage skips the same samples, so the lines compare like with like.
+    with profile_stage(profiler, "diagnostics"):
+        artifact_intervals = detect_zca_artifact_intervals(
             voltage_uV,
-            good_channels,
-            diagnostic_indices,
+            channels=good_channels,
+            sampling_rate_hz=sampling_rate_hz,
         )
+
+    def log_spatial_diagnostics(label: str) -> None:
+        with profile_stage(profiler, "diagnostics"):
+            diagnostics = compute_spatial_diagnostics(
+                voltage_uV,
+                good_channels,
+                diagnostic_indices,
+                artifact_intervals=artifact_intervals,
+            )
         print(format_spatial_diagnostics_line(label, diagnostics))
 
     print("Spatial diagnostics (subsampled; good channels only):")
@@ -133,30 +248,237 @@ def preprocess_intan(
             "Applying common median reference (CMR) on good channels "
             f"(excluding dead channels: {dead_channels or 'none'})..."
         )
-        apply_common_median_reference(voltage_uV, good_channels)
+        with profile_stage(profiler, "cmr", voltage_uV.nbytes):
+            apply_common_median_reference(
+                voltage_uV,
+                good_channels,
+                channel_groups=cmr_channel_groups,
+                n_workers=n_workers,
+            )
         log_spatial_diagnostics("after CMR")
 
     if spatial_reference in ("zca", "cmr_zca"):
         step = "robust ZCA after CMR" if spatial_reference == "cmr_zca" else "robust ZCA"
         print(f"Computing and applying {step} (excluding dead channels)...")
-        voltage_uV[good_channels, :] = apply_zca_whitening(
-            voltage_uV[good_channels, :],
-            epsilon=epsilon,
-            rescale_amplitude=True,
-            robust_cov=True,
-            sampling_rate_hz=sampling_rate_hz,
-        )
+        with profile_stage(profiler, "zca_fit", voltage_uV.nbytes):
+            zca_fit = _fit_zca_cached(
+                cache,
+                input_filepath,
+                zca_cache_params,
+                lambda: fit_zca_whitening(
+                    voltage_uV[good_channels, :],
+                    epsilon=epsilon,
+                    robust_cov=True,
+                    good_channels=good_channels,
+                    sampling_rate_hz=sampling_rate_hz,
+                    lowcut_hz=lowcut,
+                    highcut_hz=highcut,
+                    filter_order=order,
+                    dtype=dtype,
+                ),
+            )
+        with profile_stage(profiler, "zca_apply", voltage_uV.nbytes):
+            voltage_uV[good_channels, :] = apply_zca_fit(
+                voltage_uV[good_channels, :],
+                zca_fit,
+                rescale_amplitude=True,
+                dtype=dtype,
+            )
         log_spatial_diagnostics("after ZCA")
 
     print("Converting to 16-bit Intan integers and saving...")
 
-    voltage_int16 = np.round(voltage_uV / INTAN_BIT_TO_uV).astype(np.int16)
-    voltage_int16 = np.swapaxes(voltage_int16, 0, 1)
-    voltage_int16.tofile(str(output_filepath))
+    with profile_stage(profiler, "quantize_write", voltage_uV.size * 2):
+        voltage_int16 = np.round(voltage_uV / INTAN_BIT_TO_uV).astype(np.int16)
+        voltage_int16 = np.swapaxes(voltage_int16, 0, 1)
+        voltage_int16.tofile(str(output_filepath))
+
+    print(f"Preprocessing complete! Saved to {output_filepath}")
+    _report_profile(profiler, profile_path)
+
+
+def _preprocess_intan_streaming(
+    input_filepath,
+    output_filepath,
+    sos,
+    *,
+    channel_count,
+    sampling_rate_hz,
+    lowcut,
+    highcut,
+    order,
+    dead_channels,
+    spatial_reference,
+    epsilon,
+    max_memory_mb,
+    dtype,
+    cmr_channel_groups,
+    cache,
+    zca_cache_params,
+    profiler=None,
+):
+    """Chunked variant of :func:`preprocess_intan` with bounded working memory."""
+    reader = intan.IntanAmplifierReader(input_filepath, channel_count)
+    pad_samples = sos_filtfilt_pad_samples(sos)
+    chunk_samples = chunk_samples_for_memory_budget(
+        int(max_memory_mb * 2**20),
+        channel_count,
+        pad_samples,
+    )
+    good_channels = [ch for ch in range(channel_count) if ch not in dead_channels]
+    use_cmr = spatial_reference in ("cmr", "cmr_zca")
+    print(
+        f"Streaming {reader.n_samples} samples from {input_filepath} in chunks of "
+        f"{chunk_samples} samples (+{pad_samples} overlap, budget {max_memory_mb} MiB)..."
+    )
+
+    print("Preprocessing subsample for spatial diagnostics and ZCA fit...")
+    segments = plan_subsample_segments_for_memory_budget(
+        reader.n_samples,
+        int(max_memory_mb * 2**20),
+        channel_count,
+        pad_samples,
+        n_kept_channels=len(good_channels),
+        dtype=dtype,
+    )
+    with profile_stage(profiler, "subsample"):
+        # Rows are the good channels only, so the fit and whitening below
+        # work on the subsample itself rather than fancy-indexed copies.
+        subsample = read_preprocessed_segments(
+            reader,
+            segments,
+            sos=sos,
+            pad_samples=pad_samples,
+            keep_channels=good_channels,
+            dtype=dtype,
+        )
+    subsample_ticks = segment_sample_ticks(segments)
+    good_rows = np.arange(len(good_channels))
+    diagnostic_indices = plan_spatial_subsample_indices(subsample.shape[1])
+
+    with profile_stage(profiler, "diagnostics"):
+        artifact_intervals = detect_zca_artifact_intervals(
+            subsample,
+            sampling_rate_hz=sampling_rate_hz,
+            sample_ticks=subsample_ticks,
+            n_recording_samples=reader.n_samples,
+        )
+
+    def log_spatial_diagnostics(label: str) -> None:
+        with profile_stage(profiler, "diagnostics"):
+            diagnostics = compute_spatial_diagnostics(
+                subsample,
+                good_rows,
+                diagnostic_indices,
+                artifact_intervals=artifact_intervals,
+                sample_ticks=subsample_ticks,
+            )
+        print(format_spatial_diagnostics_line(label, diagnostics))
 
+    print("Spatial diagnostics (subsampled; good channels only):")
+    log_spatial_diagnostics("after bandpass")
+    if use_cmr:
+        apply_common_median_reference(
+            subsample,
+            good_rows,
+            channel_groups=(
+                None if cmr_channel_groups is None else cmr_channel_groups[good_channels]
+            ),
+        )
+        log_spatial_diagnostics("after CMR")
+
+    zca_fit = None
+    if spatial_reference in ("zca", "cmr_zca"):
+        print(f"Fitting robust ZCA on a {subsample.shape[1]}-sample subsample...")
+        with profile_stage(profiler, "zca_fit", subsample.nbytes):
+            zca_fit = _fit_zca_cached(
+                cache,
+                input_filepath,
+                zca_cache_params,
+                lambda: fit_zca_whitening(
+                    subsample,
+                    epsilon=epsilon,
+                    robust_cov=True,
+                    good_channels=good_channels,
+                    sampling_rate_hz=sampling_rate_hz,
+                    lowcut_hz=lowcut,
+                    highcut_hz=highcut,
+                    filter_order=order,
+                    dtype=dtype,
+                    sample_ticks=subsample_ticks,
+                    n_recording_samples=reader.n_samples,
+                ),
+            )
+        apply_zca_fit_chunked(
+            subsample,
+            zca_fit,
+            out=subsample,
+            chunk_samples=segments[0][1] - segments[0][0],
+            dtype=dtype,
+        )
+        log_spatial_diagnostics("after ZCA")
+    # Release the subsample before streaming; the closures above still name it.
+    subsample = None
+
+    print("Filtering, referencing, and writing chunks...")
+    stream_preprocess_intan(
+        reader,
+        output_filepath,
+        sos=sos,
+        chunk_samples=chunk_samples,
+        pad_samples=pad_samples,
+        good_channels=good_channels,
+        common_median_reference=use_cmr,
+        cmr_channel_groups=cmr_channel_groups,
+        zca_fit=zca_fit,
+        dtype=dtype,
+        profiler=profiler,
+    )
     print(f"Preprocessing complete! Saved to {output_filepath}")
 
 
+def _cmr_channel_groups(cmr_probe, channel_count):
+    """Shank label per recording channel of a multi-shank probe, for grouped CMR."""
+    if isinstance(cmr_probe, Probe):
+        probe = cmr_probe
+    else:
+        probe_group = probeinterface.read_probeinterface(cmr_probe)
+        if len(probe_group.probes) != 1:
+            msg = f"cmr_probe file must hold exactly one probe, got {len(probe_group.probes)}"
+            raise ValueError(msg)
+        probe = probe_group.probes[0]
+    if probe.shank_ids is None or np.unique(probe.shank_ids).size < 2:
+        msg = "cmr_probe has a single shank; per-shank CMR needs a probe with shank ids"
+        raise ValueError(msg)
+    channel_groups = probes.get_channel_groups(probe)
+    if channel_groups.size != channel_count:
+        msg = (
+            f"cmr_probe wires {channel_groups.size} channels but the recording has "
+            f"{channel_count}"
+        )
+        raise ValueError(msg)
+    return channel_groups
+
+
+def _report_profile(profiler, profile_path):
+    """Print the stage table and write the JSON profile when profiling is on."""
+    if profiler is None:
+        return
+    print("Stage profile:")
+    print(profiler.format_table())
+    print(f"Wrote stage profile to {profiler.write_json(profile_path)}")
+
+
+def _fit_zca_cached(cache, input_filepath, params, fit_fn):
+    """Return a cached ZCA fit for this recording and ``params``, fitting on a miss."""
+    if cache is None:
+        return fit_fn()
+    zca_fit, cache_hit = cache.get_or_fit_recording(input_filepath, params, fit_fn)
+    if cache_hit:
+        print(f"Reusing cached ZCA fit from {cache.directory}")
+    return zca_fit
+
+
 def preprocess_intan_to_zca(*args, **kwargs):
     """Backward-compatible alias for :func:`preprocess_intan`."""
     return preprocess_intan(*args, **kwargs)
@@ -220,6 +542,54 @@ if __name__ == "__main__":
         default=10.0,
         help="ZCA regularization parameter (used with zca and cmr_zca)",
     )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=None,
+        help=(
+            "Stream the recording in overlapping chunks whose working buffers fit "
+            "in this many MiB, and size the ZCA/diagnostics subsample to the same "
+            "budget (default: load the whole recording)"
+        ),
+    )
+    parser.add_argument(
+        "--n-workers",
+        type=int,
+        default=None,
+        help="Threads for parallel bandpass filtering and CMR (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "float64"],
+        default=None,
+        help="Working precision for filtering and ZCA (default: float64)",
+    )
+    parser.add_argument(
+        "--cmr-probe",
+        type=str,
+        default=None,
+        help=(
+            "probeinterface JSON of a multi-shank probe; CMR references each shank "
+            "separately (default: one group)"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Write a per-stage timing/throughput/peak-RSS JSON report to this path",
+    )
+    parser.add_argument(
+        "--no-zca-cache",
+        action="store_true",
+        help="Always refit ZCA instead of reusing a cached fit for this recording",
+    )
+    parser.add_argument(
+        "--zca-cache-dir",
+        type=str,
+        default=None,
+        help="ZCA fit cache directory (default: $EPHYS_ZCA_CACHE_DIR or ~/.cache/ephys/zca)",
+    )
 
     args = parser.parse_args()
 
@@ -235,4 +605,11 @@ if __name__ == "__main__":
         dead_channels=args.dead_channels,
         spatial_reference=args.spatial_reference,
         epsilon=args.epsilon,
+        max_memory_mb=args.max_memory_mb,
+        n_workers=args.n_workers,
+        dtype=args.dtype,
+        cmr_probe=args.cmr_probe,
+        zca_cache=not args.no_zca_cache,
+        zca_cache_dir=args.zca_cache_dir,
+        profile_path=args.profile,
     )
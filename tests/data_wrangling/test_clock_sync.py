@@ -0,0 +1,115 @@
+"""Tests for drift-aware pulse-train alignment between clocks."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ephys.data_wrangling.clock_sync import (
+    ClockMapping,
+    align_pulse_trains,
+    fit_clock_mapping,
+    load_clock_mapping_npz,
+    save_clock_mapping_npz,
+)
+
+SAMPLING_FREQUENCY = 30_000.0
+
+
+def _drifting_clock(seconds: np.ndarray) -> np.ndarray:
+    """Target clock with an offset, a rate error, and slow nonlinear wander."""
+    return 4.2 + seconds * (1.0 + 35e-6) + 2e-3 * np.sin(seconds / 3_000.0)
+
+
+def _irregular_pulses(n_pulses: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.uniform(0.5, 1.5, n_pulses))
+
+
+def test_align_recovers_drift_with_dropped_and_extra_pulses():
+    rng = np.random.default_rng(1)
+    true_seconds = _irregular_pulses(20_000)
+    source = np.round(true_seconds * SAMPLING_FREQUENCY)
+    target = _drifting_clock(true_seconds) + rng.normal(0.0, 50e-6, true_seconds.size)
+    target_kept = rng.random(target.size) > 0.02
+    target_rows_truth = np.cumsum(target_kept) - 1
+    extras = rng.uniform(target[0], target[-1], 200)
+    target_with_extras = np.sort(np.concatenate((target[target_kept], extras)))
+    # The target also started late and the source dropped its first pulses
+    source = source[5:]
+
+    source_rows, target_rows, mapping = align_pulse_trains(source, target_with_extras)
+
+    assert source_rows.dtype == np.int64
+    assert np.all(np.diff(source_rows) > 0)
+    assert np.all(np.diff(target_rows) > 0)
+    assert source_rows.size > 0.95 * source.size
+    expected_target = _drifting_clock(source / SAMPLING_FREQUENCY)
+    assert np.max(np.abs(mapping.transform(source) - expected_target)) < 1e-4
+    assert mapping.residual_rms < 1e-4
+    assert mapping.n_matched == source_rows.size
+
+    # Every kept match pairs the same underlying pulse
+    original_rows = source_rows + 5
+    assert np.all(target_kept[original_rows])
+    true_times = target[target_kept][target_rows_truth[original_rows]]
+    np.testing.assert_array_equal(target_with_extras[target_rows], true_times)
+
+
+def test_align_periodic_pulses_with_known_scale():
+    seconds = np.arange(5_000) * 0.01
+    source = np.round(seconds * SAMPLING_FREQUENCY)
+    target = 12.0 + seconds * (1.0 - 20e-6)
+    source = np.delete(source, [40, 41, 3_000])
+    target = np.delete(target, [7, 2_500])
+
+    source_rows, target_rows, mapping = align_pulse_trains(
+        source,
+        target,
+        scale=1.0 / SAMPLING_FREQUENCY,
+    )
+
+    assert source_rows.size == 4_995
+    expected = 12.0 + (source / SAMPLING_FREQUENCY) * (1.0 - 20e-6)
+    np.testing.assert_allclose(mapping.transform(source), expected, atol=1e-9)
+    np.testing.assert_allclose(mapping.inverse(expected), source, atol=1e-4)
+
+
+def test_clock_mapping_extrapolates_with_end_slopes():
+    mapping = ClockMapping(
+        source_knots=np.array([0.0, 10.0, 20.0]),
+        target_knots=np.array([1.0, 11.0, 31.0]),
+    )
+    np.testing.assert_allclose(
+        mapping.transform(np.array([-5.0, 5.0, 15.0, 30.0])),
+        [-4.0, 6.0, 21.0, 51.0],
+    )
+    np.testing.assert_allclose(mapping.inverse(np.array([-4.0, 51.0])), [-5.0, 30.0])
+
+
+def test_clock_mapping_npz_roundtrip(tmp_path):
+    seconds = _irregular_pulses(2_000)
+    mapping = fit_clock_mapping(seconds, _drifting_clock(seconds))
+
+    path = tmp_path / "sync" / "intan_to_camera.npz"
+    save_clock_mapping_npz(path, mapping)
+    loaded = load_clock_mapping_npz(path)
+
+    np.testing.assert_array_equal(loaded.source_knots, mapping.source_knots)
+    np.testing.assert_array_equal(loaded.target_knots, mapping.target_knots)
+    assert loaded.n_matched == mapping.n_matched
+    assert loaded.residual_rms == mapping.residual_rms
+
+
+def test_align_rejects_unrelated_pulse_trains():
+    with pytest.raises(ValueError, match="Could not anchor"):
+        align_pulse_trains(
+            _irregular_pulses(500, seed=2),
+            _irregular_pulses(500, seed=3),
+            max_anchor_lag=20,
+        )
+
+
+def test_align_requires_increasing_pulses():
+    with pytest.raises(ValueError, match="strictly increasing"):
+        align_pulse_trains(np.array([0.0, 2.0, 1.0]), np.arange(20.0))
@@ -1,4 +1,11 @@
-from ephys.data_wrangling.intan import get_camera_ttl_array
+import numpy as np
+import pytest
+
+from ephys.data_wrangling.intan import (
+    IntanAmplifierReader,
+    get_camera_ttl_array,
+    load_voltage,
+)
 
 
 def test_get_camera_ttl_array(pytestconfig):
@@ -16,3 +23,44 @@ def test_get_camera_ttl_array(pytestconfig):
     num_expected_onsets = 1352
 
     assert ttl_onsets.shape[0] == num_expected_onsets
+
+
+def _write_amplifier_dat(path, n_samples=1_000, channel_count=4, seed=0):
+    rng = np.random.default_rng(seed)
+    raw = rng.integers(-2000, 2000, size=(n_samples, channel_count), dtype=np.int16)
+    raw.tofile(path)
+    return raw
+
+
+def test_amplifier_reader_matches_load_voltage(tmp_path):
+    path = tmp_path / "amplifier.dat"
+    _write_amplifier_dat(path)
+
+    reader = IntanAmplifierReader(path, 4)
+
+    assert reader.shape == (4, 1_000)
+    assert reader.dtype == np.int16
+    expected = load_voltage(str(path), 4).T
+    np.testing.assert_array_equal(reader.read(), expected)
+    assert reader.read().dtype == np.float32
+
+
+def test_amplifier_reader_blocks_and_channel_selection(tmp_path):
+    path = tmp_path / "amplifier.dat"
+    _write_amplifier_dat(path, n_samples=1_001)
+    reader = IntanAmplifierReader(path, 4)
+
+    blocks = list(reader.iter_blocks(250, channels=[3, 1]))
+
+    assert [block.shape[1] for block in blocks] == [250, 250, 250, 250, 1]
+    np.testing.assert_array_equal(
+        np.concatenate(blocks, axis=1),
+        reader.read()[[3, 1]],
+    )
+
+
+def test_amplifier_reader_rejects_partial_samples(tmp_path):
+    path = tmp_path / "amplifier.dat"
+    np.zeros(7, dtype=np.int16).tofile(path)
+    with pytest.raises(ValueError, match="multiple"):
+        IntanAmplifierReader(path, 4)
@@ -0,0 +1,90 @@
+"""Tests for NeuroViz pickle loading and the columnar spike store."""
+
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ephys.data_wrangling import neuroviz
+from ephys.data_wrangling.neuroviz import (
+    convert_neuroviz_to_spike_store,
+    get_spikes,
+    load_neuroviz_spike_store,
+)
+
+
+def _write_neuroviz_pickle(path: Path) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    trains = [np.sort(rng.integers(0, 10**7, size=n)) for n in (50, 0, 7, 300)]
+    units = [
+        {"spike_indices__": train, "waveforms__": rng.standard_normal((train.size, 40))}
+        for train in trains
+    ]
+    with open(path, "wb") as handle:
+        pickle.dump(units, handle)
+    return trains
+
+
+def test_get_spikes_converts_once_then_reads_store(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """The second load comes from the store without unpickling."""
+    path = tmp_path / "units.pkl"
+    trains = _write_neuroviz_pickle(path)
+
+    first = get_spikes(path)
+    assert (tmp_path / "units.pkl.spikestore").is_dir()
+
+    def fail(_):
+        raise AssertionError("pickle should not be reopened")
+
+    monkeypatch.setattr(neuroviz, "open_neuroviz", fail)
+    second = get_spikes(path, units=[3, 1])
+
+    assert len(first) == len(trains)
+    for actual, expected in zip(first, trains):
+        np.testing.assert_array_equal(actual, expected)
+    np.testing.assert_array_equal(second[0], trains[3])
+    assert second[1].size == 0
+
+
+def test_get_spikes_without_store_matches_pickle(tmp_path: Path) -> None:
+    """use_store=False reads the pickle directly and writes nothing."""
+    path = tmp_path / "units.pkl"
+    trains = _write_neuroviz_pickle(path)
+    spikes = get_spikes(path, use_store=False)
+    assert not (tmp_path / "units.pkl.spikestore").exists()
+    for actual, expected in zip(spikes, trains):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_get_spikes_falls_back_when_store_cannot_be_written(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A failed store write warns and still returns the pickled spikes."""
+    path = tmp_path / "units.pkl"
+    trains = _write_neuroviz_pickle(path)
+
+    def fail(*_args, **_kwargs):
+        raise PermissionError("read-only")
+
+    monkeypatch.setattr(neuroviz, "write_spike_store", fail)
+    with pytest.warns(UserWarning, match="spike store"):
+        spikes = get_spikes(path, units=[3, 0])
+    np.testing.assert_array_equal(spikes[0], trains[3])
+    np.testing.assert_array_equal(spikes[1], trains[0])
+
+
+def test_explicit_store_path_and_unit_selection(tmp_path: Path) -> None:
+    """Converted stores can live anywhere and are opened lazily per unit."""
+    path = tmp_path / "units.pkl"
+    trains = _write_neuroviz_pickle(path)
+    store = convert_neuroviz_to_spike_store(path, tmp_path / "store")
+    (selected,) = load_neuroviz_spike_store(store, units=[2])
+    assert isinstance(selected, np.memmap)
+    np.testing.assert_array_equal(selected, trains[2])
@@ -9,6 +9,7 @@ from ephys.data_wrangling.spike_times import (
     count_spikes_in_tick_interval,
     count_spikes_in_tick_intervals,
     firing_rate_hz_from_interval_count,
+    get_spikes_at_events,
 )
 
 
@@ -55,3 +56,19 @@ def test_firing_rate_hz_from_interval_count() -> None:
     """Hz = count * fs / duration_ticks."""
     hz = firing_rate_hz_from_interval_count(15, 30000, 30000.0)
     assert hz == pytest.approx(15.0)
+
+
+def test_get_spikes_at_events_matches_mask_per_event() -> None:
+    """Open windows, unsorted input order, and float ticks match the masked loop."""
+    rng = np.random.default_rng(1)
+    for spikes in (
+        rng.integers(0, 50_000, 2_000),
+        np.sort(rng.integers(0, 50_000, 2_000)),
+        rng.uniform(0, 50_000, 2_000),
+    ):
+        events = np.concatenate(([spikes[0] + 300], rng.integers(0, 50_000, 100)))
+        got = get_spikes_at_events(spikes, events, 300, sampling_rate_hz=30_000)
+        assert len(got) == events.size
+        for event, rel in zip(events, got):
+            in_window = spikes[(event - 300 < spikes) & (spikes < event + 300)]
+            np.testing.assert_array_equal(rel, in_window / 30_000 - event / 30_000)
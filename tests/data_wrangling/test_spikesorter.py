@@ -0,0 +1,140 @@
+"""Tests for the spikesorter CSV loader and its sidecar cache."""
+
+from __future__ import annotations
+
+import csv
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ephys.data_wrangling import spikesorter
+from ephys.data_wrangling.spike_times import (
+    group_spike_times_by_label,
+    most_common_value_per_label,
+)
+from ephys.data_wrangling.spikesorter import (
+    get_spikes,
+    load_spikesorter_columns,
+    read_best_channel,
+    read_spikesorter_csv,
+)
+
+
+def _write_spikesorter_csv(path: Path, n_spikes: int = 500, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    times_s = np.sort(rng.uniform(0.0, 100.0, n_spikes))
+    labels = rng.integers(1, 6, n_spikes)
+    channels = rng.integers(0, 32, n_spikes)
+    with open(path, "w", newline="") as handle:
+        handle.write("Spikesorter export\n")
+        handle.write("time,unit,channel\n")
+        for t, label, channel in zip(times_s, labels, channels):
+            handle.write(f"{float(t)!r},{label},{channel}\n")
+
+
+def _legacy_read(csv_path: Path, sampling_frequency: float):
+    """Row-by-row reference parse matching the original implementation."""
+    with open(csv_path, newline="") as handle:
+        rows = list(csv.reader(handle, delimiter=","))[2:]
+    spike_times = np.zeros(len(rows), dtype=int)
+    spike_labels = np.zeros(len(rows), dtype=int)
+    max_channel = np.zeros(len(rows), dtype=int)
+    for i, row in enumerate(rows):
+        spike_times[i] = float(row[0]) * sampling_frequency
+        spike_labels[i] = row[1]
+        max_channel[i] = row[2]
+    return spike_times, spike_labels, max_channel
+
+
+def test_read_spikesorter_csv_matches_row_parser(tmp_path: Path) -> None:
+    """Columnar parsing reproduces the row-by-row conversion exactly."""
+    path = tmp_path / "sorted.csv"
+    _write_spikesorter_csv(path)
+    for actual, expected in zip(
+        read_spikesorter_csv(path, 30_000.0),
+        _legacy_read(path, 30_000.0),
+    ):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_cached_load_skips_parsing(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """After the first load, columns are read from the sidecar as plain arrays."""
+    path = tmp_path / "sorted.csv"
+    _write_spikesorter_csv(path)
+    first = load_spikesorter_columns(path)
+    assert (tmp_path / "sorted.csv.npycache").is_dir()
+
+    def fail(_):
+        raise AssertionError("CSV should not be re-parsed")
+
+    monkeypatch.setattr(spikesorter, "_parse_spikesorter_columns", fail)
+    second = load_spikesorter_columns(path)
+    for a, b in zip(first, second):
+        assert type(a) is type(b) is np.ndarray
+        assert a.dtype == b.dtype and b.flags.writeable
+        np.testing.assert_array_equal(a, b)
+    assert len(get_spikes(path, 30_000.0)) == np.unique(first[1]).size
+
+
+def test_cache_invalidated_when_csv_changes(tmp_path: Path) -> None:
+    """A rewritten CSV (new size/mtime) is parsed again."""
+    path = tmp_path / "sorted.csv"
+    _write_spikesorter_csv(path, n_spikes=100)
+    assert load_spikesorter_columns(path)[0].size == 100
+    _write_spikesorter_csv(path, n_spikes=120, seed=1)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_spikesorter_columns(path)[0].size == 120
+
+
+def test_header_only_csv_yields_empty_columns(tmp_path: Path) -> None:
+    """An export without spikes loads as empty arrays."""
+    path = tmp_path / "empty.csv"
+    path.write_text("Spikesorter export\ntime,unit,channel\n")
+    spike_times, spike_labels, max_channel = read_spikesorter_csv(path, 30_000.0)
+    assert spike_times.size == spike_labels.size == max_channel.size == 0
+
+
+def test_get_spikes_matches_per_unit_masks(tmp_path: Path) -> None:
+    """Grouped spike trains equal the per-unit boolean-mask result."""
+    path = tmp_path / "sorted.csv"
+    _write_spikesorter_csv(path, n_spikes=2_000)
+    spike_times, spike_labels, _ = _legacy_read(path, 30_000.0)
+    expected = [spike_times[spike_labels == u] for u in np.unique(spike_labels)]
+    actual = get_spikes(path, 30_000.0)
+    assert len(actual) == len(expected)
+    for a, e in zip(actual, expected):
+        np.testing.assert_array_equal(a, e)
+
+
+def test_read_best_channel_matches_per_unit_mode(tmp_path: Path) -> None:
+    """Bincount modes equal the per-unit mode (smallest channel on ties)."""
+    path = tmp_path / "sorted.csv"
+    _write_spikesorter_csv(path, n_spikes=2_000)
+    _, spike_labels, max_channel = _legacy_read(path, 30_000.0)
+    expected = []
+    for u in np.unique(spike_labels):
+        values, counts = np.unique(max_channel[spike_labels == u], return_counts=True)
+        expected.append(values[np.argmax(counts)])
+    assert read_best_channel(path, 30_000.0) == expected
+
+
+def test_group_spike_times_by_label_offsets() -> None:
+    """Offsets delimit each unit and preserve within-unit input order."""
+    index = group_spike_times_by_label(
+        np.array([30, 10, 20, 40, 50]),
+        np.array([7, 3, 7, 3, 9]),
+    )
+    np.testing.assert_array_equal(index.unit_ids, [3, 7, 9])
+    np.testing.assert_array_equal(index.offsets, [0, 2, 4, 5])
+    np.testing.assert_array_equal(index.unit_spike_times(1), [30, 20])
+    assert len(group_spike_times_by_label([], [])) == 0
+
+
+def test_most_common_value_per_label_breaks_ties_low() -> None:
+    """Ties resolve to the smallest value, including negative values."""
+    unit_ids, modes = most_common_value_per_label([1, 1, 2, 2, 2], [-1, 4, 3, 3, 5])
+    np.testing.assert_array_equal(unit_ids, [1, 2])
+    np.testing.assert_array_equal(modes, [-1, 3])
@@ -1,7 +1,11 @@
+from ephys.data_wrangling.ttls import extract_ttl_edges
 from ephys.data_wrangling.ttls import find_index_of_ttl_event_from_another
+from ephys.data_wrangling.ttls import find_ttls_on_single_channel_16bit
 from ephys.data_wrangling.ttls import get_high_to_low_transition_timestamps
 from ephys.data_wrangling.ttls import get_low_to_high_transition_timestamps
 from ephys.data_wrangling.ttls import get_ttl_timestamps_16bit
+from ephys.data_wrangling.ttls import get_ttl_timestamps_from_edges
+from ephys.data_wrangling.ttls import match_nearest_events
 
 import numpy as np
 
@@ -165,3 +169,77 @@ def test_find_index_of_ttl_event_from_another():
     assert np.array_equal(laser_off_frames, expected_off_frames), (
         f"Expected {expected_off_frames}, but got {laser_off_frames}"
     )
+
+
+def test_extract_ttl_edges_matches_single_channel_path():
+    # Random multi-bit words with runs, split across several chunks
+    rng = np.random.default_rng(0)
+    run_lengths = rng.integers(1, 40, size=400)
+    words = np.repeat(rng.integers(0, 2**16, size=400, dtype=np.uint16), run_lengths)
+    words[0] = 0xFFFF
+
+    ttl_edges = extract_ttl_edges(words, chunk_samples=97)
+
+    assert ttl_edges.n_samples == words.size
+    for ttl_index in range(16):
+        ttl_boolean = find_ttls_on_single_channel_16bit(words, ttl_index)
+        assert np.array_equal(
+            ttl_edges.rising[ttl_index],
+            get_low_to_high_transition_timestamps(ttl_boolean),
+        )
+        assert np.array_equal(
+            ttl_edges.falling[ttl_index],
+            get_high_to_low_transition_timestamps(ttl_boolean),
+        )
+        assert ttl_edges.high_sample_count(ttl_index) == np.count_nonzero(ttl_boolean)
+
+
+def test_get_ttl_timestamps_from_edges_matches_16bit():
+    length = 100
+    transitions = [
+        (10, "low_to_high"),
+        (20, "high_to_low"),
+        (30, "low_to_high"),
+        (40, "high_to_low"),
+    ]
+    digital_inputs = generate_digital_inputs_with_transitions(length, transitions)
+    digital_inputs |= np.uint16(1 << 5)
+
+    expected = get_ttl_timestamps_16bit(digital_inputs, 0)
+    actual = get_ttl_timestamps_from_edges(extract_ttl_edges(digital_inputs), 0)
+
+    for a, e in zip(actual, expected):
+        assert np.array_equal(a, e)
+
+
+def test_match_nearest_events_matches_argmin():
+    rng = np.random.default_rng(1)
+    reference = np.sort(rng.integers(0, 1000, size=200))
+    query = rng.integers(-50, 1050, size=500)
+
+    indices, offsets = match_nearest_events(reference, query)
+
+    expected = [np.argmin(np.abs(reference - event)) for event in query]
+    assert np.array_equal(indices, expected)
+    assert np.array_equal(offsets, reference[indices] - query)
+
+
+def test_match_nearest_events_modes_and_tolerance():
+    reference = np.array([10, 20, 30])
+    query = np.array([5, 15, 26, 40])
+
+    left, left_offsets = match_nearest_events(reference, query, mode="left")
+    right, right_offsets = match_nearest_events(reference, query, mode="right")
+    nearest, nearest_offsets = match_nearest_events(reference, query, max_distance=4)
+
+    assert np.array_equal(left, [-1, 0, 1, 2])
+    assert np.array_equal(left_offsets, [0, -5, -6, -10])
+    assert np.array_equal(right, [0, 1, 2, -1])
+    assert np.array_equal(right_offsets, [5, 5, 4, 0])
+    assert np.array_equal(nearest, [-1, -1, 2, -1])
+    assert np.array_equal(nearest_offsets, [0, 0, 4, 0])
+
+
+def test_find_index_of_ttl_event_from_another_unsorted_reference():
+    ttl_events_1 = np.array([300, 100, 200])
+    assert find_index_of_ttl_event_from_another(ttl_events_1, [110, 290, 0]) == [1, 0, 1]
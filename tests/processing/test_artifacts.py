@@ -0,0 +1,77 @@
+"""Tests for interval-based artifact detection."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ephys.processing.artifacts import (
+    ArtifactIntervals,
+    detect_artifact_intervals,
+    mask_to_intervals,
+    merge_intervals,
+)
+
+
+def _convolve_dilated_mask(rejected: np.ndarray, pad_samples: int) -> np.ndarray:
+    kernel = np.ones(2 * pad_samples + 1, dtype=np.int32)
+    return np.convolve(rejected.astype(np.int32), kernel, mode="same") > 0
+
+
+def test_mask_to_intervals_and_back() -> None:
+    mask = np.array([1, 1, 0, 0, 1, 0, 1, 1, 1], dtype=bool)
+    starts, stops = mask_to_intervals(mask, offset=10)
+    np.testing.assert_array_equal(starts, [10, 14, 16])
+    np.testing.assert_array_equal(stops, [12, 15, 19])
+
+    intervals = ArtifactIntervals(starts=starts - 10, stops=stops - 10, n_samples=9)
+    np.testing.assert_array_equal(intervals.mask(), mask)
+    np.testing.assert_array_equal(intervals.mask(3, 8), mask[3:8])
+    assert intervals.n_artifact_samples == 6
+
+
+def test_merge_intervals_joins_overlapping_and_touching() -> None:
+    starts, stops = merge_intervals(np.array([8, 0, 3, 20]), np.array([10, 3, 5, 21]))
+    np.testing.assert_array_equal(starts, [0, 8, 20])
+    np.testing.assert_array_equal(stops, [5, 10, 21])
+
+
+@pytest.mark.parametrize("pad_samples", [0, 1, 7])
+def test_interval_dilation_matches_convolution(pad_samples: int) -> None:
+    rejected = np.random.default_rng(0).random(2_000) < 0.01
+    rejected[:2] = True
+    rejected[-1] = True
+    starts, stops = mask_to_intervals(rejected)
+    intervals = ArtifactIntervals(starts=starts, stops=stops, n_samples=rejected.size)
+
+    np.testing.assert_array_equal(
+        intervals.dilate(pad_samples).mask(),
+        _convolve_dilated_mask(rejected, pad_samples),
+    )
+
+
+def test_chunked_detection_matches_whole_array_threshold() -> None:
+    rng = np.random.default_rng(1)
+    voltage = rng.standard_normal((4, 10_000)) + 3.0
+    voltage[2, 4_095:4_099] += 20.0
+    voltage[0, 9_990] -= 20.0
+    thresholds = np.full(4, 8.0)
+    medians = np.full(4, 3.0)
+
+    intervals = detect_artifact_intervals(
+        voltage,
+        thresholds,
+        channel_medians=medians,
+        pad_samples=3,
+        chunk_samples=1_024,
+    )
+
+    rejected = np.any(np.abs(voltage - 3.0) >= 8.0, axis=0)
+    np.testing.assert_array_equal(intervals.mask(), _convolve_dilated_mask(rejected, 3))
+    assert np.all(intervals.starts[1:] > intervals.stops[:-1])
+    assert intervals.contains(np.array([4_092, 4_091, 9_993, 0])).tolist() == [
+        True,
+        False,
+        True,
+        False,
+    ]
@@ -0,0 +1,102 @@
+"""Tests for :mod:`processing.bootstrap`."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from ephys.processing.bootstrap import (
+    bootstrap_mean_ci,
+    bootstrap_mean_ci_per_unit,
+    bootstrap_means,
+)
+from ephys.processing.spike_rate import bootstrap_ci
+
+
+def _trial_counts(n_trials: int = 60, n_bins: int = 8, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(np.linspace(0.2, 4.0, n_bins), size=(n_trials, n_bins)).astype(float)
+    counts[:, 0] = 0.0
+    return counts
+
+
+def test_means_equal_explicit_resamples() -> None:
+    """Each bootstrap mean is the mean of trials repeated by the drawn weights."""
+    x = _trial_counts()
+    boot = bootstrap_means(x, 50, rng=np.random.default_rng(7), batch_size=16)
+    picks = np.random.default_rng(7).integers(0, 60, size=(16, 60))
+    for row, trials in zip(boot[:16], picks):
+        resample = x[trials]
+        np.testing.assert_allclose(row, resample.mean(axis=0), rtol=1e-12)
+
+
+def test_percentile_matches_np_percentile_and_is_reproducible() -> None:
+    x = _trial_counts()
+    lower, upper = bootstrap_mean_ci(x, n_bootstrap=2_000, rng=3)
+    boot = bootstrap_means(x, 2_000, rng=3)
+    np.testing.assert_allclose(lower, np.percentile(boot, 2.5, axis=0), rtol=1e-12)
+    np.testing.assert_allclose(upper, np.percentile(boot, 97.5, axis=0), rtol=1e-12)
+    again = bootstrap_mean_ci(x, n_bootstrap=2_000, rng=np.random.default_rng(3))
+    np.testing.assert_array_equal(again[0], lower)
+    assert lower[0] == upper[0] == 0.0
+
+
+def test_bca_agrees_with_scipy() -> None:
+    """BCa bounds on skewed data match scipy.stats.bootstrap within Monte Carlo error."""
+    x = np.random.default_rng(4).exponential(2.0, size=(80, 1))
+    lower, upper = bootstrap_mean_ci(x, n_bootstrap=40_000, method="bca", rng=5)
+    reference = stats.bootstrap(
+        (x[:, 0],), np.mean, n_resamples=40_000, method="BCa", random_state=6
+    ).confidence_interval
+    assert lower[0] == pytest.approx(reference.low, rel=0.02)
+    assert upper[0] == pytest.approx(reference.high, rel=0.02)
+    pct_lower, pct_upper = bootstrap_mean_ci(x, n_bootstrap=40_000, rng=5)
+    assert upper[0] > pct_upper[0]
+
+
+def test_per_unit_results_do_not_depend_on_workers() -> None:
+    units = [_trial_counts(seed=s, n_trials=30 + s) for s in range(4)]
+    serial = bootstrap_mean_ci_per_unit(units, n_bootstrap=500, method="bca", rng=11)
+    pooled = bootstrap_mean_ci_per_unit(
+        units, n_bootstrap=500, method="bca", rng=11, n_workers=2
+    )
+    assert len(serial) == len(pooled) == 4
+    for (lo_a, hi_a), (lo_b, hi_b) in zip(serial, pooled):
+        np.testing.assert_array_equal(lo_a, lo_b)
+        np.testing.assert_array_equal(hi_a, hi_b)
+
+
+def test_spike_rate_bootstrap_ci_is_seedable() -> None:
+    rng = np.random.default_rng(0)
+    trials = [rng.uniform(0.0, 1.0, rng.poisson(10)) for _ in range(40)]
+    bins = np.linspace(0.0, 1.0, 11)
+    lower, upper = bootstrap_ci(trials, bins, n_bootstrap=1_000, rng=1)
+    np.testing.assert_array_equal(
+        lower, bootstrap_ci(trials, bins, n_bootstrap=1_000, rng=1)[0]
+    )
+    rate = np.mean([np.histogram(t, bins=bins)[0] for t in trials], axis=0) / 0.1
+    assert np.all((lower <= rate) & (rate <= upper))
+
+
+def test_spike_rate_bootstrap_ci_default_follows_legacy_seed() -> None:
+    """Without ``rng``, ``np.random.seed`` still makes the interval reproducible."""
+    rng = np.random.default_rng(0)
+    trials = [rng.uniform(0.0, 1.0, rng.poisson(10)) for _ in range(40)]
+    bins = np.linspace(0.0, 1.0, 11)
+    np.random.seed(5)
+    first = bootstrap_ci(trials, bins, n_bootstrap=500)
+    np.random.seed(5)
+    second = bootstrap_ci(trials, bins, n_bootstrap=500)
+    np.testing.assert_array_equal(first[0], second[0])
+    np.testing.assert_array_equal(first[1], second[1])
+
+
+def test_invalid_arguments_raise() -> None:
+    x = _trial_counts()
+    with pytest.raises(ValueError, match="method"):
+        bootstrap_mean_ci(x, method="studentized")  # ty: ignore[invalid-argument-type]
+    with pytest.raises(ValueError, match="ci_percentile"):
+        bootstrap_mean_ci(x, ci_percentile=100)
+    with pytest.raises(ValueError, match="at least one trial"):
+        bootstrap_mean_ci(np.zeros((0, 3)))
@@ -0,0 +1,119 @@
+"""Tests for bandpass design and parallel filtering."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ephys.processing.filtering import (
+    design_intan_sos_bandpass,
+    parallel_sos_bandpass_filter,
+    sos_bandpass_filter,
+)
+
+
+def _noise(n_channels: int = 6, n_samples: int = 12_000) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal((n_channels, n_samples)) * 50.0
+
+
+def test_parallel_channel_split_matches_serial_filter() -> None:
+    """Splitting channels across threads reproduces sosfiltfilt exactly."""
+    data = _noise()
+    sos = design_intan_sos_bandpass()
+    expected = sos_bandpass_filter(data, sos, axis=1)
+    actual = parallel_sos_bandpass_filter(data, sos, axis=1, n_workers=3, channels_per_task=2)
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_parallel_time_chunks_match_within_pad_tolerance() -> None:
+    """Padded time blocks agree with whole-array filtering at the seams."""
+    data = _noise()
+    sos = design_intan_sos_bandpass()
+    expected = sos_bandpass_filter(data, sos, axis=1)
+    out = np.empty_like(data, dtype=np.float32)
+    actual = parallel_sos_bandpass_filter(
+        data,
+        sos,
+        axis=1,
+        out=out,
+        n_workers=2,
+        time_chunk_samples=2_500,
+    )
+    assert actual is out
+    np.testing.assert_allclose(actual, expected, rtol=0.0, atol=1e-3)
+
+
+def test_parallel_filter_time_major_layout_and_throughput() -> None:
+    """Time on axis 0 is supported and per-stage throughput is reported."""
+    data = _noise().T.copy()
+    expected = sos_bandpass_filter(data, design_intan_sos_bandpass(), axis=0)
+    actual, stages = parallel_sos_bandpass_filter(
+        data,
+        axis=0,
+        n_workers=2,
+        return_throughput=True,
+    )
+    np.testing.assert_array_equal(actual, expected)
+    assert [stage.stage for stage in stages] == ["read", "filter", "write", "total"]
+    assert all(stage.n_values == data.size for stage in stages)
+    assert all(stage.samples_per_s > 0.0 for stage in stages)
+
+
+def test_parallel_process_backend_matches_serial_filter() -> None:
+    """The process pool backend writes the same result into ``out``."""
+    data = _noise(n_channels=4, n_samples=4_000)
+    sos = design_intan_sos_bandpass()
+    expected = sos_bandpass_filter(data, sos, axis=1)
+    actual = parallel_sos_bandpass_filter(data, sos, n_workers=2, backend="process")
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_in_place_time_chunking_is_rejected() -> None:
+    """Time chunks read padding from neighbors, so in-place output is refused."""
+    data = _noise()
+    with pytest.raises(ValueError, match="alias"):
+        parallel_sos_bandpass_filter(data, out=data, time_chunk_samples=2_000)
+
+
+def test_float32_policy_error() -> None:
+    """float32 filtering stays far below one int16 count of float64.
+
+    Speed is compared by ``scripts/benchmark_filter_dtype.py``.
+    """
+    data = _noise(n_channels=16, n_samples=120_000).astype(np.float32)
+    sos = design_intan_sos_bandpass()
+
+    results = {
+        dtype: sos_bandpass_filter(data, sos, axis=1, dtype=dtype)
+        for dtype in ("float32", "float64")
+    }
+
+    assert results["float32"].dtype == np.float32
+    assert results["float64"].dtype == np.float64
+    max_error_uV = float(np.max(np.abs(results["float32"] - results["float64"])))
+    # One Intan int16 count is 0.195 uV
+    assert max_error_uV < 0.01
+
+
+def test_parallel_filter_float32_output_has_no_upcast() -> None:
+    """The dtype policy sets the default output and per-block working dtype."""
+    data = _noise().astype(np.float32)
+    sos = design_intan_sos_bandpass()
+    actual = parallel_sos_bandpass_filter(
+        data,
+        sos,
+        n_workers=2,
+        time_chunk_samples=5_000,
+        dtype="float32",
+    )
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(
+        actual,
+        sos_bandpass_filter(data, sos, axis=1, dtype="float64"),
+        atol=1e-3,
+    )
+
+
+def test_unsupported_dtype_policy_raises() -> None:
+    with pytest.raises(ValueError, match="float32 or float64"):
+        sos_bandpass_filter(_noise(), design_intan_sos_bandpass(), dtype="float16")  # ty: ignore[invalid-argument-type]
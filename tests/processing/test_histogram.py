@@ -0,0 +1,63 @@
+"""Tests for :mod:`processing.histogram`."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter1d
+
+from ephys.processing.histogram import bin_indices, per_trial_histogram, uniform_bin_width
+from ephys.processing.ragged import as_ragged
+from ephys.processing.spike_rate import calculate_per_trial_spike_counts
+
+
+def _trials(seed: int = 0) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    trials = [rng.uniform(-0.6, 0.6, rng.poisson(20)) for _ in range(300)]
+    trials[0] = np.array([])
+    trials[1] = np.array([-0.5, 0.5, np.nan, -0.2, 0.1, 0.5 + 1e-12, -0.5 - 1e-12, 0.0])
+    return trials
+
+
+EDGES = {
+    "linspace": np.linspace(-0.5, 0.5, 101),
+    "arange": np.arange(-0.2, 0.2001, 0.001),
+    "nonuniform": np.array([-0.5, -0.1, -0.02, 0.0, 0.002, 0.01, 0.1, 0.5]),
+}
+
+
+@pytest.mark.parametrize("name", sorted(EDGES))
+def test_matches_numpy_histogram_per_trial(name: str) -> None:
+    """Both bin paths reproduce np.histogram, including every edge value."""
+    edges = EDGES[name]
+    trials = _trials()
+    trials.append(edges.copy())
+    counts = per_trial_histogram(trials, edges)
+    expected = np.stack([np.histogram(t, bins=edges)[0] for t in trials])
+    assert counts.shape == (len(trials), edges.size - 1)
+    assert counts.dtype == np.int64
+    np.testing.assert_array_equal(counts, expected)
+    np.testing.assert_array_equal(per_trial_histogram(as_ragged(trials), edges), expected)
+
+
+def test_uniform_detection_and_bin_indices() -> None:
+    assert uniform_bin_width(EDGES["linspace"]) == pytest.approx(0.01)
+    assert uniform_bin_width(EDGES["nonuniform"]) is None
+    idx = bin_indices(np.array([-1.0, 0.0, 0.5, np.nan]), np.array([0.0, 0.25, 0.5]))
+    np.testing.assert_array_equal(idx, [-1, 0, 1, -1])
+    with pytest.raises(ValueError, match="monotonically"):
+        bin_indices(np.array([0.0]), np.array([1.0, 0.0]))
+
+
+def test_batched_smoothing_matches_per_trial() -> None:
+    """One gaussian_filter1d along bins equals smoothing each trial separately."""
+    edges = EDGES["linspace"]
+    trials = _trials(1)
+    smoothed = per_trial_histogram(trials, edges, smooth_sigma=2.0)
+    expected = np.stack(
+        [gaussian_filter1d(np.histogram(t, bins=edges)[0].astype(float), 2.0) for t in trials]
+    )
+    np.testing.assert_allclose(smoothed, expected, rtol=0, atol=1e-12)
+    legacy = calculate_per_trial_spike_counts(trials, edges, smooth=True, sigma=2.0)
+    np.testing.assert_array_equal(legacy, smoothed)
+    assert per_trial_histogram([], edges).shape == (0, edges.size - 1)
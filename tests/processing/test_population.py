@@ -0,0 +1,76 @@
+"""Tests for :mod:`processing.population`."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ephys.processing.population import population_bin_counts
+from ephys.processing.ragged import RaggedArray
+from ephys.processing.spike_align import per_trial_bin_counts, spikes_relative_to_events_ticks
+
+FS = 30_000.0
+
+
+def _units(n_units: int = 12, seed: int = 0) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    units = [np.sort(rng.integers(0, 600_000, rng.integers(0, 3_000))) for _ in range(n_units)]
+    units[3] = np.array([], dtype=np.int64)
+    units[5] = rng.integers(0, 600_000, 500)  # unsorted
+    return units
+
+
+def _per_unit_loop(units, events, edges):
+    return np.stack(
+        [
+            np.stack(
+                per_trial_bin_counts(spikes_relative_to_events_ticks(u, events, 7_000, FS), edges)
+            )
+            for u in units
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    "edges",
+    [np.linspace(-0.1, 0.15, 26), np.array([-0.1, -0.02, 0.0, 0.004, 0.01, 0.05, 0.2])],
+)
+def test_dense_counts_match_per_unit_loop(edges: np.ndarray) -> None:
+    """Uniform and non-uniform edges give the per-unit alignment + histogram result."""
+    units = _units()
+    events = np.random.default_rng(1).integers(0, 600_000, 400)
+    expected = _per_unit_loop(units, events, edges)
+    counts = population_bin_counts(units, events, edges, FS)
+    assert counts.shape == (12, 400, edges.size - 1)
+    assert counts.dtype == np.int32
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_chunked_threaded_and_sparse_agree() -> None:
+    """Chunking, threads, ragged input, and sparse output do not change counts."""
+    units = _units()
+    events = np.random.default_rng(2).integers(0, 600_000, 250)
+    edges = np.linspace(-0.05, 0.05, 21)
+    dense = population_bin_counts(units, events, edges, FS)
+
+    ragged = RaggedArray.from_list(units, dtype=np.int64)
+    chunked = population_bin_counts(ragged, events, edges, FS, units_per_chunk=5, n_workers=3)
+    np.testing.assert_array_equal(chunked, dense)
+
+    sparse = population_bin_counts(units, events, edges, FS, units_per_chunk=4, sparse=True)
+    assert sparse.shape == dense.shape
+    assert sparse.nnz == np.count_nonzero(dense)
+    np.testing.assert_array_equal(sparse.to_dense(), dense)
+    np.testing.assert_array_equal(sparse.unit_counts(7), dense[7])
+    np.testing.assert_allclose(sparse.trial_mean(), dense.mean(axis=1))
+
+
+def test_empty_inputs_and_validation() -> None:
+    edges = np.linspace(0.0, 0.01, 3)
+    assert population_bin_counts([], [10], edges, FS).shape == (0, 1, 2)
+    assert population_bin_counts([np.array([5])], [], edges, FS).shape == (1, 0, 2)
+    assert population_bin_counts([], [10], edges, FS, sparse=True).nnz == 0
+    with pytest.raises(ValueError, match="units_per_chunk"):
+        population_bin_counts([np.array([5])], [10], edges, FS, units_per_chunk=0)
+    with pytest.raises(ValueError, match="monotonic"):
+        population_bin_counts([np.array([5])], [10], edges[::-1], FS)
@@ -0,0 +1,137 @@
+"""Tests for stage-level profiling."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ephys.data_wrangling.intan import IntanAmplifierReader
+from ephys.processing.filtering import design_intan_sos_bandpass
+from ephys.processing.profiling import (
+    PROFILE_REPORT_VERSION,
+    StageProfile,
+    StageProfiler,
+    _read_hwm_bytes,
+    profile_stage,
+)
+from ephys.processing.streaming import stream_preprocess_intan
+
+
+def test_repeated_stages_are_aggregated_by_name() -> None:
+    """Calls, seconds, and bytes add up; first-run order is kept."""
+    profiler = StageProfiler()
+    for _ in range(3):
+        with profiler.stage("read", n_bytes=1_000):
+            pass
+    with profiler.stage("write", n_bytes=10):
+        pass
+    with profiler.stage("read", n_bytes=500):
+        pass
+
+    read, write = profiler.stages()
+    assert (read.stage, read.calls, read.n_bytes) == ("read", 4, 3_500)
+    assert (write.stage, write.calls, write.n_bytes) == ("write", 1, 10)
+    assert read.seconds >= 0.0
+
+
+def test_outer_stage_peak_includes_inner_stage() -> None:
+    """A nested stage's peak RSS never exceeds its parent's."""
+    profiler = StageProfiler()
+    with profiler.stage("outer"):
+        with profiler.stage("inner"):
+            block = np.ones(8 * 2**20 // 8)
+            block.sum()
+        del block
+    by_name = {record.stage: record for record in profiler.stages()}
+    outer_peak = by_name["outer"].peak_rss_bytes
+    inner_peak = by_name["inner"].peak_rss_bytes
+    if outer_peak is not None and inner_peak is not None:
+        assert outer_peak >= inner_peak
+
+
+def test_outer_stage_peak_survives_inner_stage_reset() -> None:
+    """Memory the outer stage peaked at before an inner stage starts is kept."""
+    profiler = StageProfiler()
+    if not profiler.peak_rss_per_stage:
+        pytest.skip("per-stage peak RSS needs /proc/self/clear_refs")
+    with profiler.stage("outer"):
+        baseline = _read_hwm_bytes()
+        block = np.ones(64 * 2**20 // 8)
+        block.sum()
+        del block
+        with profiler.stage("inner"):
+            pass
+    by_name = {record.stage: record for record in profiler.stages()}
+    assert baseline is not None
+    assert by_name["outer"].peak_rss_bytes is not None
+    assert by_name["outer"].peak_rss_bytes >= baseline + 48 * 2**20
+
+
+def test_stage_is_recorded_when_block_raises() -> None:
+    """Exceptions propagate and the failing stage is still recorded."""
+    profiler = StageProfiler()
+    try:
+        with profiler.stage("boom"):
+            raise RuntimeError("fail")
+    except RuntimeError:
+        pass
+    assert [record.stage for record in profiler.stages()] == ["boom"]
+
+
+def test_profile_stage_is_noop_without_profiler() -> None:
+    """``profile_stage(None, ...)`` runs the block without recording."""
+    with profile_stage(None, "anything", 123):
+        ran = True
+    assert ran
+
+
+def test_mib_per_s_requires_bytes_and_time() -> None:
+    assert StageProfile("s", 1, 2.0, 4 * 2**20, None).mib_per_s == 2.0
+    assert StageProfile("s", 1, 2.0, 0, None).mib_per_s is None
+    assert StageProfile("s", 1, 0.0, 10, None).mib_per_s is None
+
+
+def test_report_json_and_table(tmp_path: Path) -> None:
+    """The JSON report lists every stage and the table has one row each."""
+    profiler = StageProfiler()
+    with profiler.stage("bandpass", n_bytes=2**20):
+        pass
+    with profiler.stage("zca_fit"):
+        pass
+
+    output = profiler.write_json(tmp_path / "nested" / "profile.json")
+    report = json.loads(output.read_text())
+    assert report["version"] == PROFILE_REPORT_VERSION
+    assert [stage["stage"] for stage in report["stages"]] == ["bandpass", "zca_fit"]
+    assert report["stages"][0]["n_bytes"] == 2**20
+    assert report["stages"][1]["mib_per_s"] is None
+
+    lines = profiler.format_table().splitlines()
+    assert len(lines) == 3
+    assert lines[1].startswith("bandpass")
+
+
+def test_stream_preprocess_records_chunk_stages(tmp_path: Path) -> None:
+    """Streaming preprocessing reports one call per chunk for each stage."""
+    n_samples, n_channels = 10_000, 4
+    raw_path = tmp_path / "amplifier.dat"
+    rng = np.random.default_rng(0)
+    (rng.standard_normal((n_samples, n_channels)) * 100.0).astype(np.int16).tofile(raw_path)
+    reader = IntanAmplifierReader(raw_path, n_channels)
+
+    profiler = StageProfiler()
+    stream_preprocess_intan(
+        reader,
+        tmp_path / "out.dat",
+        sos=design_intan_sos_bandpass(),
+        chunk_samples=2_500,
+        common_median_reference=True,
+        profiler=profiler,
+    )
+    by_name = {record.stage: record for record in profiler.stages()}
+    assert {"read", "bandpass", "cmr", "quantize_write"} <= set(by_name)
+    assert by_name["bandpass"].calls == 4
+    assert by_name["quantize_write"].n_bytes == n_samples * n_channels * 2
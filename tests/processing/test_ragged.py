@@ -0,0 +1,117 @@
+"""Tests for :mod:`processing.ragged` and ragged inputs to trial helpers."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ephys.plotting.raster_layout import bin_spike_lists, sorted_subset_trials
+from ephys.processing.psth import burst_trial_fraction_within_onset_window
+from ephys.processing.ragged import RaggedArray, as_ragged
+from ephys.processing.spike_align import (
+    apply_trial_order,
+    per_trial_bin_counts,
+    sort_order_by_first_spike,
+    sort_order_by_spike_count_then_first_spike,
+)
+from ephys.processing.spike_intervals import adjacent_isi_cv2, collect_adjacent_isi_cv2_by_trial
+
+
+def _random_trials(n_trials: int = 200, seed: int = 0) -> list[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    counts = rng.poisson(3.0, n_trials)
+    counts[::7] = 0
+    return [rng.uniform(-0.5, 0.5, count) for count in counts]
+
+
+def test_round_trip_and_indexing() -> None:
+    """Rows survive packing; ints give views, slices keep sharing values."""
+    rows = [np.array([1.0, 2.0]), np.array([]), np.array([3.0])]
+    ragged = RaggedArray.from_list(rows)
+    np.testing.assert_array_equal(ragged.offsets, [0, 2, 2, 3])
+    assert len(ragged) == 3
+    for got, expected in zip(ragged.to_list(), rows):
+        np.testing.assert_array_equal(got, expected)
+    np.testing.assert_array_equal(ragged[-1], [3.0])
+    tail = ragged[1:]
+    assert np.shares_memory(tail.values, ragged.values)
+    np.testing.assert_array_equal(tail.offsets, [0, 0, 1])
+    with pytest.raises(IndexError):
+        ragged[3]
+
+
+def test_invalid_offsets_raise() -> None:
+    with pytest.raises(ValueError, match="end at values.size"):
+        RaggedArray(np.zeros(3), np.array([0, 2]))
+    with pytest.raises(ValueError, match="non-decreasing"):
+        RaggedArray(np.zeros(3), np.array([0, 2, 1, 3]))
+
+
+def test_take_concatenate_and_merge_rows() -> None:
+    """Gathers, stacking, and row merging match list operations."""
+    rows = _random_trials(50)
+    ragged = as_ragged(rows)
+    order = np.array([5, 0, -1, 5, 7])
+    taken = ragged.take(order)
+    assert [row.tolist() for row in taken] == [rows[int(i)].tolist() for i in order]
+    mask = np.zeros(50, dtype=bool)
+    mask[[3, 9]] = True
+    assert [row.tolist() for row in ragged[mask]] == [rows[3].tolist(), rows[9].tolist()]
+
+    stacked = RaggedArray.concatenate([ragged[:10], ragged[10:]])
+    np.testing.assert_array_equal(stacked.offsets, ragged.offsets)
+
+    merged = ragged.merge_rows(4)
+    assert len(merged) == 13
+    np.testing.assert_array_equal(merged[12], np.concatenate(rows[48:]))
+
+
+def test_trial_helpers_agree_for_list_and_ragged() -> None:
+    """Ordering, counting, and burst fraction give the same results for both forms."""
+    rows = _random_trials()
+    ragged = as_ragged(rows)
+    edges = np.linspace(-0.5, 0.5, 21)
+
+    expected_first = np.argsort(
+        [row.min() if row.size else np.inf for row in rows], kind="mergesort"
+    )
+    np.testing.assert_array_equal(sort_order_by_first_spike(ragged), expected_first)
+    np.testing.assert_array_equal(
+        sort_order_by_spike_count_then_first_spike(ragged),
+        sort_order_by_spike_count_then_first_spike(rows),
+    )
+    reordered = apply_trial_order(ragged, expected_first)
+    assert isinstance(reordered, RaggedArray)
+    np.testing.assert_array_equal(
+        reordered.values, np.concatenate(apply_trial_order(rows, expected_first))
+    )
+    np.testing.assert_array_equal(
+        np.stack(per_trial_bin_counts(ragged, edges)),
+        np.stack([np.histogram(row, bins=edges)[0] for row in rows]).astype(float),
+    )
+    expected_burst = np.mean([np.sum((row >= 0.0) & (row <= 0.1)) > 1 for row in rows])
+    assert burst_trial_fraction_within_onset_window(ragged, window_end_s=0.1) == pytest.approx(
+        expected_burst
+    )
+
+
+def test_cv2_by_trial_matches_single_train() -> None:
+    """Vectorized CV2 never pairs ISIs across trials and ignores non-finite spikes."""
+    rows = _random_trials()
+    rows[2] = np.array([0.3, np.nan, 0.1, 0.2, 0.25])
+    by_trial = collect_adjacent_isi_cv2_by_trial(as_ragged(rows))
+    assert len(by_trial) == len(rows)
+    for got, row in zip(by_trial, rows):
+        np.testing.assert_allclose(got, adjacent_isi_cv2(row))
+
+
+def test_raster_layout_keeps_ragged_inputs() -> None:
+    rows = _random_trials(20)
+    ragged = as_ragged(rows)
+    merged = bin_spike_lists(ragged, 3)
+    assert isinstance(merged, RaggedArray)
+    assert len(merged) == 7
+    primary, secondary = sorted_subset_trials(ragged, ragged, np.array([4, 1, 8]))
+    list_primary, _ = sorted_subset_trials(rows, rows, np.array([4, 1, 8]))
+    assert isinstance(secondary, RaggedArray)
+    assert [row.tolist() for row in primary] == [row.tolist() for row in list_primary]
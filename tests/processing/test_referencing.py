@@ -0,0 +1,102 @@
+"""Tests for block-wise common median referencing."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ephys import probes
+from ephys.processing.referencing import apply_common_median_reference, common_median
+
+
+@pytest.mark.parametrize("n_channels", [1, 2, 7, 32])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_common_median_matches_numpy(n_channels, dtype):
+    block = np.random.default_rng(n_channels).standard_normal((n_channels, 501)).astype(dtype)
+    original = block.copy()
+
+    result = common_median(block)
+
+    assert result.dtype == dtype
+    np.testing.assert_array_equal(result, np.median(original, axis=0))
+    np.testing.assert_array_equal(block, original)
+
+
+@pytest.mark.parametrize("n_workers", [1, 3])
+def test_cmr_blocks_match_full_median(n_workers):
+    voltage = np.random.default_rng(0).standard_normal((16, 10_001)).astype(np.float32)
+    good_channels = [0, 2, 3, 5, 6, 7, 8, 11, 12, 13, 15]
+    expected = voltage.copy()
+    expected[good_channels] -= np.median(expected[good_channels], axis=0)
+
+    result = apply_common_median_reference(
+        voltage,
+        good_channels,
+        chunk_samples=1_000,
+        n_workers=n_workers,
+    )
+
+    assert result is voltage
+    np.testing.assert_array_equal(voltage, expected)
+
+
+def test_cmr_can_reference_dead_channels():
+    """Dead channels get their group's good-channel median when requested."""
+    data = np.random.default_rng(2).standard_normal((6, 2_000))
+    groups = np.array([0, 0, 0, 1, 1, 1])
+    good_channels = [0, 1, 4, 5]
+
+    single = apply_common_median_reference(data.copy(), good_channels, reference_dead_channels=True)
+    np.testing.assert_array_equal(single, data - np.median(data[good_channels], axis=0))
+
+    grouped = apply_common_median_reference(
+        data.copy(),
+        good_channels,
+        channel_groups=groups,
+        reference_dead_channels=True,
+    )
+    expected = data.copy()
+    expected[:3] -= np.median(data[[0, 1]], axis=0)
+    expected[3:] -= np.median(data[[4, 5]], axis=0)
+    np.testing.assert_array_equal(grouped, expected)
+
+
+def test_cmr_references_each_group_in_place_on_memmap(tmp_path):
+    rng = np.random.default_rng(1)
+    data = rng.standard_normal((8, 5_000))
+    data[:4] += 50.0 * rng.standard_normal(5_000)
+    data[4:] += 50.0 * rng.standard_normal(5_000)
+    voltage = np.lib.format.open_memmap(
+        tmp_path / "voltage.npy",
+        mode="w+",
+        dtype=np.float64,
+        shape=data.shape,
+    )
+    voltage[:] = data
+    groups = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+    good_channels = [0, 1, 2, 4, 5, 6, 7]
+
+    apply_common_median_reference(voltage, good_channels, channel_groups=groups, chunk_samples=777)
+
+    expected = data.copy()
+    for members in ([0, 1, 2], [4, 5, 6, 7]):
+        expected[members] -= np.median(data[members], axis=0)
+    np.testing.assert_allclose(np.load(tmp_path / "voltage.npy"), expected, rtol=0, atol=1e-12)
+    assert np.std(voltage[[0, 1, 2, 4, 5, 6, 7]]) < 2.0
+
+
+def test_channel_groups_follow_probe_wiring():
+    probe = probes.get_poly2_probe()
+    probe.set_shank_ids(np.where(probe.contact_positions[:, 0] < 0, "left", "right"))
+
+    groups = probes.get_channel_groups(probe)
+
+    channels = np.asarray(probe.device_channel_indices)
+    expected = (probe.contact_positions[:, 0] > 0).astype(np.int64)
+    np.testing.assert_array_equal(groups[channels], expected)
+
+
+def test_probe_without_shank_ids_is_one_group():
+    groups = probes.get_channel_groups(probes.get_poly3_probe())
+    assert groups.shape == (32,)
+    assert np.all(groups == 0)
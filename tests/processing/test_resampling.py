@@ -43,3 +43,15 @@ def test_whittaker_shannon_interpolate_multidimensional():
     upsampled = whittaker_shannon_interpolate(signal, up_factor=up_factor, axis=0)
 
     assert upsampled.shape == (2000, 5)
+
+
+def test_whittaker_shannon_interpolate_float32_policy():
+    """The float32 policy interpolates int16-scaled data without upcasting."""
+    t = np.arange(3000) / 30000.0
+    signal = (10 * np.sin(2 * np.pi * 300.0 * t)).astype(np.float64)
+
+    upsampled32 = whittaker_shannon_interpolate(signal, up_factor=4, dtype="float32")
+    upsampled64 = whittaker_shannon_interpolate(signal, up_factor=4)
+
+    assert upsampled32.dtype == np.float32
+    np.testing.assert_allclose(upsampled32, upsampled64, atol=1e-4)
@@ -0,0 +1,89 @@
+"""Tests for the lazy SpikeInterface preprocessing recording."""
+
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+from ephys.data_wrangling.intan import INTAN_BIT_TO_uV, IntanAmplifierReader
+from ephys.processing.filtering import (
+    DEFAULT_PAD_TOLERANCE,
+    design_intan_sos_bandpass,
+    sos_filtfilt_pad_samples,
+)
+from ephys.processing.si_recording import (
+    IntanPreprocessedRecording,
+    write_intan_int16_recording,
+)
+from ephys.processing.streaming import preprocess_time_range
+from ephys.processing.zca import fit_zca_whitening
+
+
+def _write_recording(path: Path, n_samples: int = 30_000, n_channels: int = 6) -> None:
+    rng = np.random.default_rng(0)
+    common = rng.standard_normal(n_samples) * 300.0
+    raw = rng.standard_normal((n_samples, n_channels)) * 100.0 + common[:, np.newaxis]
+    raw.astype(np.int16).tofile(path)
+
+
+def test_traces_match_whole_range_preprocessing(tmp_path: Path) -> None:
+    """Any frame window equals the same window of whole-recording processing."""
+    path = tmp_path / "amplifier.dat"
+    _write_recording(path)
+    good_channels = [0, 1, 2, 4, 5]
+    recording = IntanPreprocessedRecording(path, 6, 30_000.0, good_channels=good_channels)
+    reader = IntanAmplifierReader(path, 6)
+    bandpassed = recording.get_traces().T
+    fit = fit_zca_whitening(bandpassed[good_channels], epsilon=1.0, good_channels=good_channels)
+
+    whitened = IntanPreprocessedRecording(
+        path,
+        6,
+        30_000.0,
+        good_channels=good_channels,
+        common_median_reference=True,
+        zca_fit=fit,
+    )
+    sos = design_intan_sos_bandpass(sampling_rate_hz=30_000.0)
+    expected = preprocess_time_range(
+        reader,
+        0,
+        reader.n_samples,
+        sos=sos,
+        pad_samples=sos_filtfilt_pad_samples(sos, tolerance=DEFAULT_PAD_TOLERANCE),
+        good_channels=good_channels,
+        common_median_reference=True,
+        zca_fit=fit,
+        dtype="float32",
+    )
+
+    window = whitened.get_traces(start_frame=12_345, end_frame=15_000)
+    assert window.shape == (2_655, 6)
+    assert window.dtype == np.float32
+    np.testing.assert_allclose(window, expected[:, 12_345:15_000].T, atol=0.01)
+    selected = whitened.get_traces(start_frame=100, end_frame=200, channel_ids=[1, 4])
+    np.testing.assert_array_equal(selected, whitened.get_traces(start_frame=100, end_frame=200)[:, [1, 4]])
+
+    restored = pickle.loads(pickle.dumps(whitened))
+    np.testing.assert_array_equal(restored.get_traces(start_frame=0, end_frame=500), whitened.get_traces(start_frame=0, end_frame=500))
+
+
+def test_chunked_int16_writer_rounds_to_intan_counts(tmp_path: Path) -> None:
+    """The chunked writer produces interleaved, rounded int16 counts."""
+    path = tmp_path / "amplifier.dat"
+    _write_recording(path)
+    recording = IntanPreprocessedRecording(path, 6, 30_000.0, common_median_reference=True)
+
+    output = write_intan_int16_recording(
+        recording,
+        tmp_path / "out" / "processed.dat",
+        chunk_duration="0.25s",
+        progress_bar=False,
+    )
+
+    written = np.fromfile(output, dtype=np.int16).reshape(-1, 6)
+    expected = np.round(recording.get_traces() / INTAN_BIT_TO_uV)
+    assert written.shape == expected.shape
+    assert np.max(np.abs(written - expected)) <= 1
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import numpy as np
 
+from ephys.processing.artifacts import ArtifactIntervals
 from ephys.processing.spatial_diagnostics import (
     compute_spatial_diagnostics,
     format_spatial_diagnostics_line,
@@ -74,3 +75,82 @@ def test_post_cmr_line_reports_not_applicable_pc1() -> None:
     line = format_spatial_diagnostics_line("after CMR", diagnostics)
     assert "PC1 vs median r=n/a" in line
     assert "residual median RMS=" in line
+
+
+def _direct_diagnostics(voltage: np.ndarray) -> dict[str, float]:
+    """Multi-pass reference computed on a fully materialized subsample."""
+    covariance = np.cov(voltage, bias=True)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    pc1_scores = eigenvectors[:, -1] @ (voltage - voltage.mean(axis=1, keepdims=True))
+    spatial_median = np.median(voltage, axis=0)
+    mads = 1.4826 * np.median(
+        np.abs(voltage - np.median(voltage, axis=1, keepdims=True)),
+        axis=1,
+    )
+    correlation = np.corrcoef(voltage)
+    return {
+        "mean_abs_off_diag_corr": float(
+            np.mean(np.abs(correlation[~np.eye(voltage.shape[0], dtype=bool)]))
+        ),
+        "dominant_eigenvalue_fraction": float(eigenvalues[-1] / eigenvalues.sum()),
+        "pc1_median_correlation": abs(float(np.corrcoef(pc1_scores, spatial_median)[0, 1])),
+        "residual_spatial_median_rms_uV": float(np.sqrt(np.mean(spatial_median**2))),
+        "median_mad_uV": float(np.median(mads)),
+    }
+
+
+def test_single_pass_matches_direct_computation_on_memmap(tmp_path) -> None:
+    """One pass over a memmap reproduces the multi-pass statistics."""
+    voltage = _common_mode_recording(n_channels=6, n_samples=40_000, seed=3) + 500.0
+    path = tmp_path / "voltage.npy"
+    np.save(path, voltage)
+    memmap = np.load(path, mmap_mode="r")
+    channels = np.array([0, 2, 3, 5])
+    indices = plan_spatial_subsample_indices(voltage.shape[1], samples_per_segment=8_000)
+
+    diagnostics = compute_spatial_diagnostics(memmap, channels, indices)
+    expected = _direct_diagnostics(voltage[np.ix_(channels, indices)])
+
+    assert diagnostics.n_samples_used == indices.size
+    for field, value in expected.items():
+        actual = getattr(diagnostics, field)
+        if field == "pc1_median_correlation":
+            actual = abs(actual)
+        assert np.isclose(actual, value, rtol=1e-9, atol=1e-9), field
+
+
+def test_bounded_mad_subset_approximates_full_mad() -> None:
+    """Capping the MAD subset keeps the estimate close to the full MAD."""
+    voltage = _common_mode_recording(n_samples=60_000)
+    indices = np.arange(voltage.shape[1])
+    full = compute_spatial_diagnostics(voltage, np.arange(4), indices)
+    capped = compute_spatial_diagnostics(
+        voltage,
+        np.arange(4),
+        indices,
+        max_mad_samples=5_000,
+    )
+    assert capped.mean_abs_off_diag_corr == full.mean_abs_off_diag_corr
+    assert abs(capped.median_mad_uV - full.median_mad_uV) < 0.05 * full.median_mad_uV
+
+
+def test_artifact_intervals_are_looked_up_by_sample_tick() -> None:
+    """Subsample columns are skipped when their recording tick is an artifact."""
+    voltage = _common_mode_recording(n_samples=2_000)
+    ticks = np.concatenate([np.arange(0, 1_000), np.arange(50_000, 51_000)])
+    intervals = ArtifactIntervals(
+        starts=np.array([50_000]), stops=np.array([50_500]), n_samples=60_000
+    )
+    indices = np.arange(voltage.shape[1])
+    skipped = compute_spatial_diagnostics(
+        voltage,
+        np.arange(4),
+        indices,
+        artifact_intervals=intervals,
+        sample_ticks=ticks,
+    )
+    assert skipped.n_samples_used == 1_500
+    expected = compute_spatial_diagnostics(
+        voltage, np.arange(4), np.r_[0:1_000, 1_500:2_000]
+    )
+    assert skipped == expected
@@ -8,6 +8,7 @@ from ephys.processing.spike_align import (
     apply_trial_order,
     event_ticks_greedy_non_overlapping_half_windows,
     sort_order_by_spike_count_descending,
+    spikes_relative_to_events_ragged,
     spikes_relative_to_events_ticks,
 )
 
@@ -93,3 +94,31 @@ def test_sort_order_by_spike_count_descending() -> None:
     assert len(stacked[0]) == 3
     assert len(stacked[1]) == 1
     assert len(stacked[2]) == 0
+
+
+def _loop_relative_spikes(spike_ticks, event_ticks, win_ticks, fs):
+    spikes = np.sort(np.asarray(spike_ticks, dtype=np.int64), kind="mergesort")
+    out = []
+    for event in np.asarray(event_ticks, dtype=np.int64):
+        i0 = np.searchsorted(spikes, int(event) - win_ticks, side="left")
+        i1 = np.searchsorted(spikes, int(event) + win_ticks, side="left")
+        out.append(spikes[i0:i1].astype(np.float64) / fs - float(event) / fs)
+    return out
+
+
+def test_batched_alignment_matches_per_event_loop() -> None:
+    """Unsorted spikes, duplicates, edge ticks and overlapping windows match exactly."""
+    rng = np.random.default_rng(3)
+    spike_ticks = rng.integers(0, 200_000, 5_000)
+    spike_ticks[:10] = 1_000
+    event_ticks = np.concatenate(([1_000, 1_500, 0, 199_999], rng.integers(0, 200_000, 300)))
+    expected = _loop_relative_spikes(spike_ticks, event_ticks, 500, 30_000.0)
+
+    rel = spikes_relative_to_events_ticks(spike_ticks, event_ticks, 500, 30_000.0)
+    ragged = spikes_relative_to_events_ragged(spike_ticks, event_ticks, 500, 30_000.0)
+    assert len(rel) == len(ragged) == event_ticks.size
+    for got, got_ragged, want in zip(rel, ragged, expected):
+        np.testing.assert_array_equal(got, want)
+        np.testing.assert_array_equal(got_ragged, want)
+    no_events = np.array([], dtype=np.int64)
+    assert spikes_relative_to_events_ragged(spike_ticks, no_events, 500, 30_000.0).n_rows == 0
@@ -0,0 +1,154 @@
+"""Tests for chunked, bounded-memory preprocessing."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from ephys.data_wrangling.intan import INTAN_BIT_TO_uV, IntanAmplifierReader
+from ephys.processing.filtering import (
+    design_intan_sos_bandpass,
+    sos_bandpass_filter,
+    sos_filtfilt_pad_samples,
+)
+from ephys.processing.precision import ProcessingDtype
+from ephys.processing.referencing import apply_common_median_reference
+from ephys.processing.streaming import (
+    SUBSAMPLE_WORKING_COPIES,
+    chunk_samples_for_memory_budget,
+    plan_subsample_segments,
+    plan_subsample_segments_for_memory_budget,
+    plan_time_chunks,
+    preprocess_time_range,
+    read_preprocessed_segments,
+    stream_preprocess_intan,
+)
+from ephys.processing.zca import apply_zca_fit, fit_zca_whitening
+
+
+def _write_recording(path: Path, n_samples: int = 20_000, n_channels: int = 4) -> None:
+    rng = np.random.default_rng(0)
+    common = rng.standard_normal(n_samples) * 300.0
+    raw = rng.standard_normal((n_samples, n_channels)) * 100.0 + common[:, np.newaxis]
+    raw.astype(np.int16).tofile(path)
+
+
+def test_plan_time_chunks_tiles_recording() -> None:
+    """Output ranges cover the recording once; padding is clipped at edges."""
+    chunks = plan_time_chunks(1_050, 500, 40)
+    assert [(c.start, c.stop) for c in chunks] == [(0, 500), (500, 1000), (1000, 1050)]
+    assert chunks[0].padded_start == 0
+    assert chunks[1].padded_start == 460
+    assert chunks[-1].padded_stop == 1_050
+
+
+def test_chunk_samples_for_memory_budget_rejects_tiny_budget() -> None:
+    """A budget smaller than one minimal padded chunk raises."""
+    assert chunk_samples_for_memory_budget(64 * 2**20, 32, 300) > 1024
+    with pytest.raises(ValueError, match="too small"):
+        chunk_samples_for_memory_budget(1_000, 32, 300)
+
+
+def test_plan_subsample_segments_spans_recording() -> None:
+    """Segments include both ends and fall back to the whole short recording."""
+    segments = plan_subsample_segments(100_000, n_segments=4, samples_per_segment=1_000)
+    assert segments[0] == (0, 1_000)
+    assert segments[-1] == (99_000, 100_000)
+    assert plan_subsample_segments(3_000, n_segments=4, samples_per_segment=1_000) == [
+        (0, 3_000)
+    ]
+
+
+def test_subsample_segments_fit_memory_budget() -> None:
+    """The subsample's fit working set stays within half of the budget."""
+    budget = 256 * 2**20
+    segments = plan_subsample_segments_for_memory_budget(10**8, budget, 384, 300)
+    n_columns = sum(stop - start for start, stop in segments)
+    assert len(segments) == 10
+    assert n_columns * 384 * 8 * SUBSAMPLE_WORKING_COPIES <= budget // 2
+    assert segments[-1][1] == 10**8
+
+    roomy = plan_subsample_segments_for_memory_budget(10**8, 64 * 2**30, 32, 300)
+    assert roomy == plan_subsample_segments(10**8)
+    with pytest.raises(ValueError, match="ZCA subsample"):
+        plan_subsample_segments_for_memory_budget(10**8, 128 * 2**20, 384, 300)
+
+
+def test_read_preprocessed_segments_keeps_requested_channels(tmp_path: Path) -> None:
+    """``keep_channels`` selects rows of the same concatenated subsample."""
+    path = tmp_path / "amplifier.dat"
+    _write_recording(path)
+    reader = IntanAmplifierReader(path, 4)
+    sos = design_intan_sos_bandpass(order=2, filter_type="bessel")
+    pad = sos_filtfilt_pad_samples(sos)
+    segments = [(0, 1_000), (9_000, 10_500), (19_000, 20_000)]
+
+    full = read_preprocessed_segments(reader, segments, sos=sos, pad_samples=pad)
+    kept = read_preprocessed_segments(
+        reader, segments, sos=sos, pad_samples=pad, keep_channels=[0, 3], dtype="float32"
+    )
+    assert full.shape == (4, 3_500)
+    assert kept.shape == (2, 3_500)
+    assert kept.dtype == np.float32
+    scale = float(np.max(np.abs(full)))
+    np.testing.assert_allclose(kept, full[[0, 3]], rtol=0.0, atol=1e-5 * scale)
+
+
+def test_padded_chunk_matches_whole_recording_filter(tmp_path: Path) -> None:
+    """Filtering a padded chunk reproduces whole-recording filtering."""
+    path = tmp_path / "amplifier.dat"
+    _write_recording(path)
+    reader = IntanAmplifierReader(path, 4)
+    sos = design_intan_sos_bandpass(order=2, filter_type="bessel")
+    pad = sos_filtfilt_pad_samples(sos)
+
+    expected = sos_bandpass_filter(reader.read(), sos, axis=1)[:, 7_000:9_000]
+    actual = preprocess_time_range(reader, 7_000, 9_000, sos=sos, pad_samples=pad)
+
+    scale = float(np.max(np.abs(expected)))
+    np.testing.assert_allclose(actual, expected, rtol=0.0, atol=1e-5 * scale)
+
+
+@pytest.mark.parametrize("dtype", [None, "float32"])
+@pytest.mark.parametrize("spatial_reference", ["cmr", "zca", "cmr_zca"])
+def test_streaming_matches_in_memory_within_one_count(
+    tmp_path: Path,
+    spatial_reference: str,
+    dtype: ProcessingDtype | None,
+) -> None:
+    """Streaming output matches the in-memory pipeline to within one int16 count."""
+    path = tmp_path / "amplifier.dat"
+    _write_recording(path)
+    reader = IntanAmplifierReader(path, 4)
+    sos = design_intan_sos_bandpass(order=2, filter_type="bessel")
+    good_channels = [0, 1, 3]
+    use_cmr = spatial_reference in ("cmr", "cmr_zca")
+
+    voltage_uV = sos_bandpass_filter(reader.read(), sos, axis=1)
+    if use_cmr:
+        apply_common_median_reference(voltage_uV, good_channels)
+    fit = None
+    if spatial_reference != "cmr":
+        fit = fit_zca_whitening(voltage_uV[good_channels, :], good_channels=good_channels)
+        voltage_uV[good_channels, :] = apply_zca_fit(voltage_uV[good_channels, :], fit)
+    expected = np.round(voltage_uV / INTAN_BIT_TO_uV).astype(np.int16).T
+
+    output = tmp_path / "streamed.dat"
+    stream_preprocess_intan(
+        reader,
+        output,
+        sos=sos,
+        chunk_samples=3_000,
+        good_channels=good_channels,
+        common_median_reference=use_cmr,
+        zca_fit=fit,
+        dtype=dtype,
+    )
+    actual = np.fromfile(output, dtype=np.int16).reshape(-1, 4)
+
+    assert actual.shape == expected.shape
+    difference = np.abs(actual.astype(np.int32) - expected.astype(np.int32))
+    assert int(difference.max()) <= 1
+    assert float(np.mean(difference)) < 1e-3
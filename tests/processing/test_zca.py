@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import tracemalloc
 from pathlib import Path
 
 import numpy as np
@@ -10,9 +11,13 @@ import pytest
 from ephys.processing.zca import (
     _clean_sample_mask,
     apply_zca_fit,
+    apply_zca_fit_chunked,
     apply_zca_whitening,
+    detect_zca_artifact_intervals,
     fit_zca_whitening,
+    fit_zca_whitening_chunked,
     load_zca_fit_npz,
+    localize_zca_fit,
     save_zca_fit_npz,
     zca_matrix_from_covariance,
 )
@@ -286,3 +291,293 @@ def test_default_artifact_pad_is_half_ms() -> None:
     fit_20k = fit_zca_whitening(voltage, sampling_rate_hz=20_000.0)
     assert fit_20k.artifact_pad_samples == 10
 
+
+
+def test_float32_fit_and_apply_match_float64() -> None:
+    """The float32 policy keeps ZCA in float32 with small relative error."""
+    noise, _ = _spatially_correlated_noise(8, 20_000, seed=3)
+    voltage = (noise * 20.0).astype(np.float32)
+    fit64 = fit_zca_whitening(voltage, dtype="float64")
+    fit32 = fit_zca_whitening(voltage, dtype="float32")
+    np.testing.assert_allclose(fit32.covariance, fit64.covariance, rtol=1e-3, atol=1e-3)
+
+    whitened64 = apply_zca_fit(voltage.astype(np.float64), fit64)
+    whitened32 = apply_zca_fit(voltage.copy(), fit32, dtype="float32")
+    assert whitened32.dtype == np.float32
+    relative = np.max(np.abs(whitened32 - whitened64)) / np.std(whitened64)
+    assert relative < 1e-3
+
+
+def test_float64_policy_matches_legacy_covariance() -> None:
+    """Matrix-product covariance agrees with numpy.cov."""
+    voltage = _synthetic_bandpassed_voltage()
+    legacy = fit_zca_whitening(voltage, robust_cov=False)
+    policy = fit_zca_whitening(voltage, robust_cov=False, dtype="float64")
+    np.testing.assert_allclose(policy.covariance, legacy.covariance, rtol=1e-12)
+
+
+def test_chunked_fit_matches_in_memory_fit_with_full_reservoir() -> None:
+    """Block-wise sums reproduce the in-memory fit, including artifact gating."""
+    noise, _ = _spatially_correlated_noise(6, 40_000, seed=4)
+    voltage = noise * 10.0
+    voltage[:, 12_000:12_020] += 400.0
+    before = voltage.copy()
+
+    expected = fit_zca_whitening(voltage)
+    actual = fit_zca_whitening_chunked(voltage, chunk_samples=3_000, reservoir_samples=50_000)
+
+    np.testing.assert_array_equal(voltage, before)
+    np.testing.assert_allclose(actual.covariance, expected.covariance, rtol=1e-10)
+    np.testing.assert_allclose(actual.channel_medians, expected.channel_medians)
+    assert actual.mean_robust_std == pytest.approx(expected.mean_robust_std)
+    assert actual.artifact_pad_samples == expected.artifact_pad_samples
+
+
+def test_chunked_fit_on_planned_subsample_of_memmap(tmp_path: Path) -> None:
+    """A subsample of a memmapped recording fits like the gathered columns."""
+    noise, _ = _spatially_correlated_noise(4, 30_000, seed=5)
+    path = tmp_path / "bandpassed.npy"
+    np.save(path, noise.astype(np.float32))
+    voltage = np.load(path, mmap_mode="r")
+    indices = np.concatenate([np.arange(0, 5_000), np.arange(20_000, 26_000)])
+
+    expected = fit_zca_whitening(np.asarray(voltage[:, indices]), robust_cov=False)
+    actual = fit_zca_whitening_chunked(
+        voltage,
+        sample_indices=indices,
+        chunk_samples=2_048,
+        robust_cov=False,
+    )
+    np.testing.assert_allclose(actual.covariance, expected.covariance, rtol=1e-6)
+
+
+def test_chunked_fit_reports_convergence_with_bounded_reservoir() -> None:
+    """Covariance error shrinks as samples accumulate; the reservoir is bounded."""
+    noise, _ = _spatially_correlated_noise(6, 200_000, seed=6)
+    full = fit_zca_whitening(noise)
+    fit, convergence = fit_zca_whitening_chunked(
+        noise,
+        chunk_samples=5_000,
+        reservoir_samples=20_000,
+        return_convergence=True,
+    )
+
+    assert convergence.samples_used[-1] == pytest.approx(noise.shape[1], rel=0.1)
+    assert np.all(np.diff(convergence.samples_used) > 0)
+    assert convergence.relative_change[-1] == 0.0
+    assert convergence.relative_change[0] > convergence.relative_change[-2]
+    relative_error = np.linalg.norm(fit.covariance - full.covariance) / np.linalg.norm(
+        full.covariance
+    )
+    assert relative_error < 0.02
+
+
+def test_chunked_apply_matches_whole_matrix_product() -> None:
+    """Block-wise whitening equals one full matrix product, in place or not."""
+    voltage = _synthetic_bandpassed_voltage(n_samples=10_001)
+    fit = fit_zca_whitening(voltage)
+    expected = (fit.zca_matrix() @ (voltage - fit.channel_medians[:, np.newaxis])) * (
+        fit.mean_robust_std
+    )
+
+    actual = apply_zca_fit_chunked(voltage, fit, chunk_samples=1_000)
+    np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12)
+
+    in_place = voltage.copy()
+    assert apply_zca_fit_chunked(in_place, fit, out=in_place, chunk_samples=777) is in_place
+    np.testing.assert_allclose(in_place, expected, rtol=1e-12, atol=1e-12)
+
+
+def test_chunked_apply_fuses_int16_quantization_into_memmap(tmp_path: Path) -> None:
+    """Quantized blocks land in a transposed int16 memmap like round-then-cast."""
+    voltage = _synthetic_bandpassed_voltage(n_samples=5_000) * 30.0
+    fit = fit_zca_whitening(voltage)
+    expected = np.round(apply_zca_fit(voltage.copy(), fit) / 0.195).astype(np.int16)
+
+    output = np.memmap(tmp_path / "out.dat", dtype=np.int16, mode="w+", shape=(5_000, 4))
+    apply_zca_fit_chunked(voltage, fit, out=output.T, chunk_samples=1_024, bit_to_uV=0.195)
+    output.flush()
+
+    written = np.fromfile(tmp_path / "out.dat", dtype=np.int16).reshape(5_000, 4).T
+    assert int(np.max(np.abs(written.astype(np.int32) - expected))) <= 1
+
+
+def test_chunked_apply_peak_memory_is_one_block() -> None:
+    """Extra memory depends on the block size, not the recording length."""
+    voltage = _synthetic_bandpassed_voltage(n_channels=16, n_samples=200_000)
+    fit = fit_zca_whitening(voltage, robust_cov=False)
+    out = np.empty_like(voltage)
+
+    tracemalloc.start()
+    apply_zca_fit_chunked(voltage, fit, out=out, chunk_samples=4_096)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    block_bytes = 16 * 4_096 * 8
+    assert peak < 3 * block_bytes
+    assert peak < voltage.nbytes // 10
+
+
+def _linear_probe_positions(n_channels: int, pitch_um: float = 20.0) -> np.ndarray:
+    return np.column_stack([np.zeros(n_channels), np.arange(n_channels) * pitch_um])
+
+
+def _distance_decay_noise(n_channels: int, n_samples: int, seed: int) -> np.ndarray:
+    positions = _linear_probe_positions(n_channels)
+    distances = np.abs(positions[:, 1, np.newaxis] - positions[np.newaxis, :, 1])
+    covariance = 100.0 * np.exp(-distances / 40.0) + 25.0 * np.eye(n_channels)
+    rng = np.random.default_rng(seed)
+    return np.linalg.cholesky(covariance) @ rng.standard_normal((n_channels, n_samples))
+
+
+def test_local_zca_with_all_neighbors_equals_dense() -> None:
+    """A neighborhood spanning every channel reproduces the dense operator."""
+    voltage = _distance_decay_noise(12, 20_000, seed=7)
+    fit = fit_zca_whitening(voltage, good_channels=np.arange(2, 14))
+    positions = _linear_probe_positions(16)
+
+    local = localize_zca_fit(fit, positions, n_neighbors=12)
+
+    np.testing.assert_allclose(local.zca_matrix(), fit.zca_matrix(), atol=1e-12)
+    np.testing.assert_allclose(
+        apply_zca_fit_chunked(voltage, local, chunk_samples=3_000),
+        apply_zca_fit_chunked(voltage, fit, chunk_samples=3_000),
+        atol=1e-9,
+    )
+
+
+def test_local_zca_neighborhoods_are_sparse_and_whiten_neighbors() -> None:
+    """k-nearest and radius neighborhoods bound the nonzeros per row."""
+    voltage = _distance_decay_noise(48, 40_000, seed=8)
+    fit = fit_zca_whitening(voltage, epsilon=1e-3)
+    positions = _linear_probe_positions(48)
+
+    nearest = localize_zca_fit(fit, positions, n_neighbors=9)
+    by_radius = localize_zca_fit(fit, positions, radius_um=40.0)
+
+    assert nearest.whitening_operator is not None
+    assert by_radius.whitening_operator is not None
+    assert nearest.whitening_operator.nnz == 48 * 9
+    assert np.all(np.diff(by_radius.whitening_operator.indptr) <= 5)
+    whitened = apply_zca_fit(voltage.copy(), nearest, rescale_amplitude=False)
+    adjacent = [np.corrcoef(whitened[c], whitened[c + 1])[0, 1] for c in range(10, 38)]
+    assert np.max(np.abs(adjacent)) < 0.1
+
+
+def test_local_zca_fit_npz_round_trip(tmp_path: Path) -> None:
+    """The sparse operator survives save/load."""
+    voltage = _distance_decay_noise(10, 5_000, seed=9)
+    local = localize_zca_fit(
+        fit_zca_whitening(voltage),
+        _linear_probe_positions(10),
+        n_neighbors=4,
+    )
+    path = tmp_path / "local_zca.npz"
+    save_zca_fit_npz(path, local)
+    loaded = load_zca_fit_npz(path)
+
+    assert loaded.whitening_operator is not None
+    np.testing.assert_array_equal(loaded.zca_matrix(), local.zca_matrix())
+
+
+def test_localize_requires_one_neighborhood_rule() -> None:
+    fit = fit_zca_whitening(_synthetic_bandpassed_voltage())
+    with pytest.raises(ValueError, match="exactly one"):
+        localize_zca_fit(fit, _linear_probe_positions(4))
+
+
+def test_fit_records_artifact_intervals_and_round_trips(tmp_path: Path) -> None:
+    """Robust fits keep the dilated artifact intervals used for gating."""
+    noise, _ = _spatially_correlated_noise(4, 30_000, seed=10)
+    voltage = noise * 10.0
+    voltage[:, 10_000:10_005] += 500.0
+    voltage[1, 25_000] -= 500.0
+
+    fit = fit_zca_whitening(voltage, artifact_pad_samples=15)
+    chunked = fit_zca_whitening_chunked(
+        voltage,
+        chunk_samples=4_000,
+        reservoir_samples=30_000,
+        artifact_pad_samples=15,
+    )
+
+    intervals = fit.artifact_intervals
+    assert intervals is not None
+    assert intervals.contains(np.array([9_985, 10_019, 25_015])).all()
+    assert not intervals.contains(np.array([9_984, 10_020])).any()
+    assert chunked.artifact_intervals is not None
+    np.testing.assert_array_equal(chunked.artifact_intervals.starts, intervals.starts)
+    np.testing.assert_array_equal(chunked.artifact_intervals.stops, intervals.stops)
+
+    path = tmp_path / "fit.npz"
+    save_zca_fit_npz(path, fit)
+    loaded = load_zca_fit_npz(path).artifact_intervals
+    assert loaded is not None
+    np.testing.assert_array_equal(loaded.starts, intervals.starts)
+    np.testing.assert_array_equal(loaded.stops, intervals.stops)
+    assert loaded.n_samples == 30_000
+    assert fit_zca_whitening(voltage, robust_cov=False).artifact_intervals is None
+
+
+def test_subsample_artifact_intervals_are_recording_ticks() -> None:
+    """Subsample fits pad in ticks, never span gaps, and gate what they store."""
+    noise, _ = _spatially_correlated_noise(4, 30_000, seed=11)
+    voltage = noise * 10.0
+    voltage[:, 10_998:11_000] += 500.0
+    voltage[:, 20_000] += 500.0
+    ticks = np.concatenate([np.arange(0, 5_000), np.arange(10_000, 11_000), np.arange(20_000, 24_000)])
+
+    chunked = fit_zca_whitening_chunked(
+        voltage,
+        sample_indices=ticks,
+        chunk_samples=700,
+        reservoir_samples=ticks.size,
+        artifact_pad_samples=15,
+    )
+    subsample = fit_zca_whitening(
+        voltage[:, ticks],
+        artifact_pad_samples=15,
+        sample_ticks=ticks,
+        n_recording_samples=30_000,
+    )
+    intervals = chunked.artifact_intervals
+    assert intervals is not None and subsample.artifact_intervals is not None
+    assert intervals.n_samples == 30_000
+    np.testing.assert_array_equal(intervals.starts, [10_983, 19_985])
+    np.testing.assert_array_equal(intervals.stops, [11_015, 20_016])
+    np.testing.assert_array_equal(subsample.artifact_intervals.starts, intervals.starts)
+    np.testing.assert_array_equal(subsample.artifact_intervals.stops, intervals.stops)
+
+    clean = ticks[~intervals.contains(ticks)]
+    np.testing.assert_allclose(chunked.covariance, np.cov(voltage[:, clean]), rtol=1e-9)
+    np.testing.assert_allclose(subsample.covariance, chunked.covariance, rtol=1e-9)
+
+
+def test_detect_artifact_intervals_matches_fit_gate() -> None:
+    """The standalone gate finds the fit's intervals on the selected rows only."""
+    noise, _ = _spatially_correlated_noise(5, 30_000, seed=12)
+    voltage = noise * 10.0
+    voltage[:4, 10_000:10_005] += 500.0
+    voltage[4, 20_000] += 5_000.0
+    ticks = np.concatenate([np.arange(0, 15_000), np.arange(25_000, 30_000)])
+
+    intervals = detect_zca_artifact_intervals(
+        voltage,
+        channels=[0, 1, 2, 3],
+        artifact_pad_samples=15,
+    )
+    fit = fit_zca_whitening(voltage[:4], artifact_pad_samples=15)
+    assert fit.artifact_intervals is not None
+    np.testing.assert_array_equal(intervals.starts, fit.artifact_intervals.starts)
+    np.testing.assert_array_equal(intervals.stops, fit.artifact_intervals.stops)
+    assert not intervals.contains(np.array([20_000])).any()
+
+    subsample = detect_zca_artifact_intervals(
+        voltage[:, ticks],
+        artifact_pad_samples=15,
+        sample_ticks=ticks,
+        n_recording_samples=30_000,
+    )
+    assert subsample.n_samples == 30_000
+    assert subsample.contains(np.array([9_985, 10_019])).all()
+    assert not subsample.contains(np.array([20_000])).any()
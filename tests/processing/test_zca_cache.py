@@ -0,0 +1,97 @@
+"""Tests for the on-disk ZCA fit cache."""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pytest
+
+from ephys.processing.zca import fit_zca_whitening
+from ephys.processing.zca_cache import (
+    ZcaFitCache,
+    recording_fingerprint,
+    zca_fit_cache_key,
+)
+
+
+def _fit(seed: int = 0):
+    voltage = np.random.default_rng(seed).standard_normal((4, 5_000))
+    return fit_zca_whitening(voltage, epsilon=1.0)
+
+
+def test_fingerprint_tracks_content_and_key_tracks_params(tmp_path):
+    recording = tmp_path / "amplifier.dat"
+    data = np.arange(400_000, dtype=np.int16)
+    data.tofile(recording)
+    fingerprint = recording_fingerprint(recording)
+    assert recording_fingerprint(recording) == fingerprint
+
+    stat = recording.stat()
+    data[0] += 1
+    data.tofile(recording)
+    os.utime(recording, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert recording_fingerprint(recording) != fingerprint
+
+    params = {"epsilon": 10.0, "dead_channels": np.array([3, 7]), "dtype": None}
+    key = zca_fit_cache_key(fingerprint, params)
+    assert zca_fit_cache_key(fingerprint, dict(reversed(params.items()))) == key
+    assert zca_fit_cache_key(fingerprint, {**params, "epsilon": 1.0}) != key
+
+
+def test_get_or_fit_reuses_stored_fit(tmp_path):
+    recording = tmp_path / "amplifier.dat"
+    np.zeros(1_000, dtype=np.int16).tofile(recording)
+    cache = ZcaFitCache(tmp_path / "cache")
+    calls = []
+
+    def fit_fn():
+        calls.append(1)
+        return _fit()
+
+    first, first_hit = cache.get_or_fit_recording(recording, {"epsilon": 1.0}, fit_fn)
+    second, second_hit = cache.get_or_fit_recording(recording, {"epsilon": 1.0}, fit_fn)
+    _, other_hit = cache.get_or_fit_recording(recording, {"epsilon": 2.0}, fit_fn)
+
+    assert (first_hit, second_hit, other_hit) == (False, True, False)
+    assert len(calls) == 2
+    np.testing.assert_array_equal(second.covariance, first.covariance)
+    assert second.artifact_intervals is not None
+
+
+def test_store_evicts_least_recently_used(tmp_path):
+    cache = ZcaFitCache(tmp_path, max_bytes=10**9)
+    for index, key in enumerate(("a", "b", "c")):
+        path = cache.store(key, _fit(index))
+        os.utime(path, ns=(index * 10**9, index * 10**9))
+    entry_bytes = cache.path_for("a").stat().st_size
+    assert cache.load("a") is not None  # refreshes "a"; "b" is now oldest
+
+    cache.max_bytes = cache.total_bytes() + entry_bytes // 2
+    cache.store("d", _fit(3))
+
+    assert not cache.path_for("b").exists()
+    assert [path.name for path in cache.entries()] == ["zca-c.npz", "zca-a.npz", "zca-d.npz"]
+    assert cache.total_bytes() <= cache.max_bytes
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = ZcaFitCache(tmp_path)
+    cache.path_for("broken").write_bytes(b"not an npz")
+    assert cache.load("broken") is None
+    assert not cache.path_for("broken").exists()
+
+
+def test_unwritable_cache_warns_and_returns_fit(tmp_path):
+    recording = tmp_path / "amplifier.dat"
+    np.zeros(1_000, dtype=np.int16).tofile(recording)
+    blocked = tmp_path / "cache"
+    blocked.write_bytes(b"")  # a file where the cache directory should be
+    cache = ZcaFitCache(blocked)
+
+    with pytest.warns(UserWarning, match="Could not write ZCA fit cache"):
+        fit, hit = cache.get_or_fit_recording(recording, {"epsilon": 1.0}, _fit)
+
+    assert not hit
+    np.testing.assert_array_equal(fit.covariance, _fit().covariance)
+    assert cache.entries() == []
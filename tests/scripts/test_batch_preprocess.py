@@ -0,0 +1,150 @@
+"""Tests for the manifest batch runner in ``scripts/batch_preprocess.py``."""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+_SCRIPT = Path(__file__).resolve().parents[2] / "scripts" / "batch_preprocess.py"
+_spec = importlib.util.spec_from_file_location("batch_preprocess", _SCRIPT)
+assert _spec is not None and _spec.loader is not None
+batch_preprocess = importlib.util.module_from_spec(_spec)
+sys.modules["batch_preprocess"] = batch_preprocess
+_spec.loader.exec_module(batch_preprocess)
+
+N_CHANNELS = 4
+N_SAMPLES = 30_000
+
+
+def _write_dat(path: Path, seed: int = 0) -> Path:
+    rng = np.random.default_rng(seed)
+    data = rng.integers(-500, 500, size=(N_SAMPLES, N_CHANNELS), dtype=np.int16)
+    data.tofile(path)
+    return path
+
+
+def _session(tmp_path: Path, name: str, **overrides):
+    settings = {
+        "input": _write_dat(tmp_path / f"{name}.dat"),
+        "output": tmp_path / "out" / f"{name}.dat",
+        "channel_count": N_CHANNELS,
+        "spatial_reference": "cmr",
+        "zca_cache": False,
+        **overrides,
+    }
+    return batch_preprocess.SessionSpec(**settings)
+
+
+def _statuses(reports) -> dict[str, str]:
+    return {Path(report["output"]).name: report["status"] for report in reports}
+
+
+def test_rerun_skips_up_to_date_sessions_unless_forced(tmp_path: Path) -> None:
+    spec = _session(tmp_path, "a")
+
+    (first,) = batch_preprocess.run_batch([spec], max_workers=1)
+    assert first["status"] == "ok"
+    assert spec.output.stat().st_size == N_SAMPLES * N_CHANNELS * 2
+    assert json.loads(spec.report_path().read_text())["settings_hash"] == spec.settings_hash()
+
+    (second,) = batch_preprocess.run_batch([spec], max_workers=1)
+    assert second["status"] == "skipped"
+
+    (forced,) = batch_preprocess.run_batch([spec], max_workers=1, force=True)
+    assert forced["status"] == "ok"
+
+    changed = spec.model_copy(update={"lowcut": 400.0})
+    assert changed.settings_hash() != spec.settings_hash()
+    (rerun,) = batch_preprocess.run_batch([changed], max_workers=1)
+    assert rerun["status"] == "ok"
+
+
+def test_failed_sessions_do_not_stop_the_batch(tmp_path: Path) -> None:
+    good = _session(tmp_path, "good")
+    missing = _session(tmp_path, "missing")
+    missing.input.unlink()
+    invalid = _session(tmp_path, "invalid", spatial_reference="car")
+
+    reports = batch_preprocess.run_batch([missing, invalid, good], max_workers=2)
+
+    assert _statuses(reports) == {"missing.dat": "failed", "invalid.dat": "failed", "good.dat": "ok"}
+    assert "FileNotFoundError" in next(r for r in reports if r["status"] == "failed")["error"]
+    assert json.loads(invalid.report_path().read_text())["status"] == "failed"
+    assert not invalid.output.exists()
+    assert good.output.exists()
+
+
+def _event_order(output: str) -> list[str]:
+    return [line.split()[0] for line in output.splitlines() if line.startswith(("[start]", "[done]"))]
+
+
+def test_memory_budget_serializes_sessions(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    specs = [_session(tmp_path, name) for name in ("a", "b", "c")]
+    budget = specs[0].estimate_peak_bytes()
+
+    reports = batch_preprocess.run_batch(specs, max_workers=3, memory_budget_bytes=budget)
+
+    assert all(report["status"] == "ok" for report in reports)
+    assert _event_order(capsys.readouterr().out) == ["[start]", "[done]"] * 3
+
+
+def test_default_budget_is_physical_memory(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    specs = [_session(tmp_path, name) for name in ("a", "b")]
+    assert batch_preprocess.physical_memory_bytes() > specs[0].estimate_peak_bytes()
+    monkeypatch.setattr(
+        batch_preprocess,
+        "physical_memory_bytes",
+        lambda: specs[0].estimate_peak_bytes(),
+    )
+
+    reports = batch_preprocess.run_batch(specs, max_workers=2)
+
+    assert all(report["status"] == "ok" for report in reports)
+    assert _event_order(capsys.readouterr().out) == ["[start]", "[done]"] * 2
+
+
+def test_streaming_estimate_counts_subsample_copies(tmp_path: Path) -> None:
+    spec = _session(tmp_path, "a", max_memory_mb=8.0, dtype="float32")
+    segments = batch_preprocess.plan_subsample_segments_for_memory_budget(
+        N_SAMPLES,
+        8 * 2**20,
+        N_CHANNELS,
+        batch_preprocess.sos_filtfilt_pad_samples(
+            batch_preprocess.design_intan_sos_bandpass(order=2, filter_type="bessel")
+        ),
+        dtype="float32",
+    )
+    subsample_bytes = sum(stop - start for start, stop in segments) * N_CHANNELS * 4
+    copies = batch_preprocess.SUBSAMPLE_WORKING_COPIES
+    assert spec.estimate_peak_bytes() >= max(8 * 2**20, (1 + copies) * subsample_bytes)
+
+    (report,) = batch_preprocess.run_batch([spec.model_copy(update={"max_memory_mb": 0.01})])
+    assert report["status"] == "failed"
+    assert "too small" in report["error"]
+
+
+def test_without_budget_sessions_start_together(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    specs = [_session(tmp_path, name) for name in ("a", "b")]
+
+    reports = batch_preprocess.run_batch(specs, max_workers=2, memory_budget_bytes=float("inf"))
+
+    assert all(report["status"] == "ok" for report in reports)
+    assert _event_order(capsys.readouterr().out)[:2] == ["[start]", "[start]"]
+    shared = max(1, (os.cpu_count() or 1) // 2)
+    assert [report["settings"]["n_workers"] for report in reports] == [shared, shared]
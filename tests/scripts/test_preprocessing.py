@@ -0,0 +1,157 @@
+"""End-to-end tests for ``scripts/preprocessing.py``."""
+
+from __future__ import annotations
+
+import importlib.util
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import probeinterface
+import pytest
+from probeinterface import Probe
+
+from ephys import probes
+from ephys.data_wrangling.intan import INTAN_BIT_TO_uV
+from ephys.processing.filtering import design_intan_sos_bandpass, sos_bandpass_filter
+
+_SCRIPT = Path(__file__).resolve().parents[2] / "scripts" / "preprocessing.py"
+_spec = importlib.util.spec_from_file_location("preprocessing", _SCRIPT)
+assert _spec is not None and _spec.loader is not None
+preprocessing = importlib.util.module_from_spec(_spec)
+sys.modules["preprocessing"] = preprocessing
+_spec.loader.exec_module(preprocessing)
+
+N_CHANNELS = 8
+N_SAMPLES = 40_000
+
+
+def _write_two_shank_recording(path: Path) -> np.ndarray:
+    """Independent common-mode noise on channels 0-3 and 4-7."""
+    rng = np.random.default_rng(0)
+    data = 20.0 * rng.standard_normal((N_CHANNELS, N_SAMPLES))
+    data[:4] += 200.0 * rng.standard_normal(N_SAMPLES)
+    data[4:] += 200.0 * rng.standard_normal(N_SAMPLES)
+    raw = np.round(data).astype(np.int16)
+    raw.T.tofile(path)
+    return raw
+
+
+def _two_shank_probe(n_contacts: int = N_CHANNELS) -> Probe:
+    probe = Probe(ndim=2, si_units="um")
+    per_shank = n_contacts // 2
+    positions = np.column_stack(
+        [np.repeat([0.0, 200.0], per_shank), np.tile(np.arange(per_shank) * 25.0, 2)]
+    )
+    probe.set_contacts(positions=positions, shapes="circle", shape_params={"radius": 7.5})
+    probe.set_shank_ids(np.repeat(["a", "b"], per_shank))
+    probe.set_device_channel_indices(np.arange(n_contacts))
+    return probe
+
+
+@pytest.mark.parametrize("max_memory_mb", [None, 8.0])
+def test_cmr_probe_references_each_shank(tmp_path: Path, max_memory_mb: float | None) -> None:
+    """Both the in-memory and streaming paths subtract one median per shank."""
+    raw = _write_two_shank_recording(tmp_path / "amplifier.dat")
+    probe_path = tmp_path / "probe.json"
+    probe_group = probeinterface.ProbeGroup()
+    probe_group.add_probe(_two_shank_probe())
+    probeinterface.write_probeinterface(probe_path, probe_group)
+
+    output = tmp_path / "out.dat"
+    preprocessing.preprocess_intan(
+        tmp_path / "amplifier.dat",
+        output,
+        channel_count=N_CHANNELS,
+        spatial_reference="cmr",
+        cmr_probe=probe_path,
+        max_memory_mb=max_memory_mb,
+        zca_cache=False,
+    )
+
+    voltage = sos_bandpass_filter(
+        raw.astype(np.float64) * INTAN_BIT_TO_uV,
+        design_intan_sos_bandpass(order=2, filter_type="bessel"),
+        axis=1,
+    )
+    for shank in (slice(0, 4), slice(4, 8)):
+        voltage[shank] -= np.median(voltage[shank], axis=0)
+    expected = np.round(voltage / INTAN_BIT_TO_uV).astype(np.int16).T
+    actual = np.fromfile(output, dtype=np.int16).reshape(-1, N_CHANNELS)
+    assert np.max(np.abs(actual.astype(np.int32) - expected)) <= 1
+
+
+def test_cmr_probe_rejects_single_shank_and_channel_mismatch(tmp_path: Path) -> None:
+    _write_two_shank_recording(tmp_path / "amplifier.dat")
+
+    def run(cmr_probe, channel_count=N_CHANNELS):
+        preprocessing.preprocess_intan(
+            tmp_path / "amplifier.dat",
+            tmp_path / "out.dat",
+            channel_count=channel_count,
+            spatial_reference="cmr",
+            cmr_probe=cmr_probe,
+            zca_cache=False,
+        )
+
+    with pytest.raises(ValueError, match="single shank"):
+        run(probes.get_poly2_probe(), channel_count=32)
+    with pytest.raises(ValueError, match="wires 4 channels but the recording has 8"):
+        run(_two_shank_probe(4))
+    assert not (tmp_path / "out.dat").exists()
+
+
+@pytest.mark.parametrize("spatial_reference", ["cmr", "zca", "cmr_zca"])
+def test_streaming_matches_in_memory(tmp_path: Path, spatial_reference: str) -> None:
+    """With the subsample covering the recording, both paths agree to one count.
+
+    14 MiB streams 8 channels in two chunks while the 5-good-channel ZCA
+    subsample still spans all samples, so both paths fit the same ZCA.
+    """
+    _write_two_shank_recording(tmp_path / "amplifier.dat")
+    outputs = {}
+    for max_memory_mb in (None, 14.0):
+        output = tmp_path / f"out-{max_memory_mb}.dat"
+        preprocessing.preprocess_intan(
+            tmp_path / "amplifier.dat",
+            output,
+            channel_count=N_CHANNELS,
+            dead_channels=[5, 6, 7],
+            spatial_reference=spatial_reference,
+            max_memory_mb=max_memory_mb,
+            zca_cache=False,
+        )
+        outputs[max_memory_mb] = np.fromfile(output, dtype=np.int16).astype(np.int32)
+    assert np.max(np.abs(outputs[None] - outputs[14.0])) <= 1
+
+
+@pytest.mark.parametrize("max_memory_mb", [None, 14.0])
+def test_every_diagnostics_stage_skips_the_same_artifacts(
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    max_memory_mb: float | None,
+) -> None:
+    """Bandpass, CMR, and ZCA lines all drop the burst, so their counts match."""
+    raw = _write_two_shank_recording(tmp_path / "amplifier.dat")
+    raw[:, 20_000:20_050] = 30_000
+    raw.T.tofile(tmp_path / "amplifier.dat")
+
+    preprocessing.preprocess_intan(
+        tmp_path / "amplifier.dat",
+        tmp_path / "out.dat",
+        channel_count=N_CHANNELS,
+        spatial_reference="cmr_zca",
+        max_memory_mb=max_memory_mb,
+        zca_cache=False,
+    )
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if "subsample n=" in line]
+    assert [line.split("]")[0] for line in lines] == [
+        "[after bandpass",
+        "[after CMR",
+        "[after ZCA",
+    ]
+    counts = {int(match) for line in lines for match in re.findall(r"subsample n=(\d+)", line)}
+    assert len(counts) == 1
+    assert counts.pop() < N_SAMPLES